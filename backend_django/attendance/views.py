@@ -15,6 +15,7 @@ from .permissions import IsAdminOrReadOnly, IsInstructorOfFicha, IsInstructor
 from .filters import AttendanceFilter, FichaFilter, SessionFilter
 from django.db.models import Count, Q
 from excuses.models import Excuse
+from face_recognition_app.context import build_session_context, drop_session_context
 from django.utils import timezone
 import datetime
 from reportlab.pdfgen import canvas
@@ -290,6 +291,8 @@ class SessionViewSet(viewsets.ModelViewSet):
         students_in_ficha = session.ficha.students.all()
         attendance_records = [Attendance(session=session, student=student) for student in students_in_ficha]
         Attendance.objects.bulk_create(attendance_records)
+        if session.is_active:
+            build_session_context(session)
 
     @action(detail=True, methods=['get'], url_path='toggle-activation')
     def toggle_activation(self, request, pk=None):
@@ -299,6 +302,11 @@ class SessionViewSet(viewsets.ModelViewSet):
         session = self.get_object()
         session.is_active = not session.is_active
         session.save()
+        # Precalentar el contexto de reconocimiento para que el primer fotograma sea tan rápido como los siguientes.
+        if session.is_active:
+            build_session_context(session)
+        else:
+            drop_session_context(session.id)
         return Response({'status': 'success', 'is_active': session.is_active})
 
     @action(detail=True, methods=['get'], url_path='attendance-log')
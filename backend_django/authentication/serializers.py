@@ -4,9 +4,9 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from attendance.models import Ficha
-from face_recognition_app.models import FaceEncoding
+from face_recognition_app.models import MAX_TEMPLATES, FaceEncoding
+from face_recognition_app.index import face_index
 from face_recognition_app.services import get_face_encoding_from_image
-import face_recognition
 
 User = get_user_model()
 
@@ -133,17 +133,12 @@ class RegisterStudentSerializer(serializers.ModelSerializer):
         if not face_encodings:
             raise serializers.ValidationError({"face_images": "Debe subir al menos una imagen facial."})
 
-        # Verificar que los rostros no existan ya en la base de datos
-        existing_encodings = FaceEncoding.objects.all()
-        if existing_encodings.exists():
-            known_encodings = [enc.get_encoding_array() for enc in existing_encodings if enc.get_encoding_array() is not None]
-            for new_encoding in face_encodings:
-                if known_encodings:
-                    matches = face_recognition.compare_faces(known_encodings, new_encoding)
-                    if True in matches:
-                        raise serializers.ValidationError({
-                            "face_images": "Al menos uno de los rostros ya ha sido registrado por otro aprendiz."
-                        })
+        # Verificar que los rostros no existan ya en la base de datos (índice aproximado + distancia exacta)
+        for new_encoding in face_encodings:
+            if face_index.find_duplicate(new_encoding) is not None:
+                raise serializers.ValidationError({
+                    "face_images": "Al menos uno de los rostros ya ha sido registrado por otro aprendiz."
+                })
 
         attrs['face_encodings'] = face_encodings
         
@@ -172,7 +167,11 @@ class RegisterStudentSerializer(serializers.ModelSerializer):
         # Guardar todas las codificaciones faciales
         if face_encodings:
             face_encoding_obj = FaceEncoding(user=user, profile_image=face_images[0])
-            face_encoding_obj.set_encoding_array(face_encodings[0]) # Take the first encoding
+            face_encoding_obj.set_templates(face_encodings) # Plantillas + centroide
+            # Las demás imágenes se guardan para poder recalcular sus plantillas (reencode_faces)
+            face_encoding_obj.template_images = [
+                face_encoding_obj.profile_image.storage.save(f'face_templates/{image.name}', image) for image in face_images[1:MAX_TEMPLATES]
+            ]
             face_encoding_obj.save()
 
         return user
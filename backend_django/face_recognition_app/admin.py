@@ -1,20 +1,24 @@
+from django import forms
 from django.contrib import admin
-from .models import FaceEncoding, FaceVerificationLog, FaceRecognitionSettings
+from .backends import detector_choices
+from .models import CheckInEvent, FaceEncoding, FaceVerificationLog, FaceRecognitionSettings
+from .index import face_index
 from .services import get_face_encoding_from_image
 from django.contrib import messages
 
+
 @admin.register(FaceEncoding)
 class FaceEncodingAdmin(admin.ModelAdmin):
-    list_display = ('user', 'is_active', 'created_at', 'updated_at')
-    list_filter = ('is_active', 'created_at')
+    list_display = ('user', 'is_active', 'encoder_version', 'created_at', 'updated_at')
+    list_filter = ('is_active', 'encoder_version', 'created_at')
     search_fields = ('user__username', 'user__first_name', 'user__last_name')
-    readonly_fields = ('encoding_data', 'created_at', 'updated_at')
+    readonly_fields = ('encoder_version', 'encoding_size', 'template_count', 'created_at', 'updated_at')
     fieldsets = (
         (None, {
             'fields': ('user', 'profile_image', 'is_active')
         }),
         ('Datos de Codificación (Solo Lectura)', {
-            'fields': ('encoding_data',),
+            'fields': ('encoder_version', 'encoding_size', 'template_count'),
             'classes': ('collapse',),
         }),
         ('Timestamps', {
@@ -23,34 +27,64 @@ class FaceEncodingAdmin(admin.ModelAdmin):
         }),
     )
 
+    @admin.display(description='Tamaño de la codificación (bytes)')
+    def encoding_size(self, obj):
+        return len(obj.encoding_bytes)
+
+    @admin.display(description='Plantillas de enrolamiento')
+    def template_count(self, obj):
+        templates = obj.get_templates_array()
+        return 0 if templates is None else len(templates)
+
     def save_model(self, request, obj, form, change):
         if 'profile_image' in form.changed_data:
             new_image = form.cleaned_data.get('profile_image')
             if new_image:
                 encoding = get_face_encoding_from_image(new_image)
-                if encoding is not None:
+                duplicate_user_id = face_index.find_duplicate(encoding, exclude_user_id=obj.user_id) if encoding is not None else None
+                if duplicate_user_id is not None:
+                    messages.error(request, f"El rostro de la nueva imagen ya está registrado para el usuario con ID {duplicate_user_id}. La codificación no se ha actualizado.")
+                elif encoding is not None:
                     try:
-                        obj.set_encoding_array(encoding)
+                        # Solo cambia la plantilla de la imagen de perfil; las demás del enrolamiento se conservan.
+                        obj.set_profile_template(encoding)
                         messages.success(request, "La codificación facial se ha actualizado correctamente a partir de la nueva imagen.")
                     except ValueError as e:
                         messages.error(request, f"No se pudo actualizar la codificación facial: {e}")
                 else:
                     messages.warning(request, "No se pudo detectar una cara en la nueva imagen. La codificación no se ha actualizado.")
             else:
-                obj.encoding_data = "[]"
+                obj.encoding_bytes = b''
+                obj.templates_bytes = b''
+                obj.template_images = []
                 messages.info(request, "Se ha eliminado la imagen de perfil y la codificación facial.")
 
         super().save_model(request, obj, form, change)
 
+
 @admin.register(FaceVerificationLog)
 class FaceVerificationLogAdmin(admin.ModelAdmin):
-    list_display = ('user', 'session', 'status', 'confidence_score', 'created_at')
-    list_filter = ('status', 'created_at')
-    search_fields = ('user__username', 'session__ficha__numero_ficha')
+    list_display = ('user', 'session', 'source', 'status', 'faces_detected', 'faces_matched', 'faces_skipped', 'best_distance', 'total_ms', 'created_at')
+    list_filter = ('status', 'source', 'created_at')
+    search_fields = ('user__username', 'session__ficha__numero_ficha', 'source')
     readonly_fields = ('created_at',)
 
+
+class FaceRecognitionSettingsForm(forms.ModelForm):
+    # Opciones calculadas en cada formulario: incluyen los detectores registrados después del arranque.
+    face_detection_model = forms.ChoiceField(
+        choices=detector_choices,
+        help_text=FaceRecognitionSettings._meta.get_field('face_detection_model').help_text,
+    )
+
+    class Meta:
+        model = FaceRecognitionSettings
+        fields = '__all__'
+
+
 @admin.register(FaceRecognitionSettings)
 class FaceRecognitionSettingsAdmin(admin.ModelAdmin):
+    form = FaceRecognitionSettingsForm
     list_display = ('__str__', 'confidence_threshold', 'max_verification_attempts', 'face_detection_model', 'is_active')
     fieldsets = (
         ('Configuración General', {
@@ -59,7 +93,33 @@ class FaceRecognitionSettingsAdmin(admin.ModelAdmin):
         ('Parámetros del Modelo', {
             'fields': ('confidence_threshold', 'max_verification_attempts', 'face_detection_model')
         }),
+        ('Detección', {
+            'fields': ('detection_mode', 'detection_scale', 'detection_upsample', 'small_face_region', 'decode_min_width')
+        }),
+        ('Filtro de calidad', {
+            'fields': ('quality_min_face_size', 'quality_min_sharpness', 'quality_max_yaw')
+        }),
+        ('Calidad de codificación', {
+            'fields': ('live_landmark_model', 'live_num_jitters', 'enrollment_landmark_model', 'enrollment_num_jitters')
+        }),
+        ('Codificación en paralelo', {
+            'fields': ('encoding_workers', 'parallel_encoding_min_faces')
+        }),
+        ('Seguimiento entre fotogramas', {
+            'fields': ('motion_threshold', 'motion_max_unchanged_seconds', 'enable_tracking', 'tracking_ttl_seconds')
+        }),
+        ('Ráfagas de fotogramas', {
+            'fields': ('burst_confidence_threshold', 'burst_min_votes')
+        }),
     )
 
     def has_add_permission(self, request):
         return not FaceRecognitionSettings.objects.exists()
+
+
+@admin.register(CheckInEvent)
+class CheckInEventAdmin(admin.ModelAdmin):
+    list_display = ('client_event_id', 'session', 'student', 'status', 'captured_at', 'received_at')
+    list_filter = ('status', 'received_at')
+    search_fields = ('client_event_id', 'student__username', 'session__ficha__numero_ficha')
+    readonly_fields = ('received_at',)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class FaceRecognitionAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'face_recognition_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
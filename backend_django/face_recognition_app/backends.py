@@ -0,0 +1,237 @@
+# face_recognition_app/backends.py
+"""
+Registro de backends de detección y codificación de rostros.
+
+El detector se elige con FaceRecognitionSettings.face_detection_model (cambiable desde el
+admin) y el codificador con FACE_RECOGNITION_ENCODER, porque cambiar de codificador
+invalida las codificaciones guardadas (cada uno tiene su propia `version`).
+Las cajas siempre están en formato (top, right, bottom, left), como en face_recognition.
+Este módulo no depende de Django: lo usan los procesos del pool.
+"""
+import threading
+import zlib
+
+import numpy as np
+
+ENCODING_DIMENSIONS = 128
+
+
+class Detector:
+    """Interfaz de un detector: detect(imagen RGB, sobremuestreo) -> lista de cajas."""
+    label = ''
+
+    def detect(self, image, upsample=1):
+        raise NotImplementedError
+
+
+class Encoder:
+    """
+    Interfaz de un codificador: encode(imagen RGB, cajas, modelo de landmarks, jitters) -> lista de vectores de 128.
+    landmarks() devuelve, por caja, (puntos con las claves de face_recognition.face_landmarks,
+    forma interna); encode() acepta esa lista para no volver a calcularlos.
+    """
+    version = ''
+
+    def landmarks(self, image, boxes, model='small'):
+        raise NotImplementedError
+
+    def encode(self, image, boxes, model='small', num_jitters=1, landmarks=None):
+        raise NotImplementedError
+
+
+class DlibDetector(Detector):
+    def __init__(self, model, label):
+        self.model = model
+        self.label = label
+
+    def detect(self, image, upsample=1):
+        import face_recognition
+
+        return face_recognition.face_locations(image, number_of_times_to_upsample=upsample, model=self.model)
+
+
+class OpenCVHaarDetector(Detector):
+    """
+    Cascada Haar frontal incluida en opencv-python 4.x (las compilaciones sin cv2.CascadeClassifier
+    no la admiten). No es una alternativa rápida a HOG: con opencv-python 4.8.1 y 1 núcleo,
+    `benchmark_recognition --detector` dio p50 de 34 ms frente a 67 ms de HOG con un rostro,
+    pero 469/502 ms frente a 390/275 ms con 10/30 rostros (los mismos rostros detectados).
+    El sobremuestreo se traduce en un tamaño mínimo de rostro más pequeño.
+    """
+    label = 'OpenCV Haar (CPU)'
+    CASCADE = 'haarcascade_frontalface_default.xml'
+    MIN_FACE = 80
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _thread_classifier(self):
+        # Como en OpenCVDNNDetector, cada hilo (peticiones, ingesta de cámaras) usa su propia cascada.
+        import cv2
+
+        classifier = getattr(self._local, 'classifier', None)
+        if classifier is None:
+            if not hasattr(cv2, 'CascadeClassifier'):
+                raise RuntimeError("Esta compilación de OpenCV no incluye las cascadas Haar (se requiere opencv-python 4.x).")
+            classifier = cv2.CascadeClassifier(cv2.data.haarcascades + self.CASCADE)
+            if classifier.empty():
+                raise RuntimeError(f"No se pudo cargar la cascada {self.CASCADE} de OpenCV.")
+            self._local.classifier = classifier
+        return classifier
+
+    def detect(self, image, upsample=1):
+        import cv2
+
+        gray = cv2.equalizeHist(cv2.cvtColor(image, cv2.COLOR_RGB2GRAY))
+        min_face = max(20, self.MIN_FACE >> upsample)
+        faces = self._thread_classifier().detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(min_face, min_face))
+        return [(int(y), int(x + w), int(y + h), int(x)) for x, y, w, h in faces]
+
+
+class OpenCVDNNDetector(Detector):
+    """
+    Detector YuNet de OpenCV (cv2.FaceDetectorYN). Necesita el modelo ONNX en disco,
+    indicado con FACE_RECOGNITION_OPENCV_DNN_MODEL.
+    FaceDetectorYN guarda el tamaño de entrada (setInputSize), así que cada hilo usa su
+    propia instancia: fotogramas simultáneos de distinto tamaño no se interfieren.
+    """
+    label = 'OpenCV DNN YuNet (CPU, modelo local)'
+    SCORE_THRESHOLD = 0.7
+
+    def __init__(self):
+        self._local = threading.local()
+        self.model_path = None
+
+    def configure(self, model_path):
+        self.model_path = model_path
+
+    def _thread_detector(self, size):
+        import cv2
+
+        cached = getattr(self._local, 'detector', None)
+        if cached is None or cached[0] != self.model_path:
+            cached = self._local.detector = (self.model_path, cv2.FaceDetectorYN.create(self.model_path, '', size, self.SCORE_THRESHOLD))
+        return cached[1]
+
+    def detect(self, image, upsample=1):
+        import cv2
+
+        if not self.model_path:
+            raise RuntimeError("El detector opencv_dnn requiere FACE_RECOGNITION_OPENCV_DNN_MODEL.")
+        height, width = image.shape[:2]
+        detector = self._thread_detector((width, height))
+        detector.setInputSize((width, height))
+        _, faces = detector.detect(cv2.cvtColor(image, cv2.COLOR_RGB2BGR))
+        boxes = []
+        for face in faces if faces is not None else []:
+            x, y, w, h = (int(round(value)) for value in face[:4])
+            boxes.append((max(0, y), min(width, x + w), min(height, y + h), max(0, x)))
+        return boxes
+
+
+class StubDetector(Detector):
+    """
+    Detector determinista para pruebas y benchmarks: una caja centrada (la mitad central
+    de la imagen) si la imagen no es de un solo color; ninguna en caso contrario.
+    """
+    label = 'Stub (pruebas)'
+
+    def detect(self, image, upsample=1):
+        if image.size == 0 or image.min() == image.max():
+            return []
+        height, width = image.shape[:2]
+        return [(height // 4, width * 3 // 4, height * 3 // 4, width // 4)]
+
+
+class DlibEncoder(Encoder):
+    """Mismos pasos que face_recognition.face_encodings, separados para reutilizar los landmarks."""
+    version = 'dlib_resnet_v1'
+
+    def landmarks(self, image, boxes, model='small'):
+        from face_recognition import api
+
+        shapes = api._raw_face_landmarks(image, boxes, model)
+        return [(self._points([(p.x, p.y) for p in shape.parts()], model), shape) for shape in shapes]
+
+    @staticmethod
+    def _points(points, model):
+        # Índices de face_recognition.face_landmarks para los modelos de 68 y de 5 puntos.
+        if model == 'large':
+            return {'nose_tip': points[31:36], 'left_eye': points[36:42], 'right_eye': points[42:48]}
+        return {'nose_tip': [points[4]], 'left_eye': points[2:4], 'right_eye': points[0:2]}
+
+    def encode(self, image, boxes, model='small', num_jitters=1, landmarks=None):
+        from face_recognition import api
+
+        if landmarks is None:
+            landmarks = self.landmarks(image, boxes, model)
+        return [np.array(api.face_encoder.compute_face_descriptor(image, shape, num_jitters)) for _, shape in landmarks]
+
+
+class StubEncoder(Encoder):
+    """Codificación determinista derivada de los píxeles de cada caja (misma imagen = mismo vector)."""
+    version = 'stub_v1'
+
+    def landmarks(self, image, boxes, model='small'):
+        """Rostro frontal: ojos a un tercio del ancho de la caja y nariz en el centro."""
+        landmarks = []
+        for top, right, bottom, left in boxes:
+            width, middle = right - left, (top + bottom) // 2
+            points = {
+                'nose_tip': [(left + width // 2, middle)],
+                'left_eye': [(left + width // 3, top + (bottom - top) // 3)],
+                'right_eye': [(right - width // 3, top + (bottom - top) // 3)],
+            }
+            landmarks.append((points, None))
+        return landmarks
+
+    def encode(self, image, boxes, model='small', num_jitters=1, landmarks=None):
+        encodings = []
+        for top, right, bottom, left in boxes:
+            seed = zlib.crc32(np.ascontiguousarray(image[top:bottom, left:right]).tobytes())
+            encodings.append(np.random.default_rng(seed).normal(0, 0.1, ENCODING_DIMENSIONS))
+        return encodings
+
+
+DETECTORS = {
+    'hog': DlibDetector('hog', 'HOG (CPU)'),
+    'cnn': DlibDetector('cnn', 'CNN (GPU)'),
+    'opencv_haar': OpenCVHaarDetector(),
+    'opencv_dnn': OpenCVDNNDetector(),
+    'stub': StubDetector(),
+}
+
+ENCODERS = {
+    'dlib': DlibEncoder(),
+    'stub': StubEncoder(),
+}
+
+
+def register_detector(name, detector):
+    DETECTORS[name] = detector
+
+
+def register_encoder(name, encoder):
+    ENCODERS[name] = encoder
+
+
+def get_detector(name, model_path=None):
+    """Detector registrado con ese nombre; `model_path` es el modelo local de los detectores que lo necesitan."""
+    try:
+        detector = DETECTORS[name]
+    except KeyError:
+        raise ValueError(f"Detector de rostros desconocido: {name}")
+    if model_path and hasattr(detector, 'configure'):
+        detector.configure(model_path)
+    return detector
+
+
+def get_encoder(name):
+    try:
+        return ENCODERS[name]
+    except KeyError:
+        raise ValueError(f"Codificador de rostros desconocido: {name}")
+
+
+def detector_choices():
+    return [(name, detector.label) for name, detector in DETECTORS.items()]
@@ -0,0 +1,283 @@
+# face_recognition_app/benchmark.py
+"""
+Microbenchmark del flujo de reconocimiento por etapas (decodificación, detección,
+codificación, emparejamiento y escritura de asistencia).
+
+Funciona sin conexión y en CPU: los fotogramas de 1/10/30 rostros se arman como
+mosaicos a partir de la imagen de benchmark_fixtures/ y las listas de estudiantes son
+codificaciones sintéticas. La etapa de BD se ejecuta dentro de una transacción que se
+revierte al terminar. Ver el comando `benchmark_recognition`.
+
+bench_tiers compara los niveles de calidad de codificación (modelo de landmarks y
+jitters): latencia por rostro y distancia entre la plantilla de enrolamiento y las
+codificaciones en vivo de variaciones de la misma foto (espejo, brillo, escala, JPEG).
+"""
+import math
+import os
+import platform
+import resource
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+
+from attendance.models import Attendance, AttendanceSession, Ficha
+from .backends import get_encoder
+from .detection import detect_faces, detection_options
+from .matching import match_faces
+from .models import ENCODING_DIMENSIONS, FaceRecognitionSettings
+from .services import check_in_students
+from .workers import decode_frame
+
+FIXTURES_DIR = Path(__file__).resolve().parent / 'benchmark_fixtures'
+FACE_FIXTURE = FIXTURES_DIR / 'face.jpg'
+STAGES = ('decode', 'detect', 'encode', 'match', 'db')
+DEFAULT_ROSTERS = (10, 100, 1000, 10000)
+DEFAULT_FACES = (1, 10, 30)
+# Niveles (modelo de landmarks, jitters) que se comparan además de los configurados.
+DEFAULT_TIERS = (('small', 1), ('large', 1), ('small', 5), ('large', 5), ('large', 10))
+
+
+def peak_rss_mb():
+    """Memoria residente máxima del proceso (ru_maxrss está en KB en Linux y en bytes en macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def summarize(samples):
+    """p50/p95/media en milisegundos a partir de duraciones en segundos."""
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'mean_ms': round(float(values.mean()), 3),
+        'samples': len(values),
+    }
+
+
+def build_frame(face_count, seed=0):
+    """JPEG con `face_count` copias del rostro de referencia en mosaico (con variaciones de brillo y espejo)."""
+    tile = cv2.imread(str(FACE_FIXTURE))
+    rng = np.random.default_rng(seed)
+    cols = max(1, math.ceil(math.sqrt(face_count * 4 / 3)))
+    rows = math.ceil(face_count / cols)
+    height, width = tile.shape[:2]
+    canvas = np.full((rows * height, cols * width, 3), 127, dtype=np.uint8)
+    for index in range(face_count):
+        variant = tile[:, ::-1] if index % 2 else tile
+        variant = cv2.convertScaleAbs(variant, alpha=float(rng.uniform(0.85, 1.15)), beta=float(rng.uniform(-15, 15)))
+        row, col = divmod(index, cols)
+        canvas[row * height:(row + 1) * height, col * width:(col + 1) * width] = variant
+    ok, encoded = cv2.imencode('.jpg', canvas, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    if not ok:
+        raise RuntimeError("No se pudo generar el fotograma de prueba.")
+    return encoded.tobytes()
+
+
+def synthetic_roster(size, templates=1, seed=0, planted=None):
+    """
+    Codificaciones sintéticas con la escala de las de dlib (norma ~1), agrupadas por estudiante.
+    Si se indica `planted`, el primer estudiante recibe esa codificación para que haya coincidencias.
+    """
+    rng = np.random.default_rng(seed)
+    matrix = rng.normal(0.0, 1.0 / math.sqrt(ENCODING_DIMENSIONS), (size * templates, ENCODING_DIMENSIONS)).astype(np.float32)
+    if planted is not None and size:
+        matrix[:templates] = planted
+    student_ids = np.repeat(np.arange(1, size + 1, dtype=np.int64), templates)
+    return matrix, student_ids
+
+
+def _time(func, iterations, warmup=1):
+    for _ in range(warmup):
+        result = func()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - started)
+    return samples, result
+
+
+def bench_frame(frame, settings, iterations):
+    """Etapas que no dependen del tamaño de la lista: decodificación, detección y codificación."""
+    options = SimpleNamespace(**detection_options(settings))
+    decode_samples, (image, _) = _time(lambda: decode_frame(frame, settings.decode_min_width), iterations)
+    detect_samples, boxes = _time(lambda: detect_faces(image, options), iterations)
+    tier = settings.encoding_tier('live')
+    encoder = get_encoder(options.face_encoder)
+    encode_samples, encodings = _time(
+        lambda: encoder.encode(image, boxes, tier['model'], tier['num_jitters']), iterations,
+    )
+    return {
+        'decode': decode_samples,
+        'detect': detect_samples,
+        'encode': encode_samples,
+    }, np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIMENSIONS)
+
+
+def fixture_variants():
+    """Variaciones de la foto de referencia que simulan capturas en vivo de la misma persona."""
+    tile = cv2.cvtColor(cv2.imread(str(FACE_FIXTURE)), cv2.COLOR_BGR2RGB)
+    height, width = tile.shape[:2]
+    small = cv2.resize(tile, (width * 3 // 5, height * 3 // 5), interpolation=cv2.INTER_AREA)
+    _, compressed = cv2.imencode('.jpg', tile, [cv2.IMWRITE_JPEG_QUALITY, 35])
+    return {
+        'mirror': np.ascontiguousarray(tile[:, ::-1]),
+        'dark': cv2.convertScaleAbs(tile, alpha=0.7, beta=-20),
+        'bright': cv2.convertScaleAbs(tile, alpha=1.2, beta=25),
+        'low_res': cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR),
+        'jpeg_q35': cv2.imdecode(compressed, cv2.IMREAD_UNCHANGED),
+    }
+
+
+def bench_tiers(settings, iterations, tiers=DEFAULT_TIERS):
+    """
+    Latencia de codificar un rostro con cada nivel y distancia de las codificaciones en vivo
+    (nivel 'live' configurado) de fixture_variants() a la plantilla enrolada con ese nivel.
+    Menor distancia = más margen bajo el umbral de confianza.
+    """
+    import face_recognition
+
+    reference = cv2.cvtColor(cv2.imread(str(FACE_FIXTURE)), cv2.COLOR_BGR2RGB)
+    reference_boxes = face_recognition.face_locations(reference)
+    live = settings.encoding_tier('live')
+    live_encodings = []
+    for name, variant in fixture_variants().items():
+        boxes = face_recognition.face_locations(variant)
+        if boxes:
+            live_encodings.append(face_recognition.face_encodings(variant, boxes[:1], live['num_jitters'], live['model'])[0])
+    live_encodings = np.asarray(live_encodings, dtype=np.float32)
+
+    configured = [settings.encoding_tier(name) for name in ('live', 'enrollment')]
+    candidates = list(dict.fromkeys([(tier['model'], tier['num_jitters']) for tier in configured] + list(tiers)))
+    rows = []
+    for model, num_jitters in candidates:
+        samples, encodings = _time(
+            lambda: face_recognition.face_encodings(reference, reference_boxes, num_jitters, model), iterations,
+        )
+        distances = np.linalg.norm(live_encodings - np.asarray(encodings[0], dtype=np.float32), axis=1)
+        rows.append({
+            'model': model,
+            'num_jitters': num_jitters,
+            'configured_as': [name for name, tier in zip(('live', 'enrollment'), configured) if (tier['model'], tier['num_jitters']) == (model, num_jitters)],
+            'encode': summarize(samples),
+            'live_variants': len(distances),
+            'distance_mean': round(float(distances.mean()), 4) if len(distances) else None,
+            'distance_max': round(float(distances.max()), 4) if len(distances) else None,
+            'margin_to_threshold': round(settings.confidence_threshold - float(distances.max()), 4) if len(distances) else None,
+        })
+    return rows
+
+
+def bench_db(roster_size, matched, iterations):
+    """
+    Escritura de asistencia de `matched` estudiantes en una sesión de `roster_size` registros.
+    Todo se crea dentro de una transacción que se revierte.
+    """
+    User = get_user_model()
+    samples = []
+    with transaction.atomic():
+        stamp = f'bench{time.time_ns()}'
+        ficha = Ficha.objects.create(programa_formacion='benchmark', numero_ficha=stamp[-20:])
+        User.objects.bulk_create([
+            User(username=f'{stamp}_{i}', email=f'{stamp}_{i}@example.com', role='student', password='!')
+            for i in range(roster_size)
+        ], batch_size=1000)
+        student_ids = list(User.objects.filter(username__startswith=f'{stamp}_').values_list('id', flat=True))
+        now = timezone.now()
+        session = AttendanceSession.objects.create(
+            ficha=ficha, date=now.date(), start_time=now.time(),
+            end_time=(now + timezone.timedelta(hours=1)).time(),
+        )
+        Attendance.objects.bulk_create(
+            [Attendance(session=session, student_id=student_id) for student_id in student_ids],
+            batch_size=1000,
+        )
+        checked = student_ids[:matched]
+        grace_deadline = now + timezone.timedelta(minutes=15)
+        for iteration in range(iterations + 1):
+            Attendance.objects.filter(session=session).update(status='absent', check_in_time=None, verified_by_face=False)
+            started = time.perf_counter()
+            check_in_students(session.id, checked, grace_deadline, now=now)
+            if iteration:
+                samples.append(time.perf_counter() - started)
+        transaction.set_rollback(True)
+    return samples
+
+
+def run_benchmark(rosters=DEFAULT_ROSTERS, faces=DEFAULT_FACES, iterations=10, templates=1, include_db=True, progress=None, detector=None):
+    """
+    Ejecuta todas las combinaciones lista x fotograma y devuelve resultados serializables en JSON.
+    `detector` reemplaza face_detection_model solo para esta ejecución (sin guardarlo).
+    """
+    settings = FaceRecognitionSettings.get_settings()
+    if detector:
+        settings.face_detection_model = detector
+    results = []
+    for face_count in faces:
+        frame = build_frame(face_count)
+        frame_samples, encodings = bench_frame(frame, settings, iterations)
+        planted = encodings[0] if len(encodings) else None
+        for roster_size in rosters:
+            known, student_ids = synthetic_roster(roster_size, templates, planted=planted)
+            samples = dict(frame_samples)
+            samples['match'], (matches, _) = _time(
+                lambda: match_faces(encodings, known, student_ids, settings.confidence_threshold), iterations,
+            )
+            if include_db:
+                samples['db'] = bench_db(roster_size, min(face_count, roster_size), iterations)
+
+            stages = {stage: summarize(samples[stage]) for stage in STAGES if stage in samples}
+            total_ms = sum(stage['mean_ms'] for stage in stages.values())
+            results.append({
+                'roster': roster_size,
+                'templates_per_student': templates,
+                'faces': face_count,
+                'faces_detected': len(encodings),
+                'matches': len(matches),
+                'stages': stages,
+                'total_mean_ms': round(total_ms, 3),
+                'throughput_fps': round(1000 / total_ms, 3) if total_ms else None,
+                'throughput_faces_per_s': round(len(encodings) * 1000 / total_ms, 3) if total_ms else None,
+                'peak_rss_mb': round(peak_rss_mb(), 1),
+            })
+            if progress:
+                progress(results[-1])
+
+    return {
+        'meta': {
+            'timestamp': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'database': connection.vendor,
+            'iterations': iterations,
+            'detection': detection_options(settings),
+            'confidence_threshold': settings.confidence_threshold,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current):
+    """Variación porcentual de p50 por etapa entre dos ejecuciones (clave: lista, rostros)."""
+    previous = {(row['roster'], row['faces']): row for row in baseline['results']}
+    rows = []
+    for row in current['results']:
+        before = previous.get((row['roster'], row['faces']))
+        if before is None:
+            continue
+        changes = {}
+        for stage, stats in row['stages'].items():
+            old = before['stages'].get(stage, {}).get('p50_ms')
+            if old:
+                changes[stage] = round((stats['p50_ms'] - old) / old * 100, 1)
+        rows.append({'roster': row['roster'], 'faces': row['faces'], 'p50_change_pct': changes})
+    return rows
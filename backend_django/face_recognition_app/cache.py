@@ -0,0 +1,120 @@
+# face_recognition_app/cache.py
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from .models import CURRENT_ENCODER_VERSION, ENCODING_DIMENSIONS, ENCODING_DTYPE, ENCODING_NBYTES
+
+logger = logging.getLogger(__name__)
+
+
+class FichaEncodingCache:
+    """
+    Caché LRU en memoria con las codificaciones faciales activas de cada ficha.
+
+    Cada entrada guarda una matriz float32 contigua con todas las plantillas de
+    enrolamiento (n x 128) y el arreglo de IDs de estudiante alineado fila a fila;
+    las plantillas de un mismo estudiante quedan contiguas. Las entradas se invalidan mediante
+    señales (ver signals.py); el TTL acota la desactualización entre procesos,
+    ya que cada worker WSGI mantiene su propia copia.
+    """
+
+    def __init__(self, max_entries=64, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, ficha_id):
+        """Devuelve (matriz, student_ids) para la ficha, cargándolos si es necesario."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(ficha_id)
+            if entry is not None and now - entry[2] <= self.ttl_seconds:
+                self._entries.move_to_end(ficha_id)
+                self.hits += 1
+                return entry[0], entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        matrix, student_ids = self._load(ficha_id)
+
+        with self._lock:
+            # Si hubo una invalidación durante la carga, el resultado puede estar desactualizado.
+            if generation != self._generation:
+                return matrix, student_ids
+            self._entries[ficha_id] = (matrix, student_ids, now)
+            self._entries.move_to_end(ficha_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return matrix, student_ids
+
+    def invalidate(self, ficha_ids=None):
+        """Elimina las entradas indicadas, o todas si no se especifica ninguna."""
+        with self._lock:
+            self._generation += 1
+            if ficha_ids is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                return
+            for ficha_id in ficha_ids:
+                if self._entries.pop(ficha_id, None) is not None:
+                    self.invalidations += 1
+
+    def stats(self):
+        """Contadores para dimensionar la caché."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+    def _load(self, ficha_id):
+        """Carga las codificaciones activas de la ficha con una sola consulta."""
+        from .models import FaceEncoding
+
+        rows = FaceEncoding.objects.filter(
+            user__fichas_enrolled__id=ficha_id,
+            is_active=True,
+            encoder_version=CURRENT_ENCODER_VERSION,
+        ).values_list('user_id', 'encoding_bytes', 'templates_bytes')
+
+        blobs = []
+        student_ids = []
+        for user_id, encoding_bytes, templates_bytes in rows:
+            # Registros anteriores a las plantillas múltiples solo tienen la codificación principal.
+            blob = templates_bytes if templates_bytes and len(templates_bytes) % ENCODING_NBYTES == 0 else encoding_bytes
+            if not blob or len(blob) % ENCODING_NBYTES:
+                logger.warning(f"La codificación para el estudiante {user_id} tiene una longitud incorrecta. Se omitirá.")
+                continue
+            blobs.append(bytes(blob))
+            student_ids.extend([user_id] * (len(blob) // ENCODING_NBYTES))
+
+        # np.frombuffer sobre bytes inmutables ya produce un arreglo contiguo de solo lectura.
+        matrix = np.frombuffer(b''.join(blobs), dtype=ENCODING_DTYPE).reshape(-1, ENCODING_DIMENSIONS)
+        student_ids = np.asarray(student_ids, dtype=np.int64)
+        student_ids.flags.writeable = False
+        logger.info(f"Caché de codificaciones cargada para la ficha {ficha_id}: {len(set(student_ids.tolist()))} rostros, {len(student_ids)} plantillas.")
+        return matrix, student_ids
+
+
+encoding_cache = FichaEncodingCache(
+    max_entries=getattr(settings, 'FACE_ENCODING_CACHE_SIZE', 64),
+    ttl_seconds=getattr(settings, 'FACE_ENCODING_CACHE_TTL', 300),
+)
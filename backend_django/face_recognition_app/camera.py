@@ -0,0 +1,135 @@
+# face_recognition_app/camera.py
+"""
+Ingesta directa desde cámaras (RTSP/HTTP) o archivos de video con OpenCV.
+
+Cada cámara se asocia a una AttendanceSession, o a varias simultáneas (aulas compartidas:
+cada fotograma se reconoce una sola vez contra la unión de sus listas). Los fotogramas se muestrean con un
+intervalo adaptativo (corto mientras aparecen estudiantes nuevos, más largo cuando
+no pasa nada), se descartan los que no tienen movimiento respecto al último procesado
+y los demás se envían en memoria al flujo de reconocimiento, sin codificar ni subir
+JPEG. Ver el comando `run_camera_ingest`.
+"""
+import logging
+import os
+import threading
+import time
+
+import cv2
+from django.db import close_old_connections
+
+from attendance.models import AttendanceSession
+from .motion import frame_difference, frame_fingerprint
+from .services import recognize_faces_in_stream
+
+logger = logging.getLogger(__name__)
+
+# Cada cuánto se comprueba que la sesión siga activa.
+SESSION_CHECK_SECONDS = 30
+RECONNECT_SECONDS = 5
+BACKOFF_FACTOR = 1.5
+
+
+class CameraIngestor:
+    def __init__(self, source, session_id, camera_id='', min_interval=0.5, max_interval=5.0, motion_threshold=0.02):
+        self.source = source
+        self.session_ids = [int(id_) for id_ in session_id] if isinstance(session_id, (list, tuple)) else [int(session_id)]
+        self.active_ids = list(self.session_ids)
+        self.camera_id = camera_id or f'camera:{source}'
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.motion_threshold = motion_threshold
+        # Un archivo local se recorre según su propio reloj (posición del video), no el de pared.
+        self.is_file = os.path.isfile(source)
+        self.stop_event = threading.Event()
+        self.stats = {'read': 0, 'sampled': 0, 'still': 0, 'processed': 0, 'recognized': 0}
+
+    def _open(self):
+        capture = cv2.VideoCapture(self.source)
+        if not capture.isOpened():
+            capture.release()
+            return None
+        return capture
+
+    def _clock(self, capture):
+        if self.is_file:
+            return capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        return time.monotonic()
+
+    def _session_active(self):
+        """Actualiza las sesiones que siguen activas; False si ya no queda ninguna."""
+        close_old_connections()
+        active = set(AttendanceSession.objects.filter(id__in=self.session_ids, is_active=True).values_list('id', flat=True))
+        self.active_ids = [id_ for id_ in self.session_ids if id_ in active]
+        return bool(self.active_ids)
+
+    def process(self, frame):
+        """Envía un fotograma BGR al reconocimiento. Devuelve el resultado del servicio."""
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        target = self.active_ids[0] if len(self.active_ids) == 1 else self.active_ids
+        result = recognize_faces_in_stream(rgb, target, source=self.camera_id)
+        self.stats['processed'] += 1
+        self.stats['recognized'] += len(result.get('recognized_students', []))
+        return result
+
+    def run(self):
+        """Lee la fuente hasta que termine el archivo, se desactive la sesión o se llame a stop()."""
+        if not self._session_active():
+            raise RuntimeError(f"Ninguna de las sesiones {self.session_ids} existe o está activa.")
+        capture = self._open()
+        if capture is None:
+            raise RuntimeError(f"No se pudo abrir la fuente de video {self.source}")
+        logger.info(f"Ingesta de {self.camera_id} iniciada para las sesiones {self.active_ids}.")
+
+        interval = self.min_interval
+        next_sample = float('-inf')
+        next_session_check = time.monotonic() + SESSION_CHECK_SECONDS
+        last_fingerprint = None
+        try:
+            while not self.stop_event.is_set():
+                # grab() no decodifica: los fotogramas que no se muestrean cuestan poco.
+                if not capture.grab():
+                    if self.is_file:
+                        break
+                    logger.warning(f"Se perdió la señal de {self.camera_id}; reintentando en {RECONNECT_SECONDS} s.")
+                    capture.release()
+                    if self.stop_event.wait(RECONNECT_SECONDS):
+                        break
+                    capture = self._open() or capture
+                    continue
+                self.stats['read'] += 1
+
+                if time.monotonic() >= next_session_check:
+                    next_session_check = time.monotonic() + SESSION_CHECK_SECONDS
+                    if not self._session_active():
+                        logger.info(f"Las sesiones {self.session_ids} ya no están activas; se detiene {self.camera_id}.")
+                        break
+
+                now = self._clock(capture)
+                if now < next_sample:
+                    continue
+                ok, frame = capture.retrieve()
+                if not ok:
+                    continue
+                self.stats['sampled'] += 1
+                next_sample = now + interval
+
+                fingerprint = frame_fingerprint(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+                if last_fingerprint is not None and frame_difference(last_fingerprint, fingerprint) < self.motion_threshold:
+                    self.stats['still'] += 1
+                    interval = min(interval * BACKOFF_FACTOR, self.max_interval)
+                    continue
+                last_fingerprint = fingerprint
+
+                result = self.process(frame)
+                if result.get('recognized_students'):
+                    interval = self.min_interval
+                elif not result.get('tracked_faces'):
+                    interval = min(interval * BACKOFF_FACTOR, self.max_interval)
+        finally:
+            capture.release()
+            close_old_connections()
+        logger.info(f"Ingesta de {self.camera_id} finalizada: {self.stats}")
+        return self.stats
+
+    def stop(self):
+        self.stop_event.set()
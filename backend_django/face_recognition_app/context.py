@@ -0,0 +1,119 @@
+# face_recognition_app/context.py
+"""
+Contexto de reconocimiento precalculado por sesión de asistencia.
+
+Al activar una sesión se construye y se fija en memoria todo lo que necesita el
+reconocimiento (configuración, listado, matriz de codificaciones, límite de
+permisividad y filas de asistencia), de modo que el primer fotograma de la clase
+cueste lo mismo que el centésimo. Se descarta al desactivar la sesión o al pasar
+su hora de finalización. Las señales solo invalidan el proceso que hizo el cambio:
+los demás (otros workers WSGI, Celery) lo reconstruyen cada FACE_RECOGNITION_CONTEXT_TTL
+segundos para recoger los cambios de configuración e inscripción.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings as django_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.timezone import make_aware
+
+from attendance.models import Attendance, AttendanceSession, Ficha
+from .cache import encoding_cache
+from .models import FaceRecognitionSettings
+from .motion import drop_motion_gates
+from .workers import get_worker_pool
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+CONTEXT_TTL_SECONDS = getattr(django_settings, 'FACE_RECOGNITION_CONTEXT_TTL', 30)
+
+
+class SessionContext:
+    def __init__(self, session, settings):
+        self.session_id = session.id
+        self.ficha_id = session.ficha_id
+        self.numero_ficha = session.ficha.numero_ficha
+        self.settings = settings
+        self.is_active = session.is_active
+        self.built_at = time.monotonic()
+        start = make_aware(datetime.combine(session.date, session.start_time))
+        self.grace_deadline = start + timezone.timedelta(minutes=session.permisividad)
+        self.ends_at = make_aware(datetime.combine(session.date, session.end_time))
+        self.attendance_ids = dict(
+            Attendance.objects.filter(session_id=session.id).values_list('student_id', 'id')
+        )
+        self.student_names = {
+            user.id: user.get_full_name()
+            for user in User.objects.filter(fichas_enrolled__id=session.ficha_id).only('id', 'first_name', 'last_name')
+        }
+
+    def is_expired(self, now=None):
+        return (now or timezone.now()) > self.ends_at
+
+    def is_stale(self, now=None):
+        """True cuando la copia en memoria superó CONTEXT_TTL_SECONDS y debe releerse de la BD."""
+        return (time.monotonic() if now is None else now) - self.built_at > CONTEXT_TTL_SECONDS
+
+    def full_names(self, student_ids):
+        """Nombres de los estudiantes; consulta solo los que se inscribieron después de construir el contexto."""
+        missing = [student_id for student_id in student_ids if student_id not in self.student_names]
+        if missing:
+            for user in User.objects.filter(id__in=missing).only('id', 'first_name', 'last_name'):
+                self.student_names[user.id] = user.get_full_name()
+        return {student_id: self.student_names.get(student_id, '') for student_id in student_ids}
+
+
+_contexts = {}
+_contexts_lock = threading.Lock()
+
+
+def build_session_context(session):
+    """Construye y fija el contexto de la sesión, cargando también la matriz de codificaciones y el pool."""
+    if session.ficha_id is None:
+        raise Ficha.DoesNotExist
+    context = SessionContext(session, FaceRecognitionSettings.get_settings())
+    encoding_cache.get(session.ficha_id)
+    get_worker_pool()
+    with _contexts_lock:
+        _contexts[session.id] = context
+    logger.info(f"Contexto de reconocimiento preparado para la sesión {session.id} ({len(context.attendance_ids)} registros de asistencia).")
+    return context
+
+
+def get_session_context(session_id):
+    """
+    Devuelve el contexto fijado de la sesión o lo construye si no existe (p. ej. en otro
+    proceso) o si su copia venció. Una sesión que ya terminó se lee directamente de la BD
+    en cada llamada, sin fijarla de nuevo.
+    """
+    session_id = int(session_id)
+    with _contexts_lock:
+        context = _contexts.get(session_id)
+    if context is not None and not context.is_expired() and not context.is_stale():
+        return context
+    if context is not None and context.is_expired():
+        drop_session_context(session_id)
+    session = AttendanceSession.objects.select_related('ficha').get(id=session_id)
+    if session.ficha_id is None:
+        raise Ficha.DoesNotExist
+    fresh = SessionContext(session, FaceRecognitionSettings.get_settings())
+    if fresh.is_expired():
+        return fresh
+    # Renovación por TTL: se reemplaza la copia sin descartar los fotogramas guardados de la cámara.
+    with _contexts_lock:
+        _contexts[session_id] = fresh
+    return fresh
+
+
+def drop_session_context(session_id=None):
+    """Descarta el contexto de una sesión (y sus fotogramas guardados), o todos si no se indica ninguna."""
+    with _contexts_lock:
+        if session_id is None:
+            _contexts.clear()
+        else:
+            _contexts.pop(int(session_id), None)
+    drop_motion_gates(session_id)
@@ -0,0 +1,102 @@
+# face_recognition_app/detection.py
+import logging
+import time
+
+import cv2
+
+from .backends import get_detector
+from .tracking import box_iou
+
+logger = logging.getLogger(__name__)
+
+# Campos de FaceRecognitionSettings que necesitan la detección y la codificación en vivo
+# (se envían a los procesos del pool).
+DETECTION_FIELDS = (
+    'face_detection_model', 'detection_mode', 'detection_scale', 'detection_upsample', 'small_face_region',
+    'decode_min_width', 'live_landmark_model', 'live_num_jitters',
+    'quality_min_face_size', 'quality_min_sharpness', 'quality_max_yaw',
+)
+
+# Opciones de settings.py que viajan con las de detección.
+PROJECT_OPTIONS = {
+    'face_encoder': ('FACE_RECOGNITION_ENCODER', 'dlib'),
+    'opencv_dnn_model': ('FACE_RECOGNITION_OPENCV_DNN_MODEL', None),
+}
+
+# Solapamiento mínimo para considerar que dos cajas corresponden al mismo rostro.
+DUPLICATE_IOU = 0.3
+
+
+def _merge_boxes(boxes, extra_boxes):
+    merged = list(boxes)
+    for box in extra_boxes:
+        if all(box_iou(box, existing) < DUPLICATE_IOU for existing in merged):
+            merged.append(box)
+    return merged
+
+
+def _scale_boxes(boxes, factor, offset_top, height, width):
+    """Lleva cajas detectadas en una copia reducida/recortada a coordenadas de la imagen completa."""
+    scaled = []
+    for top, right, bottom, left in boxes:
+        scaled.append((
+            max(0, int(round(top * factor)) + offset_top),
+            min(width, int(round(right * factor))),
+            min(height, int(round(bottom * factor)) + offset_top),
+            max(0, int(round(left * factor))),
+        ))
+    return scaled
+
+
+def _detect_adaptive(image, settings):
+    """
+    Primera pasada HOG sin sobremuestreo sobre una copia reducida de la imagen.
+    El sobremuestreo solo se aplica a la franja superior donde se esperan rostros
+    pequeños (filas del fondo del aula) o a toda la imagen si no se encontró nada.
+    """
+    detector = _detector(settings)
+    height, width = image.shape[:2]
+    scale = settings.detection_scale
+    if not 0 < scale <= 1 or int(width * scale) < 1 or int(height * scale) < 1:
+        logger.warning(f"detection_scale={scale} no es válido; se detecta a resolución completa.")
+        return detector.detect(image, settings.detection_upsample)
+    small = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    boxes = _scale_boxes(detector.detect(small, 0), 1.0 / scale, 0, height, width)
+
+    if settings.small_face_region > 0:
+        region_height = int(height * settings.small_face_region)
+        region_boxes = detector.detect(image[:region_height], settings.detection_upsample)
+        boxes = _merge_boxes(boxes, region_boxes)
+
+    if not boxes:
+        logger.info("La primera pasada reducida no encontró rostros; se reintenta a resolución completa.")
+        boxes = detector.detect(image, settings.detection_upsample)
+    return boxes
+
+
+def _detector(settings):
+    return get_detector(settings.face_detection_model, getattr(settings, 'opencv_dnn_model', None))
+
+
+def detect_faces(image, settings):
+    """
+    Detecta rostros según el modo configurado en FaceRecognitionSettings.
+    Devuelve las cajas en coordenadas de la imagen original, listas para face_encodings.
+    """
+    started = time.perf_counter()
+    if settings.detection_mode == 'adaptive':
+        boxes = _detect_adaptive(image, settings)
+    else:
+        boxes = _detector(settings).detect(image, settings.detection_upsample)
+    logger.debug(f"Detección ({settings.detection_mode}) de {len(boxes)} rostros en {(time.perf_counter() - started) * 1000:.1f} ms")
+    return boxes
+
+
+def detection_options(settings):
+    """Copia serializable de la configuración de detección."""
+    from django.conf import settings as project_settings
+
+    options = {field: getattr(settings, field) for field in DETECTION_FIELDS}
+    for option, (setting, default) in PROJECT_OPTIONS.items():
+        options[option] = getattr(project_settings, setting, default)
+    return options
@@ -0,0 +1,208 @@
+# face_recognition_app/index.py
+"""
+Índice de vecinos aproximados (IVF) sobre todas las codificaciones activas, usado para
+detectar rostros ya registrados sin comparar contra toda la base de datos. Como el
+reconocimiento (cache.py), indexa cada plantilla de enrolamiento y no solo su centroide.
+
+Las codificaciones se reparten en listas invertidas según su centroide más cercano
+(k-means en NumPy). Una búsqueda solo revisa las `nprobe` listas más cercanas y
+reordena los candidatos con la distancia exacta. Los cambios se aplican de forma
+incremental (señales en el proceso actual y sincronización por updated_at para los
+cambios hechos desde otros procesos, como mucho cada `sync_interval` segundos); el
+índice se reentrena cuando acumula demasiadas modificaciones.
+"""
+import logging
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db.models.functions import Length
+
+from .matching import distance_matrix
+from .models import CURRENT_ENCODER_VERSION, ENCODING_DIMENSIONS, ENCODING_DTYPE, ENCODING_NBYTES
+
+logger = logging.getLogger(__name__)
+
+# Misma tolerancia que face_recognition.compare_faces.
+DUPLICATE_TOLERANCE = 0.6
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_SIZE = 20000
+
+
+def _kmeans(vectors, n_clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > KMEANS_SAMPLE_SIZE:
+        sample = vectors[rng.choice(len(vectors), KMEANS_SAMPLE_SIZE, replace=False)]
+    centroids = sample[rng.choice(len(sample), n_clusters, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = distance_matrix(sample, centroids).argmin(axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+class FaceIndex:
+    def __init__(self, nprobe=16, min_ivf_size=2048, sync_interval=30):
+        self.nprobe = nprobe
+        self.min_ivf_size = min_ivf_size
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._built = False
+        self._synced_at = None
+
+    def _active_queryset(self):
+        """Codificaciones que el índice puede contener: activas, de la versión actual y con 512 bytes
+        (el admin deja encoding_bytes vacío al quitar la imagen sin desactivar el registro)."""
+        from .models import FaceEncoding
+
+        return FaceEncoding.objects.annotate(encoding_size=Length('encoding_bytes')).filter(
+            is_active=True, encoder_version=CURRENT_ENCODER_VERSION, encoding_size=ENCODING_NBYTES,
+        )
+
+    def _reset(self, user_ids, vectors, watermark):
+        """`user_ids` tiene una entrada por fila de `vectors` (un usuario ocupa una fila por plantilla)."""
+        self._user_ids = np.asarray(user_ids, dtype=np.int64)
+        self._vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, ENCODING_DIMENSIONS)
+        self._rows_of_user = {}
+        for row, user_id in enumerate(self._user_ids.tolist()):
+            self._rows_of_user.setdefault(user_id, []).append(row)
+        self._removed = np.zeros(len(self._user_ids), dtype=bool)
+        self._pending = {}
+        self._watermark = watermark
+        self._centroids = None
+        self._lists = None
+        if len(self._user_ids) >= self.min_ivf_size:
+            n_lists = int(np.sqrt(len(self._user_ids)))
+            self._centroids = _kmeans(self._vectors, n_lists)
+            assignment = distance_matrix(self._vectors, self._centroids).argmin(axis=1)
+            order = np.argsort(assignment, kind='stable')
+            bounds = np.searchsorted(assignment[order], np.arange(n_lists + 1))
+            self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(n_lists)]
+        self._built = True
+
+    def rebuild(self):
+        """Reconstruye el índice completo con una sola consulta."""
+        rows = self._active_queryset().values_list('user_id', 'encoding_bytes', 'templates_bytes', 'updated_at')
+        user_ids, blobs, watermark = [], [], None
+        for user_id, encoding_bytes, templates_bytes, updated_at in rows:
+            # Registros anteriores a las plantillas múltiples solo tienen la codificación principal.
+            blob = templates_bytes if templates_bytes and len(templates_bytes) % ENCODING_NBYTES == 0 else encoding_bytes
+            user_ids.extend([user_id] * (len(blob) // ENCODING_NBYTES))
+            blobs.append(bytes(blob))
+            watermark = updated_at if watermark is None or updated_at > watermark else watermark
+        vectors = np.frombuffer(b''.join(blobs), dtype=ENCODING_DTYPE)
+        with self._lock:
+            self._reset(user_ids, vectors, watermark)
+        logger.info(f"Índice de rostros reconstruido con {len(self._rows_of_user)} rostros, {len(user_ids)} plantillas.")
+
+    def _live_size(self):
+        """Usuarios presentes en el índice (comparable con el conteo de _active_queryset)."""
+        return len(self._rows_of_user) + len(self._pending)
+
+    def upsert(self, user_id, templates):
+        """Agrega o reemplaza las plantillas de un usuario (se buscan de forma exacta hasta el próximo reentrenamiento)."""
+        with self._lock:
+            if not self._built:
+                return
+            self._remove_locked(user_id)
+            self._pending[user_id] = np.asarray(templates, dtype=np.float32).reshape(-1, ENCODING_DIMENSIONS)
+
+    def remove(self, user_id):
+        with self._lock:
+            if self._built:
+                self._remove_locked(user_id)
+
+    def _remove_locked(self, user_id):
+        rows = self._rows_of_user.pop(user_id, None)
+        if rows is not None:
+            self._removed[rows] = True
+        self._pending.pop(user_id, None)
+
+    def apply(self, face_encoding):
+        """Refleja en el índice un FaceEncoding recién guardado."""
+        if face_encoding.is_active and face_encoding.encoder_version == CURRENT_ENCODER_VERSION and face_encoding.get_encoding_array() is not None:
+            self.upsert(face_encoding.user_id, face_encoding.get_templates_array())
+        else:
+            self.remove(face_encoding.user_id)
+
+    def sync(self):
+        """
+        Incorpora los cambios hechos desde otros procesos desde la última sincronización.
+        Los del proceso actual llegan por señales, así que la consulta a la BD se omite si
+        la anterior fue hace menos de `sync_interval` segundos.
+        """
+        with self._sync_lock:
+            now = time.monotonic()
+            if self._synced_at is not None and now - self._synced_at < self.sync_interval:
+                return
+            self._sync()
+            self._synced_at = now
+
+    def _sync(self):
+        if not self._built:
+            self.rebuild()
+            return
+        from .models import FaceEncoding
+
+        changed = FaceEncoding.objects.all()
+        if self._watermark is not None:
+            changed = changed.filter(updated_at__gte=self._watermark)
+        for face_encoding in changed.only('user_id', 'encoding_bytes', 'templates_bytes', 'is_active', 'encoder_version', 'updated_at'):
+            self.apply(face_encoding)
+            if self._watermark is None or face_encoding.updated_at > self._watermark:
+                self._watermark = face_encoding.updated_at
+
+        pending_changes = len(self._pending) + int(self._removed.sum())
+        if self._active_queryset().count() != self._live_size() or pending_changes > max(256, len(self._user_ids) // 10):
+            # Hubo borrados en otro proceso o demasiados cambios acumulados: se reentrena.
+            self.rebuild()
+
+    def search(self, encoding, k=5, exclude_user_id=None):
+        """Devuelve hasta k pares (user_id, distancia a su plantilla más cercana) ordenados, con distancia exacta."""
+        query = np.asarray(encoding, dtype=np.float32).reshape(1, ENCODING_DIMENSIONS)
+        with self._lock:
+            if self._lists is None:
+                rows = np.arange(len(self._user_ids))
+            else:
+                nearest = distance_matrix(query, self._centroids)[0].argsort()[:self.nprobe]
+                rows = np.concatenate([self._lists[i] for i in nearest])
+            rows = rows[~self._removed[rows]]
+            user_ids = self._user_ids[rows]
+            vectors = self._vectors[rows]
+            if self._pending:
+                pending_ids = np.repeat(np.fromiter(self._pending.keys(), dtype=np.int64), [len(t) for t in self._pending.values()])
+                user_ids = np.concatenate([user_ids, pending_ids])
+                vectors = np.vstack([vectors, *self._pending.values()])
+
+        if exclude_user_id is not None:
+            keep = user_ids != exclude_user_id
+            user_ids, vectors = user_ids[keep], vectors[keep]
+        if len(user_ids) == 0:
+            return []
+        distances = distance_matrix(query, vectors)[0]
+        order = np.argsort(distances)
+        # Primera aparición de cada usuario en el orden por distancia = su plantilla más cercana.
+        _, first = np.unique(user_ids[order], return_index=True)
+        top = order[np.sort(first)][:k]
+        return [(int(user_ids[i]), float(distances[i])) for i in top]
+
+    def find_duplicate(self, encoding, exclude_user_id=None, tolerance=DUPLICATE_TOLERANCE):
+        """user_id de un rostro ya registrado a menos de `tolerance`, o None."""
+        self.sync()
+        candidates = self.search(encoding, k=1, exclude_user_id=exclude_user_id)
+        if candidates and candidates[0][1] <= tolerance:
+            return candidates[0][0]
+        return None
+
+
+face_index = FaceIndex(
+    nprobe=getattr(settings, 'FACE_INDEX_NPROBE', 16),
+    min_ivf_size=getattr(settings, 'FACE_INDEX_MIN_IVF_SIZE', 2048),
+    sync_interval=getattr(settings, 'FACE_INDEX_SYNC_INTERVAL', 30),
+)
@@ -0,0 +1,222 @@
+# face_recognition_app/ingest.py
+"""
+Carga en lote de eventos de asistencia capturados por kioscos sin conexión.
+
+Cada evento trae el estudiante (su ID o una codificación facial calculada en el
+kiosco), la sesión, la hora de captura y un client_event_id único. Los eventos ya
+cargados se omiten, los capturados fuera del horario de su sesión se rechazan, las codificaciones se resuelven con una sola operación matricial
+por ficha y la asistencia se actualiza con bulk_update dentro de una transacción. El
+estado present/late se decide con la hora de captura, no con la de carga.
+"""
+import base64
+import binascii
+import logging
+from datetime import datetime
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import make_aware
+
+from attendance.models import Attendance, AttendanceSession
+from .cache import encoding_cache
+from .matching import distance_matrix, min_per_student
+from .models import CURRENT_ENCODER_VERSION, ENCODING_DTYPE, ENCODING_NBYTES, CheckInEvent, FaceRecognitionSettings
+
+logger = logging.getLogger(__name__)
+
+# Tamaño de las listas en las consultas IN.
+QUERY_CHUNK = 2000
+MAX_REPORTED_REJECTIONS = 100
+
+
+def _chunks(items, size=QUERY_CHUNK):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _parse_event(raw):
+    """Valida un evento y lo normaliza. Lanza ValueError con el motivo del rechazo."""
+    if not isinstance(raw, dict):
+        raise ValueError("El evento debe ser un objeto.")
+    event_id = raw.get('client_event_id')
+    if not isinstance(event_id, str) or not 0 < len(event_id) <= 64:
+        raise ValueError("client_event_id es obligatorio (máximo 64 caracteres).")
+    try:
+        session_id = int(raw.get('session_id'))
+    except (TypeError, ValueError):
+        raise ValueError("session_id es obligatorio.")
+    captured_at = raw.get('captured_at')
+    captured_at = parse_datetime(captured_at) if isinstance(captured_at, str) else None
+    if captured_at is None:
+        raise ValueError("captured_at debe ser una fecha ISO 8601.")
+    if timezone.is_naive(captured_at):
+        captured_at = make_aware(captured_at)
+
+    student_id, encoding = raw.get('student_id'), raw.get('encoding')
+    if (student_id is None) == (encoding is None):
+        raise ValueError("Se requiere student_id o encoding (solo uno).")
+    if encoding is not None:
+        if raw.get('encoder_version') != CURRENT_ENCODER_VERSION:
+            raise ValueError(f"encoder_version debe ser '{CURRENT_ENCODER_VERSION}'.")
+        try:
+            payload = base64.b64decode(encoding, validate=True)
+        except (binascii.Error, TypeError, ValueError):
+            raise ValueError("encoding debe estar en base64.")
+        if len(payload) != ENCODING_NBYTES:
+            raise ValueError(f"encoding debe tener {ENCODING_NBYTES} bytes (128 float32).")
+        encoding = np.frombuffer(payload, dtype=ENCODING_DTYPE)
+    else:
+        try:
+            student_id = int(student_id)
+        except (TypeError, ValueError):
+            raise ValueError("student_id debe ser un entero.")
+    return {
+        'client_event_id': event_id,
+        'session_id': session_id,
+        'captured_at': captured_at,
+        'student_id': student_id,
+        'encoding': encoding,
+    }
+
+
+def _resolve_encodings(events, sessions, threshold):
+    """Asigna student_id a los eventos con codificación: distancia mínima por estudiante de la ficha."""
+    by_ficha = {}
+    for event in events:
+        if event['encoding'] is not None:
+            by_ficha.setdefault(sessions[event['session_id']].ficha_id, []).append(event)
+
+    for ficha_id, ficha_events in by_ficha.items():
+        known_encodings, known_student_ids = encoding_cache.get(ficha_id)
+        if len(known_student_ids) == 0:
+            continue
+        # Cada evento es una captura independiente: se toma el estudiante más cercano, sin asignación uno a uno.
+        distances, student_ids = min_per_student(
+            distance_matrix(np.stack([event['encoding'] for event in ficha_events]), known_encodings),
+            known_student_ids,
+        )
+        best = distances.argmin(axis=1)
+        best_distances = distances[np.arange(len(ficha_events)), best]
+        for event, column, distance in zip(ficha_events, best, best_distances):
+            if distance <= threshold:
+                event['student_id'] = int(student_ids[column])
+
+
+def ingest_check_in_events(raw_events, user):
+    """
+    Procesa una carga de eventos del kiosco para las sesiones de las fichas del instructor.
+    Devuelve un resumen con el número de eventos por resultado y los rechazados.
+    """
+    summary = {'received': len(raw_events), 'duplicates': 0, 'rejected': []}
+    summary.update({status: 0 for status, _ in CheckInEvent.STATUS_CHOICES})
+
+    events, seen = [], set()
+    for index, raw in enumerate(raw_events):
+        try:
+            event = _parse_event(raw)
+        except ValueError as e:
+            summary['rejected'].append({'index': index, 'client_event_id': raw.get('client_event_id') if isinstance(raw, dict) else None, 'error': str(e)})
+            continue
+        if event['client_event_id'] in seen:
+            summary['duplicates'] += 1
+            continue
+        seen.add(event['client_event_id'])
+        event['index'] = index
+        events.append(event)
+
+    # Idempotencia: los eventos ya cargados en otra petición se omiten.
+    already_loaded = set()
+    for chunk in _chunks(seen):
+        already_loaded.update(CheckInEvent.objects.filter(client_event_id__in=chunk).values_list('client_event_id', flat=True))
+    summary['duplicates'] += len(already_loaded)
+    events = [event for event in events if event['client_event_id'] not in already_loaded]
+
+    sessions = {}
+    for chunk in _chunks({event['session_id'] for event in events}):
+        sessions.update(
+            (session.id, session)
+            for session in AttendanceSession.objects.filter(id__in=chunk, ficha__instructors=user).only(
+                'id', 'ficha_id', 'date', 'start_time', 'end_time', 'permisividad',
+            )
+        )
+    windows = {
+        session.id: (make_aware(datetime.combine(session.date, session.start_time)), make_aware(datetime.combine(session.date, session.end_time)))
+        for session in sessions.values()
+    }
+    accepted = []
+    for event in events:
+        if event['session_id'] not in sessions:
+            error = "La sesión no existe o no pertenece a sus fichas."
+        elif not windows[event['session_id']][0] <= event['captured_at'] <= windows[event['session_id']][1]:
+            error = "captured_at está fuera de la fecha y el horario de la sesión."
+        else:
+            accepted.append(event)
+            continue
+        summary['rejected'].append({'index': event['index'], 'client_event_id': event['client_event_id'], 'error': error})
+    events = accepted
+
+    _resolve_encodings(events, sessions, FaceRecognitionSettings.get_settings().confidence_threshold)
+
+    grace_deadlines = {
+        session.id: make_aware(datetime.combine(session.date, session.start_time)) + timezone.timedelta(minutes=session.permisividad)
+        for session in sessions.values()
+    }
+    # La captura más temprana de cada estudiante en cada sesión es la que cuenta.
+    events.sort(key=lambda event: event['captured_at'])
+    first_capture = {}
+    for event in events:
+        if event['student_id'] is not None:
+            first_capture.setdefault((event['session_id'], event['student_id']), event)
+
+    with transaction.atomic():
+        attendances = {}
+        student_ids = {student_id for _, student_id in first_capture}
+        for session_chunk in _chunks(sessions):
+            for student_chunk in _chunks(student_ids):
+                for attendance in Attendance.objects.select_for_update().filter(
+                    session_id__in=session_chunk, student_id__in=student_chunk,
+                ).only('id', 'session_id', 'student_id', 'status', 'check_in_time', 'verified_by_face'):
+                    attendances[(attendance.session_id, attendance.student_id)] = attendance
+
+        changed = []
+        for key, event in first_capture.items():
+            attendance = attendances.get(key)
+            if attendance is None or attendance.status != 'absent':
+                continue
+            attendance.status = 'present' if event['captured_at'] <= grace_deadlines[key[0]] else 'late'
+            attendance.check_in_time = event['captured_at']
+            attendance.verified_by_face = True
+            changed.append(attendance)
+            event['applied'] = True
+        Attendance.objects.bulk_update(changed, ['status', 'check_in_time', 'verified_by_face'], batch_size=500)
+
+        records = []
+        for event in events:
+            if event['student_id'] is None:
+                status = 'unmatched'
+            elif (event['session_id'], event['student_id']) not in attendances:
+                status = 'not_enrolled'
+            elif event.get('applied'):
+                status = 'applied'
+            else:
+                status = 'already_checked_in'
+            summary[status] += 1
+            records.append(CheckInEvent(
+                client_event_id=event['client_event_id'],
+                session_id=event['session_id'],
+                student_id=event['student_id'] if status in ('applied', 'already_checked_in') else None,
+                captured_at=event['captured_at'],
+                status=status,
+            ))
+        CheckInEvent.objects.bulk_create(records, batch_size=1000, ignore_conflicts=True)
+
+    summary['rejected_count'] = len(summary['rejected'])
+    summary['rejected'] = summary['rejected'][:MAX_REPORTED_REJECTIONS]
+    logger.info(
+        f"Carga de kiosco: {summary['received']} eventos, {summary['applied']} asistencias registradas, "
+        f"{summary['duplicates']} duplicados, {summary['rejected_count']} rechazados."
+    )
+    return summary
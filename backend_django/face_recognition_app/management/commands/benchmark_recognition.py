@@ -0,0 +1,69 @@
+# face_recognition_app/management/commands/benchmark_recognition.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from face_recognition_app.backends import DETECTORS
+from face_recognition_app.benchmark import DEFAULT_FACES, DEFAULT_ROSTERS, bench_tiers, compare, run_benchmark
+from face_recognition_app.models import FaceRecognitionSettings
+
+
+def _int_list(value):
+    try:
+        return tuple(int(item) for item in value.split(',') if item)
+    except ValueError:
+        raise CommandError(f"Lista de enteros inválida: {value}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide por etapas (decodificación, detección, codificación, emparejamiento y BD) el flujo de "
+        "reconocimiento con listas sintéticas y fotogramas de 1/10/30 rostros. Escribe resultados en JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rosters', default=','.join(map(str, DEFAULT_ROSTERS)), help="Tamaños de lista separados por coma")
+        parser.add_argument('--faces', default=','.join(map(str, DEFAULT_FACES)), help="Rostros por fotograma separados por coma")
+        parser.add_argument('--iterations', type=int, default=10, help="Repeticiones medidas por etapa")
+        parser.add_argument('--templates', type=int, default=1, help="Plantillas por estudiante en la lista sintética")
+        parser.add_argument('--skip-db', action='store_true', help="No medir la escritura de asistencia")
+        parser.add_argument('--detector', choices=sorted(DETECTORS), help="Detector a medir en lugar del configurado (p. ej. para comparar hog y opencv_haar)")
+        parser.add_argument('--tiers', action='store_true', help="Comparar también los niveles de calidad de codificación (landmarks y jitters)")
+        parser.add_argument('--output', help="Archivo JSON de salida (por defecto, salida estándar)")
+        parser.add_argument('--compare', help="JSON de una ejecución anterior para mostrar la variación de p50")
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError("--iterations debe ser al menos 1.")
+
+        def progress(row):
+            stages = ', '.join(f"{stage} {stats['p50_ms']:.1f}" for stage, stats in row['stages'].items())
+            self.stderr.write(f"lista={row['roster']} rostros={row['faces']}: {stages} ms (p50), {row['throughput_fps']} fps")
+
+        report = run_benchmark(
+            rosters=_int_list(options['rosters']),
+            faces=_int_list(options['faces']),
+            iterations=options['iterations'],
+            templates=options['templates'],
+            include_db=not options['skip_db'],
+            progress=progress,
+            detector=options['detector'],
+        )
+        if options['tiers']:
+            report['tiers'] = bench_tiers(FaceRecognitionSettings.get_settings(), options['iterations'])
+            for row in report['tiers']:
+                self.stderr.write(
+                    f"codificación {row['model']} x{row['num_jitters']}: {row['encode']['p50_ms']:.1f} ms (p50), "
+                    f"distancia en vivo media {row['distance_mean']} / máx. {row['distance_max']}"
+                )
+        if options['compare']:
+            with open(options['compare']) as baseline:
+                report['comparison'] = compare(json.load(baseline), report)
+
+        payload = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(payload)
+            self.stderr.write(self.style.SUCCESS(f"Resultados guardados en {options['output']}"))
+        else:
+            self.stdout.write(payload)
@@ -0,0 +1,64 @@
+# face_recognition_app/management/commands/reencode_faces.py
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from face_recognition_app.models import CURRENT_ENCODER_VERSION, FaceEncoding
+from face_recognition_app.services import get_face_encoding_from_image
+
+
+class Command(BaseCommand):
+    help = (
+        "Muestra cuántas codificaciones activas se generaron con otro codificador (FACE_RECOGNITION_ENCODER) "
+        "y, con --apply, recalcula todas sus plantillas desde la imagen de perfil y las demás imágenes de "
+        "enrolamiento guardadas. El reconocimiento ignora las codificaciones de otra versión, así que hay que "
+        "ejecutarlo después de cambiar de codificador."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--apply', action='store_true', help="Recalcular las codificaciones desactualizadas (por defecto solo se informa)")
+
+    def _encode(self, storage, name):
+        """Codificación de una imagen guardada, o None si falta el archivo o no tiene exactamente un rostro."""
+        if not storage.exists(name):
+            return None
+        with storage.open(name, 'rb') as image_file:
+            return get_face_encoding_from_image(image_file)
+
+    def handle(self, *args, **options):
+        active = FaceEncoding.objects.filter(is_active=True)
+        for row in active.values('encoder_version').annotate(total=Count('id')).order_by('encoder_version'):
+            marker = ' (actual)' if row['encoder_version'] == CURRENT_ENCODER_VERSION else ''
+            self.stdout.write(f"{row['encoder_version'] or '(vacía)'}{marker}: {row['total']} codificaciones activas")
+
+        stale = active.exclude(encoder_version=CURRENT_ENCODER_VERSION).select_related('user')
+        if not options['apply']:
+            self.stdout.write(f"{stale.count()} codificaciones requieren recalcularse con '{CURRENT_ENCODER_VERSION}'. Use --apply.")
+            return
+
+        updated, without_image, failed, incomplete = 0, [], [], []
+        for face_encoding in stale.iterator():
+            if not face_encoding.profile_image:
+                without_image.append(face_encoding.user.username)
+                continue
+            storage = face_encoding.profile_image.storage
+            encoding = self._encode(storage, face_encoding.profile_image.name)
+            if encoding is None:
+                failed.append(face_encoding.user.username)
+                continue
+            # La plantilla de la imagen de perfil va primero, como en el enrolamiento.
+            templates = [self._encode(storage, name) for name in face_encoding.template_images]
+            # Los enrolamientos anteriores a template_images no guardaron sus demás imágenes.
+            previous = face_encoding.get_templates_array()
+            if any(template is None for template in templates) or (previous is not None and len(previous) > 1 + len(templates)):
+                incomplete.append(face_encoding.user.username)
+            face_encoding.set_templates([encoding, *templates], CURRENT_ENCODER_VERSION)
+            face_encoding.save()
+            updated += 1
+
+        self.stdout.write(self.style.SUCCESS(f"{updated} codificaciones recalculadas con '{CURRENT_ENCODER_VERSION}'."))
+        if without_image:
+            self.stdout.write(self.style.WARNING(f"Sin imagen de perfil, deben volver a enrolarse: {', '.join(without_image)}"))
+        if failed:
+            self.stdout.write(self.style.WARNING(f"No se detectó exactamente un rostro en la imagen de: {', '.join(failed)}"))
+        if incomplete:
+            self.stdout.write(self.style.WARNING(f"No se recalcularon todas las plantillas (imagen no guardada o sin rostro), conviene volver a enrolar: {', '.join(incomplete)}"))
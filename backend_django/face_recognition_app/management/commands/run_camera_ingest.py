@@ -0,0 +1,71 @@
+# face_recognition_app/management/commands/run_camera_ingest.py
+import json
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+from face_recognition_app.camera import CameraIngestor
+
+
+class Command(BaseCommand):
+    help = (
+        "Lee fotogramas de cámaras RTSP/HTTP o archivos de video y los envía al reconocimiento "
+        "de la sesión de asistencia asociada, sin pasar por el navegador."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--session', help="ID de la AttendanceSession, o varios separados por comas si la cámara cubre sesiones simultáneas")
+        parser.add_argument('--source', help="URL de la cámara (rtsp://, http://) o ruta de un archivo de video")
+        parser.add_argument('--camera-id', default='', help="Identificador de la cámara para los registros")
+        parser.add_argument('--config', help='JSON con varias cámaras: [{"session": 1 (o [1, 2]), "source": "rtsp://...", "camera_id": "aula-1"}]')
+        parser.add_argument('--min-interval', type=float, default=0.5, help="Segundos mínimos entre fotogramas analizados")
+        parser.add_argument('--max-interval', type=float, default=5.0, help="Segundos máximos entre fotogramas analizados")
+        parser.add_argument('--motion-threshold', type=float, default=0.02, help="Cambio medio mínimo (0-1) para analizar un fotograma")
+
+    def handle(self, *args, **options):
+        if options['config']:
+            with open(options['config']) as config_file:
+                cameras = json.load(config_file)
+        elif options['session'] and options['source']:
+            sessions = [int(id_) for id_ in options['session'].split(',') if id_.strip()]
+            cameras = [{'session': sessions if len(sessions) > 1 else sessions[0], 'source': options['source'], 'camera_id': options['camera_id']}]
+        else:
+            raise CommandError("Indique --session y --source, o --config.")
+
+        ingestors = [
+            CameraIngestor(
+                camera['source'], camera['session'], camera.get('camera_id', ''),
+                min_interval=options['min_interval'],
+                max_interval=options['max_interval'],
+                motion_threshold=options['motion_threshold'],
+            )
+            for camera in cameras
+        ]
+        if len(ingestors) == 1:
+            self._report(ingestors[0], ingestors[0].run())
+            return
+
+        # Un hilo por cámara; el trabajo de CPU lo hace el pool de procesos de reconocimiento.
+        threads = [threading.Thread(target=self._run, args=(ingestor,), daemon=True) for ingestor in ingestors]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            for ingestor in ingestors:
+                ingestor.stop()
+            for thread in threads:
+                thread.join()
+
+    def _run(self, ingestor):
+        try:
+            self._report(ingestor, ingestor.run())
+        except RuntimeError as e:
+            self.stderr.write(self.style.ERROR(str(e)))
+
+    def _report(self, ingestor, stats):
+        self.stdout.write(self.style.SUCCESS(
+            f"{ingestor.camera_id}: {stats['processed']} fotogramas analizados, {stats['still']} sin movimiento, "
+            f"{stats['recognized']} estudiantes registrados."
+        ))
@@ -0,0 +1,32 @@
+# face_recognition_app/management/commands/run_recognition_workers.py
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from face_recognition_app.workers import serve_worker_pool, worker_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Inicia un pool de procesos de reconocimiento compartido por todos los procesos WSGI. "
+        "Configure FACE_RECOGNITION_WORKER_ADDRESS con la misma dirección en el servidor web."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--address', help="host:puerto donde escuchar (por defecto FACE_RECOGNITION_WORKER_ADDRESS o 127.0.0.1:50055)")
+        parser.add_argument('--workers', type=int, help="Número de procesos (por defecto FACE_RECOGNITION_WORKERS o, si es 0, uno por núcleo)")
+
+    def handle(self, *args, **options):
+        config = worker_settings()
+        if not config['authkey']:
+            raise CommandError("Configure FACE_RECOGNITION_WORKER_AUTHKEY: el pool compartido acepta tareas de cualquiera que conozca la clave.")
+        address = options['address']
+        if address:
+            host, port = address.rsplit(':', 1)
+            address = (host, int(port))
+        else:
+            address = config['address'] or ('127.0.0.1', 50055)
+        size = options['workers'] or config['size'] or os.cpu_count() or 1
+
+        self.stdout.write(self.style.SUCCESS(f"Pool de reconocimiento con {size} procesos escuchando en {address[0]}:{address[1]}"))
+        serve_worker_pool(address, config['authkey'], size, config['live_reserved'], config['timeout'])
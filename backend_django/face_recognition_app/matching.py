@@ -0,0 +1,141 @@
+# face_recognition_app/matching.py
+import numpy as np
+
+
+def distance_matrix(face_encodings, known_encodings):
+    """
+    Calcula la matriz de distancias euclidianas (caras x conocidas) en una sola operación.
+
+    Usa la expansión ||a - b||² = ||a||² + ||b||² - 2·a·b en float32, de modo que el
+    trabajo principal es un único producto de matrices (BLAS).
+    """
+    faces = np.asarray(face_encodings, dtype=np.float32).reshape(-1, 128)
+    known = np.asarray(known_encodings, dtype=np.float32).reshape(-1, 128)
+    squared = (
+        np.einsum('ij,ij->i', faces, faces)[:, None]
+        + np.einsum('ij,ij->i', known, known)[None, :]
+        - 2.0 * (faces @ known.T)
+    )
+    # Los errores de redondeo pueden producir valores ligeramente negativos.
+    np.maximum(squared, 0.0, out=squared)
+    return np.sqrt(squared, out=squared)
+
+
+def _linear_sum_assignment(cost):
+    """
+    Asignación de costo mínimo (algoritmo húngaro con potenciales) para una matriz
+    rectangular con filas <= columnas. Devuelve, para cada fila, la columna asignada.
+    """
+    n_rows, n_cols = cost.shape
+    u = np.zeros(n_rows + 1)
+    v = np.zeros(n_cols + 1)
+    # row_of_col[j] = fila (1-indexada) asignada a la columna j; 0 = libre.
+    row_of_col = np.zeros(n_cols + 1, dtype=np.int64)
+    way = np.zeros(n_cols + 1, dtype=np.int64)
+
+    for row in range(1, n_rows + 1):
+        row_of_col[0] = row
+        col = 0
+        min_to = np.full(n_cols + 1, np.inf)
+        used = np.zeros(n_cols + 1, dtype=bool)
+        while True:
+            used[col] = True
+            current_row = row_of_col[col]
+            free = ~used[1:]
+            reduced = cost[current_row - 1] - u[current_row] - v[1:]
+            improve = free & (reduced < min_to[1:])
+            min_to[1:][improve] = reduced[improve]
+            way[1:][improve] = col
+            candidates = np.where(free, min_to[1:], np.inf)
+            next_col = int(np.argmin(candidates)) + 1
+            delta = candidates[next_col - 1]
+            used_cols = np.flatnonzero(used)
+            u[row_of_col[used_cols]] += delta
+            v[used_cols] -= delta
+            min_to[1:][free] -= delta
+            col = next_col
+            if row_of_col[col] == 0:
+                break
+        while col:
+            previous = way[col]
+            row_of_col[col] = row_of_col[previous]
+            col = previous
+
+    assignment = np.full(n_rows, -1, dtype=np.int64)
+    assigned_cols = np.flatnonzero(row_of_col[1:])
+    assignment[row_of_col[assigned_cols + 1] - 1] = assigned_cols
+    return assignment
+
+
+def assign_matches(distances, threshold):
+    """
+    Asignación uno a uno globalmente óptima entre caras detectadas y rostros conocidos.
+
+    Maximiza el número de coincidencias bajo el umbral y, entre ellas, minimiza la
+    distancia total; así dos caras nunca se acreditan al mismo estudiante.
+    Devuelve una lista de tuplas (índice_cara, índice_conocido, distancia).
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    if distances.size == 0:
+        return []
+
+    # Solo participan las caras y rostros conocidos con al menos un candidato válido.
+    valid = distances <= threshold
+    face_indices = np.flatnonzero(valid.any(axis=1))
+    known_indices = np.flatnonzero(valid.any(axis=0))
+    if face_indices.size == 0:
+        return []
+
+    sub_distances = distances[np.ix_(face_indices, known_indices)]
+    sub_valid = valid[np.ix_(face_indices, known_indices)]
+    # Un par no válido cuesta más que cualquier combinación de pares válidos.
+    penalty = float(sub_distances[sub_valid].sum()) + 1.0
+    cost = np.where(sub_valid, sub_distances, penalty)
+
+    transposed = cost.shape[0] > cost.shape[1]
+    assignment = _linear_sum_assignment(cost.T if transposed else cost)
+
+    matches = []
+    for row, col in enumerate(assignment):
+        if col < 0:
+            continue
+        face_row, known_col = (col, row) if transposed else (row, col)
+        if sub_valid[face_row, known_col]:
+            matches.append((
+                int(face_indices[face_row]),
+                int(known_indices[known_col]),
+                float(sub_distances[face_row, known_col]),
+            ))
+    matches.sort()
+    return matches
+
+
+def min_per_student(distances, student_ids):
+    """
+    Reduce la matriz caras x plantillas a caras x estudiantes tomando la distancia mínima
+    entre las plantillas de cada estudiante. Las plantillas de un mismo estudiante deben
+    ser contiguas (como las entrega FichaEncodingCache).
+    Devuelve (distancias reducidas, IDs de estudiante por columna).
+    """
+    student_ids = np.asarray(student_ids)
+    if len(student_ids) == 0:
+        return distances, student_ids
+    starts = np.flatnonzero(np.r_[True, student_ids[1:] != student_ids[:-1]])
+    if len(starts) == len(student_ids):
+        return distances, student_ids
+    return np.minimum.reduceat(distances, starts, axis=1), student_ids[starts]
+
+
+def match_faces(face_encodings, known_encodings, known_student_ids, threshold):
+    """
+    Empareja las codificaciones de un fotograma con las plantillas conocidas en un solo paso.
+    Devuelve ([(índice_cara, student_id, distancia)], distancias caras x estudiantes).
+    """
+    if len(face_encodings) == 0 or len(known_encodings) == 0:
+        return [], np.empty((len(face_encodings), 0), dtype=np.float32)
+    distances, student_ids = min_per_student(distance_matrix(face_encodings, known_encodings), known_student_ids)
+    matches = [
+        (face_index, int(student_ids[known_index]), distance)
+        for face_index, known_index, distance in assign_matches(distances, threshold)
+    ]
+    return matches, distances
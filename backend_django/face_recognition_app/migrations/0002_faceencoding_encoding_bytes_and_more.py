@@ -0,0 +1,75 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:12
+
+import json
+
+import numpy as np
+from django.db import migrations, models
+
+import face_recognition_app.models
+
+BATCH_SIZE = 500
+ENCODING_DTYPE = np.dtype('<f4')
+
+
+def json_to_binary(apps, schema_editor):
+    """Convierte las codificaciones JSON existentes a bytes float32, por lotes."""
+    FaceEncoding = apps.get_model('face_recognition_app', 'FaceEncoding')
+    batch = []
+    for face_encoding in FaceEncoding.objects.only('id', 'encoding_data').iterator(chunk_size=BATCH_SIZE):
+        try:
+            encoding = json.loads(face_encoding.encoding_data)
+        except (json.JSONDecodeError, TypeError):
+            encoding = None
+        if encoding and len(encoding) == 128:
+            face_encoding.encoding_bytes = np.asarray(encoding, dtype=ENCODING_DTYPE).tobytes()
+        else:
+            face_encoding.encoding_bytes = b''
+        batch.append(face_encoding)
+        if len(batch) >= BATCH_SIZE:
+            FaceEncoding.objects.bulk_update(batch, ['encoding_bytes'])
+            batch = []
+    if batch:
+        FaceEncoding.objects.bulk_update(batch, ['encoding_bytes'])
+
+
+def binary_to_json(apps, schema_editor):
+    FaceEncoding = apps.get_model('face_recognition_app', 'FaceEncoding')
+    batch = []
+    for face_encoding in FaceEncoding.objects.only('id', 'encoding_bytes').iterator(chunk_size=BATCH_SIZE):
+        encoding_bytes = bytes(face_encoding.encoding_bytes)
+        if len(encoding_bytes) == 128 * ENCODING_DTYPE.itemsize:
+            face_encoding.encoding_data = json.dumps(np.frombuffer(encoding_bytes, dtype=ENCODING_DTYPE).tolist())
+        else:
+            face_encoding.encoding_data = '[]'
+        batch.append(face_encoding)
+        if len(batch) >= BATCH_SIZE:
+            FaceEncoding.objects.bulk_update(batch, ['encoding_data'])
+            batch = []
+    if batch:
+        FaceEncoding.objects.bulk_update(batch, ['encoding_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('face_recognition_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='faceencoding',
+            name='encoding_bytes',
+            field=models.BinaryField(default=b'', help_text='Codificación facial: 128 float32 little-endian', max_length=512),
+        ),
+        migrations.AddField(
+            model_name='faceencoding',
+            name='encoder_version',
+            field=models.CharField(db_index=True, default=face_recognition_app.models.current_encoder_version, help_text='Versión del codificador que generó la codificación', max_length=32),
+        ),
+        migrations.AlterField(
+            model_name='faceencoding',
+            name='encoding_data',
+            field=models.TextField(blank=True, default='', help_text='Codificación facial almacenada como JSON string'),
+        ),
+        migrations.RunPython(json_to_binary, binary_to_json),
+    ]
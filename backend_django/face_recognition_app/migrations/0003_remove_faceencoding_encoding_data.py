@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('face_recognition_app', '0002_faceencoding_encoding_bytes_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='faceencoding',
+            name='encoding_data',
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:39
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('face_recognition_app', '0003_remove_faceencoding_encoding_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facerecognitionsettings',
+            name='detection_mode',
+            field=models.CharField(choices=[('full', 'Resolución completa'), ('adaptive', 'Multi-escala adaptativa')], default='full', help_text='Estrategia de detección: resolución completa o primera pasada sobre una copia reducida', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='facerecognitionsettings',
+            name='detection_scale',
+            field=models.FloatField(default=0.5, help_text='Factor de reducción de la primera pasada en modo adaptativo (0.1-1)', validators=[django.core.validators.MinValueValidator(0.1), django.core.validators.MaxValueValidator(1.0)]),
+        ),
+        migrations.AddField(
+            model_name='facerecognitionsettings',
+            name='detection_upsample',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Veces que se sobremuestrea la imagen para encontrar rostros pequeños (number_of_times_to_upsample)'),
+        ),
+        migrations.AddField(
+            model_name='facerecognitionsettings',
+            name='small_face_region',
+            field=models.FloatField(default=0.0, help_text='Fracción superior del fotograma donde se esperan rostros pequeños y siempre se sobremuestrea (0 = desactivado)'),
+        ),
+        migrations.AlterField(
+            model_name='facerecognitionsettings',
+            name='confidence_threshold',
+            field=models.FloatField(default=0.6, help_text='Umbral de confianza para considerar una coincidencia válida (menor valor = más estricto)'),
+        ),
+    ]
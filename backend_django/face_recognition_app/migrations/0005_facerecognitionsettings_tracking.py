@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('face_recognition_app', '0004_facerecognitionsettings_detection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facerecognitionsettings',
+            name='enable_tracking',
+            field=models.BooleanField(default=True, help_text='No volver a codificar rostros ya reconocidos en fotogramas recientes de la sesión'),
+        ),
+        migrations.AddField(
+            model_name='facerecognitionsettings',
+            name='tracking_ttl_seconds',
+            field=models.PositiveIntegerField(default=15, help_text='Segundos que se conserva un rostro seguido si deja de detectarse'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('face_recognition_app', '0005_facerecognitionsettings_tracking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='faceencoding',
+            name='templates_bytes',
+            field=models.BinaryField(default=b'', help_text='Plantillas de enrolamiento: k codificaciones float32 concatenadas (encoding_bytes guarda su centroide)'),
+        ),
+        migrations.AddField(
+            model_name='faceencoding',
+            name='template_images',
+            field=models.JSONField(blank=True, default=list, help_text='Imágenes (rutas en el almacenamiento) de las plantillas 2..k, para recalcularlas al cambiar de codificador; la primera es profile_image'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('face_recognition_app', '0006_faceencoding_templates_bytes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='faceverificationlog',
+            name='best_distance',
+            field=models.FloatField(blank=True, help_text='Menor distancia entre los rostros del fotograma y las plantillas de la ficha', null=True),
+        ),
+        migrations.AddField(
+            model_name='faceverificationlog',
+            name='db_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='faceverificationlog',
+            name='decode_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='faceverificationlog',
+            name='detect_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='faceverificationlog',
+            name='encode_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='faceverificationlog',
+            name='faces_detected',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='faceverificationlog',
+            name='faces_matched',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='faceverificationlog',
+            name='match_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='faceverificationlog',
+            name='source',
+            field=models.CharField(blank=True, default='', help_text='Cámara o canal desde donde llegó el fotograma', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='faceverificationlog',
+            name='total_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='faceverificationlog',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='face_verification_logs', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='faceverificationlog',
+            index=models.Index(fields=['session', 'created_at'], name='face_recogn_session_4fdad2_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('face_recognition_app', '0007_faceverificationlog_stage_timings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facerecognitionsettings',
+            name='decode_min_width',
+            field=models.PositiveIntegerField(default=640, help_text='Los JPEG más anchos se decodifican reducidos (1/2, 1/4 u 1/8) sin bajar de este ancho (0 = resolución completa)'),
+        ),
+    ]
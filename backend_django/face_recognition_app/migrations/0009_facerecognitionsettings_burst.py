@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('face_recognition_app', '0008_facerecognitionsettings_decode_min_width'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facerecognitionsettings',
+            name='burst_confidence_threshold',
+            field=models.FloatField(default=0.6, help_text='Umbral de distancia para las ráfagas de fotogramas; puede ser más permisivo que confidence_threshold gracias a la votación'),
+        ),
+        migrations.AddField(
+            model_name='facerecognitionsettings',
+            name='burst_min_votes',
+            field=models.PositiveSmallIntegerField(default=2, help_text='Fotogramas de la ráfaga en los que debe coincidir un estudiante para registrar su asistencia'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0006_ficha_jornada'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('face_recognition_app', '0009_facerecognitionsettings_burst'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckInEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_event_id', models.CharField(max_length=64, unique=True)),
+                ('captured_at', models.DateTimeField(help_text='Momento de la captura en el kiosco')),
+                ('status', models.CharField(choices=[('applied', 'Asistencia registrada'), ('already_checked_in', 'Ya tenía asistencia'), ('unmatched', 'Rostro no reconocido'), ('not_enrolled', 'Estudiante sin registro en la sesión')], max_length=20)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='check_in_events', to='attendance.attendancesession')),
+                ('student', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Evento de Asistencia sin Conexión',
+                'verbose_name_plural': 'Eventos de Asistencia sin Conexión',
+                'ordering': ['-captured_at'],
+            },
+        ),
+    ]
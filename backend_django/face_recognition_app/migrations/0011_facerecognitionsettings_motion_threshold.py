@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('face_recognition_app', '0010_checkinevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facerecognitionsettings',
+            name='motion_threshold',
+            field=models.FloatField(default=0.0, help_text='Cambio medio mínimo (0-1) respecto al último fotograma procesado de la cámara para volver a detectar; por debajo se reutiliza su resultado. 0 = desactivado; 0.01 sirve para cámaras fijas'),
+        ),
+        migrations.AddField(
+            model_name='facerecognitionsettings',
+            name='motion_max_unchanged_seconds',
+            field=models.PositiveIntegerField(default=30, help_text='Segundos máximos reutilizando el resultado de una escena sin cambios antes de volver a procesarla; conviene varias veces la cadencia de la cámara (el panel envía cada 5 s)'),
+        ),
+        migrations.AlterField(
+            model_name='faceverificationlog',
+            name='status',
+            field=models.CharField(choices=[('success', 'Exitoso'), ('failed', 'Fallido'), ('no_face_detected', 'No se detectó rostro'), ('no_registered_face', 'Sin rostro registrado'), ('unchanged', 'Escena sin cambios'), ('error', 'Error del sistema')], default='failed', max_length=20),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('face_recognition_app', '0011_facerecognitionsettings_motion_threshold'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facerecognitionsettings',
+            name='encoding_workers',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Procesos del pool entre los que se reparte la codificación de los rostros de un mismo fotograma (1 = secuencial; requiere FACE_RECOGNITION_WORKERS > 0)'),
+        ),
+        migrations.AddField(
+            model_name='facerecognitionsettings',
+            name='parallel_encoding_min_faces',
+            field=models.PositiveSmallIntegerField(default=4, help_text='Rostros por codificar a partir de los cuales un fotograma se codifica en paralelo'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('face_recognition_app', '0012_facerecognitionsettings_parallel_encoding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facerecognitionsettings',
+            name='enrollment_landmark_model',
+            field=models.CharField(choices=[('small', '5 puntos (rápido)'), ('large', '68 puntos (preciso)')], default='small', help_text='Landmarks para codificar las fotos de enrolamiento; conviene que coincida con el de vivo (ver benchmark_recognition --tiers)', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='facerecognitionsettings',
+            name='enrollment_num_jitters',
+            field=models.PositiveSmallIntegerField(default=5, help_text='Variaciones aleatorias promediadas por foto de enrolamiento'),
+        ),
+        migrations.AddField(
+            model_name='facerecognitionsettings',
+            name='live_landmark_model',
+            field=models.CharField(choices=[('small', '5 puntos (rápido)'), ('large', '68 puntos (preciso)')], default='small', help_text='Landmarks para codificar los rostros del reconocimiento en vivo', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='facerecognitionsettings',
+            name='live_num_jitters',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Variaciones aleatorias promediadas por rostro en vivo (el costo crece linealmente)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('face_recognition_app', '0013_facerecognitionsettings_encoding_tiers'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='facerecognitionsettings',
+            name='face_detection_model',
+            field=models.CharField(default='hog', help_text='Detector de rostros registrado en backends.py; compare su costo con benchmark_recognition --detector', max_length=50),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('face_recognition_app', '0014_facerecognitionsettings_detector_backends'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facerecognitionsettings',
+            name='quality_max_yaw',
+            field=models.FloatField(default=0.0, help_text='Giro horizontal máximo en grados, estimado con los landmarks, para codificar un rostro (0 = sin máximo; 45 descarta los perfiles)'),
+        ),
+        migrations.AddField(
+            model_name='facerecognitionsettings',
+            name='quality_min_face_size',
+            field=models.PositiveIntegerField(default=0, help_text='Lado mínimo en píxeles (del fotograma original) de un rostro para codificarlo (0 = sin mínimo; 40 descarta los rostros lejanos)'),
+        ),
+        migrations.AddField(
+            model_name='facerecognitionsettings',
+            name='quality_min_sharpness',
+            field=models.FloatField(default=0.0, help_text='Nitidez mínima (varianza del Laplaciano del rostro a 96x96; una foto nítida supera 300) para codificarlo (0 = sin mínimo; 20 descarta los muy movidos)'),
+        ),
+        migrations.AddField(
+            model_name='faceverificationlog',
+            name='faces_skipped',
+            field=models.PositiveIntegerField(default=0, help_text='Rostros descartados por calidad (pequeños, borrosos o girados) antes de codificarlos'),
+        ),
+    ]
@@ -3,12 +3,39 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.conf import settings
-import json
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
 import logging
+import numpy as np
+
+from .backends import DETECTORS, get_encoder
 
 logger = logging.getLogger(__name__)
 User = settings.AUTH_USER_MODEL
 
+# Formato binario de las codificaciones: 128 float32 little-endian (512 bytes).
+ENCODING_DIMENSIONS = 128
+ENCODING_DTYPE = np.dtype('<f4')
+ENCODING_NBYTES = ENCODING_DIMENSIONS * ENCODING_DTYPE.itemsize
+# Máximo de plantillas de enrolamiento que se conservan por estudiante.
+MAX_TEMPLATES = 10
+# Modelos de landmarks de face_recognition para alinear el rostro antes del descriptor.
+LANDMARK_MODEL_CHOICES = [
+    ('small', '5 puntos (rápido)'),
+    ('large', '68 puntos (preciso)'),
+]
+
+
+def current_encoder_version():
+    """Versión del codificador configurado en FACE_RECOGNITION_ENCODER (por defecto face_recognition / dlib ResNet)."""
+    return get_encoder(getattr(settings, 'FACE_RECOGNITION_ENCODER', 'dlib')).version
+
+
+# Generación del codificador que produjo las codificaciones. Al cambiar FACE_RECOGNITION_ENCODER,
+# las codificaciones guardadas con otra versión dejan de usarse: ver el comando reencode_faces.
+CURRENT_ENCODER_VERSION = current_encoder_version()
+
+
 class FaceEncoding(models.Model):
     """
     Modelo para almacenar las codificaciones faciales de los usuarios.
@@ -19,8 +46,25 @@ class FaceEncoding(models.Model):
         on_delete=models.CASCADE, 
         related_name='face_encoding_data'
     )
-    encoding_data = models.TextField(
-        help_text="Codificación facial almacenada como JSON string"
+    encoding_bytes = models.BinaryField(
+        max_length=ENCODING_NBYTES,
+        default=b'',
+        help_text="Codificación facial: 128 float32 little-endian"
+    )
+    templates_bytes = models.BinaryField(
+        default=b'',
+        help_text="Plantillas de enrolamiento: k codificaciones float32 concatenadas (encoding_bytes guarda su centroide)"
+    )
+    template_images = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Imágenes (rutas en el almacenamiento) de las plantillas 2..k, para recalcularlas al cambiar de codificador; la primera es profile_image"
+    )
+    encoder_version = models.CharField(
+        max_length=32,
+        default=current_encoder_version,
+        db_index=True,
+        help_text="Versión del codificador que generó la codificación"
     )
     profile_image = models.ImageField(
         upload_to='face_profiles/',
@@ -43,43 +87,70 @@ class FaceEncoding(models.Model):
         return f"Face encoding for {self.user.username}"
     
     def get_encoding_array(self):
-        """Convierte el JSON string de vuelta a lista de Python"""
-        try:
-            encoding = json.loads(self.encoding_data)
-            logger.info(f"Loaded encoding for user {self.user.username} with length {len(encoding) if encoding else 0}")
-            return encoding
-        except (json.JSONDecodeError, TypeError):
-            logger.error(f"Could not decode encoding for user {self.user.username}")
+        """Devuelve la codificación como arreglo NumPy float32 (sin copia, solo lectura)."""
+        if len(self.encoding_bytes) != ENCODING_NBYTES:
+            logger.error(f"Could not decode encoding for user {self.user_id}")
             return None
+        return np.frombuffer(self.encoding_bytes, dtype=ENCODING_DTYPE)
     
-    def set_encoding_array(self, encoding_array):
-        """Convierte la lista de encoding a JSON string y valida su integridad."""
-        if encoding_array is None or len(encoding_array) != 128:
-            logger.error(f"Intento de guardar una codificación inválida para el usuario {self.user.username}. Longitud: {len(encoding_array) if encoding_array is not None else 'None'}")
+    def get_templates_array(self):
+        """Plantillas de enrolamiento como matriz k x 128 (sin copia); la codificación principal si no hay plantillas."""
+        templates = self.templates_bytes
+        if not templates or len(templates) % ENCODING_NBYTES:
+            encoding = self.get_encoding_array()
+            return None if encoding is None else encoding.reshape(1, ENCODING_DIMENSIONS)
+        return np.frombuffer(templates, dtype=ENCODING_DTYPE).reshape(-1, ENCODING_DIMENSIONS)
+
+    def set_templates(self, encodings, encoder_version=CURRENT_ENCODER_VERSION):
+        """Guarda varias plantillas de enrolamiento y su centroide como codificación principal."""
+        encodings = [encoding for encoding in encodings if encoding is not None][:MAX_TEMPLATES]
+        if not encodings or any(len(encoding) != ENCODING_DIMENSIONS for encoding in encodings):
+            logger.error(f"Intento de guardar plantillas inválidas para el usuario {self.user_id}.")
+            raise ValueError("Las codificaciones faciales proporcionadas son inválidas o están vacías.")
+        templates = np.asarray(encodings, dtype=ENCODING_DTYPE)
+        self.set_encoding_array(templates.mean(axis=0), encoder_version)
+        self.templates_bytes = templates.tobytes()
+
+    def set_profile_template(self, encoding, encoder_version=CURRENT_ENCODER_VERSION):
+        """Reemplaza la plantilla de profile_image (la primera) y conserva las demás si son del mismo codificador."""
+        templates = self.get_templates_array() if self.encoder_version == encoder_version else None
+        self.set_templates([encoding, *([] if templates is None else templates[1:])], encoder_version)
+
+    def set_encoding_array(self, encoding_array, encoder_version=CURRENT_ENCODER_VERSION):
+        """Serializa la codificación a bytes float32 y valida su integridad. Reemplaza las plantillas por esta única codificación."""
+        if encoding_array is None or len(encoding_array) != ENCODING_DIMENSIONS:
+            logger.error(f"Intento de guardar una codificación inválida para el usuario {self.user_id}. Longitud: {len(encoding_array) if encoding_array is not None else 'None'}")
             raise ValueError("La codificación facial proporcionada es inválida o está vacía.")
 
         try:
-            self.encoding_data = json.dumps(encoding_array.tolist() if hasattr(encoding_array, 'tolist') else encoding_array)
-        except (TypeError, AttributeError) as e:
-            logger.error(f"Error al serializar la codificación para el usuario {self.user.username}: {e}")
+            self.encoding_bytes = np.asarray(encoding_array, dtype=ENCODING_DTYPE).tobytes()
+        except (TypeError, ValueError) as e:
+            logger.error(f"Error al serializar la codificación para el usuario {self.user_id}: {e}")
             raise ValueError("No se pudo serializar la codificación facial.")
+        self.templates_bytes = self.encoding_bytes
+        self.encoder_version = encoder_version
+
 
 class FaceVerificationLog(models.Model):
     """
     Modelo para llevar un registro de todos los intentos de verificación facial.
-    Útil para auditoría y análisis de seguridad.
+    Útil para auditoría y análisis de seguridad. Los intentos de reconocimiento grupal
+    (un fotograma de la sesión) no tienen usuario y guardan la duración de cada etapa.
     """
     STATUS_CHOICES = [
         ('success', 'Exitoso'),
         ('failed', 'Fallido'),
         ('no_face_detected', 'No se detectó rostro'),
         ('no_registered_face', 'Sin rostro registrado'),
+        ('unchanged', 'Escena sin cambios'),
         ('error', 'Error del sistema'),
     ]
     
     user = models.ForeignKey(
         User, 
         on_delete=models.CASCADE, 
+        null=True,
+        blank=True,
         related_name='face_verification_logs'
     )
     session = models.ForeignKey(
@@ -114,15 +185,41 @@ class FaceVerificationLog(models.Model):
         blank=True,
         help_text="Mensaje de error si la verificación falló"
     )
+    source = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        help_text="Cámara o canal desde donde llegó el fotograma"
+    )
+    faces_detected = models.PositiveIntegerField(default=0)
+    faces_matched = models.PositiveIntegerField(default=0)
+    faces_skipped = models.PositiveIntegerField(
+        default=0,
+        help_text="Rostros descartados por calidad (pequeños, borrosos o girados) antes de codificarlos"
+    )
+    best_distance = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Menor distancia entre los rostros del fotograma y las plantillas de la ficha"
+    )
+    decode_ms = models.FloatField(null=True, blank=True)
+    detect_ms = models.FloatField(null=True, blank=True)
+    encode_ms = models.FloatField(null=True, blank=True)
+    match_ms = models.FloatField(null=True, blank=True)
+    db_ms = models.FloatField(null=True, blank=True)
+    total_ms = models.FloatField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         verbose_name = "Log de Verificación Facial"
         verbose_name_plural = "Logs de Verificación Facial"
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['session', 'created_at'])]
     
     def __str__(self):
-        return f"{self.user.username} - {self.status} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+        who = self.user.username if self.user_id else f"sesión {self.session_id}"
+        return f"{who} - {self.status} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
 
 class FaceRecognitionSettings(models.Model):
     """
@@ -139,11 +236,97 @@ class FaceRecognitionSettings(models.Model):
     face_detection_model = models.CharField(
         max_length=50,
         default='hog',
+        help_text="Detector de rostros registrado en backends.py; compare su costo con benchmark_recognition --detector"
+    )
+    detection_mode = models.CharField(
+        max_length=20,
+        default='full',
         choices=[
-            ('hog', 'HOG (CPU)'),
-            ('cnn', 'CNN (GPU)'),
+            ('full', 'Resolución completa'),
+            ('adaptive', 'Multi-escala adaptativa'),
         ],
-        help_text="Modelo a usar para detección facial"
+        help_text="Estrategia de detección: resolución completa o primera pasada sobre una copia reducida"
+    )
+    detection_scale = models.FloatField(
+        default=0.5,
+        validators=[MinValueValidator(0.1), MaxValueValidator(1.0)],
+        help_text="Factor de reducción de la primera pasada en modo adaptativo (0.1-1)"
+    )
+    detection_upsample = models.PositiveSmallIntegerField(
+        default=1,
+        help_text="Veces que se sobremuestrea la imagen para encontrar rostros pequeños (number_of_times_to_upsample)"
+    )
+    small_face_region = models.FloatField(
+        default=0.0,
+        help_text="Fracción superior del fotograma donde se esperan rostros pequeños y siempre se sobremuestrea (0 = desactivado)"
+    )
+    decode_min_width = models.PositiveIntegerField(
+        default=640,
+        help_text="Los JPEG más anchos se decodifican reducidos (1/2, 1/4 u 1/8) sin bajar de este ancho (0 = resolución completa)"
+    )
+    quality_min_face_size = models.PositiveIntegerField(
+        default=0,
+        help_text="Lado mínimo en píxeles (del fotograma original) de un rostro para codificarlo (0 = sin mínimo; 40 descarta los rostros lejanos)"
+    )
+    quality_min_sharpness = models.FloatField(
+        default=0.0,
+        help_text="Nitidez mínima (varianza del Laplaciano del rostro a 96x96; una foto nítida supera 300) para codificarlo (0 = sin mínimo; 20 descarta los muy movidos)"
+    )
+    quality_max_yaw = models.FloatField(
+        default=0.0,
+        help_text="Giro horizontal máximo en grados, estimado con los landmarks, para codificar un rostro (0 = sin máximo; 45 descarta los perfiles)"
+    )
+    encoding_workers = models.PositiveSmallIntegerField(
+        default=1,
+        help_text="Procesos del pool entre los que se reparte la codificación de los rostros de un mismo fotograma (1 = secuencial; requiere FACE_RECOGNITION_WORKERS > 0)"
+    )
+    parallel_encoding_min_faces = models.PositiveSmallIntegerField(
+        default=4,
+        help_text="Rostros por codificar a partir de los cuales un fotograma se codifica en paralelo"
+    )
+    live_landmark_model = models.CharField(
+        max_length=10,
+        default='small',
+        choices=LANDMARK_MODEL_CHOICES,
+        help_text="Landmarks para codificar los rostros del reconocimiento en vivo"
+    )
+    live_num_jitters = models.PositiveSmallIntegerField(
+        default=1,
+        help_text="Variaciones aleatorias promediadas por rostro en vivo (el costo crece linealmente)"
+    )
+    enrollment_landmark_model = models.CharField(
+        max_length=10,
+        default='small',
+        choices=LANDMARK_MODEL_CHOICES,
+        help_text="Landmarks para codificar las fotos de enrolamiento; conviene que coincida con el de vivo (ver benchmark_recognition --tiers)"
+    )
+    enrollment_num_jitters = models.PositiveSmallIntegerField(
+        default=5,
+        help_text="Variaciones aleatorias promediadas por foto de enrolamiento"
+    )
+    motion_threshold = models.FloatField(
+        default=0.0,
+        help_text="Cambio medio mínimo (0-1) respecto al último fotograma procesado de la cámara para volver a detectar; por debajo se reutiliza su resultado. 0 = desactivado; 0.01 sirve para cámaras fijas"
+    )
+    motion_max_unchanged_seconds = models.PositiveIntegerField(
+        default=30,
+        help_text="Segundos máximos reutilizando el resultado de una escena sin cambios antes de volver a procesarla; conviene varias veces la cadencia de la cámara (el panel envía cada 5 s)"
+    )
+    enable_tracking = models.BooleanField(
+        default=True,
+        help_text="No volver a codificar rostros ya reconocidos en fotogramas recientes de la sesión"
+    )
+    tracking_ttl_seconds = models.PositiveIntegerField(
+        default=15,
+        help_text="Segundos que se conserva un rostro seguido si deja de detectarse"
+    )
+    burst_confidence_threshold = models.FloatField(
+        default=0.6,
+        help_text="Umbral de distancia para las ráfagas de fotogramas; puede ser más permisivo que confidence_threshold gracias a la votación"
+    )
+    burst_min_votes = models.PositiveSmallIntegerField(
+        default=2,
+        help_text="Fotogramas de la ráfaga en los que debe coincidir un estudiante para registrar su asistencia"
     )
     enable_logging = models.BooleanField(
         default=True,
@@ -163,6 +346,17 @@ class FaceRecognitionSettings(models.Model):
     def __str__(self):
         return f"Face Recognition Settings - Active: {self.is_active}"
     
+    def clean(self):
+        # Los detectores se registran en tiempo de ejecución (register_detector), por eso no son choices del modelo.
+        if self.face_detection_model not in DETECTORS:
+            raise ValidationError({'face_detection_model': f"Detector de rostros desconocido: {self.face_detection_model}"})
+
+    def encoding_tier(self, tier):
+        """Parámetros de face_encodings para 'live' o 'enrollment'."""
+        if tier == 'enrollment':
+            return {'model': self.enrollment_landmark_model, 'num_jitters': max(1, self.enrollment_num_jitters)}
+        return {'model': self.live_landmark_model, 'num_jitters': max(1, self.live_num_jitters)}
+
     @classmethod
     def get_settings(cls):
         """Obtiene la configuración actual o crea una por defecto"""
@@ -175,4 +369,32 @@ class FaceRecognitionSettings(models.Model):
                 'enable_logging': True,
             }
         )
-        return settings
\ No newline at end of file
+        return settings
+
+
+class CheckInEvent(models.Model):
+    """
+    Evento de asistencia capturado por un kiosco sin conexión y cargado después en lote.
+    El client_event_id generado por el kiosco hace idempotente la carga.
+    """
+    STATUS_CHOICES = [
+        ('applied', 'Asistencia registrada'),
+        ('already_checked_in', 'Ya tenía asistencia'),
+        ('unmatched', 'Rostro no reconocido'),
+        ('not_enrolled', 'Estudiante sin registro en la sesión'),
+    ]
+
+    client_event_id = models.CharField(max_length=64, unique=True)
+    session = models.ForeignKey('attendance.AttendanceSession', on_delete=models.CASCADE, related_name='check_in_events')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    captured_at = models.DateTimeField(help_text="Momento de la captura en el kiosco")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Evento de Asistencia sin Conexión"
+        verbose_name_plural = "Eventos de Asistencia sin Conexión"
+        ordering = ['-captured_at']
+
+    def __str__(self):
+        return f"{self.client_event_id} - {self.status}"
@@ -0,0 +1,150 @@
+# face_recognition_app/motion.py
+"""
+Huella de baja resolución de un fotograma para descartar escenas sin cambios antes
+de la detección. La huella es la imagen en gris reducida a 32x24; la diferencia entre
+dos huellas es el promedio del cambio absoluto por píxel, en fracción de 0 a 1.
+
+MotionGate guarda, por sesión y cámara, la huella del último fotograma procesado y
+su resultado: mientras la escena no cambie se responde con ese resultado sin pasar
+por el pool de reconocimiento.
+"""
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+
+import cv2
+import numpy as np
+
+FINGERPRINT_SIZE = (32, 24)
+# Aunque la escena no cambie, se procesa un fotograma cada tanto para mantener vivos
+# los tracks (ver tracking.py) y registrar a quien no se reconoció antes. Valor por
+# defecto; en el flujo web se usa FaceRecognitionSettings.motion_max_unchanged_seconds.
+# Debe ser varias veces la cadencia del cliente (5 s en el panel del instructor):
+# con un valor igual a la cadencia se procesa uno de cada dos fotogramas estáticos.
+MAX_UNCHANGED_SECONDS = 30
+MAX_GATED_STREAMS = 256
+
+
+def frame_fingerprint(frame):
+    """Huella de un fotograma RGB (o ya en gris)."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY) if frame.ndim == 3 else frame
+    return cv2.resize(gray, FINGERPRINT_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def image_fingerprint(image):
+    """
+    Huella de un fotograma subido (archivo, bytes o arreglo RGB). Los JPEG se decodifican
+    en gris a 1/8 de resolución en el dominio DCT, lo que cuesta una fracción de la
+    decodificación completa. Los archivos quedan rebobinados para el resto del flujo.
+    """
+    from PIL import Image
+
+    if isinstance(image, np.ndarray):
+        return frame_fingerprint(image)
+    stream = BytesIO(image) if isinstance(image, (bytes, bytearray, memoryview)) else image
+    if hasattr(stream, 'seek'):
+        stream.seek(0)
+    try:
+        with Image.open(stream) as picture:
+            picture.draft('L', FINGERPRINT_SIZE)
+            gray = np.asarray(picture.convert('L'))
+    finally:
+        if hasattr(stream, 'seek'):
+            stream.seek(0)
+    return frame_fingerprint(gray)
+
+
+def frame_difference(previous, current):
+    """Cambio medio entre dos huellas (0 = idénticas, 1 = opuestas)."""
+    return float(np.abs(current - previous).mean()) / 255.0
+
+
+class MotionGate:
+    """Último fotograma procesado de una cámara y contadores de fotogramas omitidos."""
+
+    def __init__(self):
+        self.fingerprint = None
+        self.processed_at = None
+        self.result = None
+        self.processed = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def check(self, fingerprint, threshold, max_unchanged_seconds=MAX_UNCHANGED_SECONDS, now=None):
+        """Devuelve el resultado guardado si la escena no cambió, o None si hay que procesar el fotograma."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if (
+                self.fingerprint is None
+                or now - self.processed_at > max_unchanged_seconds
+                or frame_difference(self.fingerprint, fingerprint) >= threshold
+            ):
+                return None
+            self.skipped += 1
+            return self.result
+
+    def record(self, fingerprint, result, now=None):
+        """Guarda la huella y el resultado del fotograma procesado."""
+        with self._lock:
+            self.fingerprint = fingerprint
+            self.processed_at = time.monotonic() if now is None else now
+            self.result = result
+            self.processed += 1
+
+    @property
+    def skip_ratio(self):
+        total = self.processed + self.skipped
+        return self.skipped / total if total else 0.0
+
+
+_gates = OrderedDict()
+_gates_lock = threading.Lock()
+
+
+def _session_key(session_id):
+    """Una sesión o, para una cámara que atiende varias sesiones a la vez, la tupla ordenada de sus ids."""
+    if isinstance(session_id, (list, tuple)):
+        return tuple(sorted(int(id_) for id_ in session_id))
+    return int(session_id)
+
+
+def get_motion_gate(session_id, source=''):
+    key = (_session_key(session_id), source or '')
+    with _gates_lock:
+        gate = _gates.get(key)
+        if gate is None:
+            gate = _gates[key] = MotionGate()
+            while len(_gates) > MAX_GATED_STREAMS:
+                _gates.popitem(last=False)
+        else:
+            _gates.move_to_end(key)
+        return gate
+
+
+def _session_ids(key):
+    return key if isinstance(key, tuple) else (key,)
+
+
+def drop_motion_gates(session_id=None):
+    """Descarta los fotogramas guardados de una sesión (también los de grupos que la incluyen), o de todas si no se indica ninguna."""
+    with _gates_lock:
+        for key in [key for key in _gates if session_id is None or int(session_id) in _session_ids(key[0])]:
+            del _gates[key]
+
+
+def motion_stats():
+    """Fotogramas procesados y omitidos por escena sin cambios, en total y por sesión/cámara."""
+    with _gates_lock:
+        gates = list(_gates.items())
+    processed = sum(gate.processed for _, gate in gates)
+    skipped = sum(gate.skipped for _, gate in gates)
+    return {
+        'processed': processed,
+        'skipped': skipped,
+        'skip_ratio': skipped / (processed + skipped) if processed + skipped else 0.0,
+        'streams': [
+            {'session_id': session_id, 'source': source, 'processed': gate.processed, 'skipped': gate.skipped, 'skip_ratio': gate.skip_ratio}
+            for (session_id, source), gate in gates
+        ],
+    }
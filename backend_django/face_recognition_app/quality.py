@@ -0,0 +1,78 @@
+# face_recognition_app/quality.py
+"""
+Filtro de calidad entre la detección y la codificación.
+
+Los rostros muy pequeños, borrosos o girados casi nunca superan el umbral de distancia
+y, cuando lo hacen, son la principal fuente de coincidencias falsas. Cada criterio es
+barato frente al descriptor de 128 dimensiones: el tamaño sale de la caja, la nitidez
+de la varianza del Laplaciano sobre el recorte normalizado a 96x96 y el giro (yaw) de
+los landmarks que el codificador necesita de todos modos, así que se calculan una vez y
+se le pasan. Este módulo no depende de Django.
+"""
+import math
+
+import cv2
+import numpy as np
+
+SHARPNESS_SIZE = (96, 96)
+# Profundidad aproximada de la base de la nariz respecto a la distancia entre ojos:
+# con giro θ, la nariz se desplaza ≈ NOSE_DEPTH·tan(θ) distancias interoculares del centro de los ojos.
+NOSE_DEPTH = 0.6
+SKIP_REASONS = ('small', 'blurry', 'turned')
+
+
+def sharpness(frame, box):
+    """Varianza del Laplaciano del rostro en gris a tamaño fijo (mayor = más nítido)."""
+    top, right, bottom, left = box
+    crop = frame[top:bottom, left:right]
+    if crop.size == 0:
+        return 0.0
+    gray = cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY) if crop.ndim == 3 else crop
+    gray = cv2.resize(gray, SHARPNESS_SIZE, interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def estimate_yaw(landmarks):
+    """Giro horizontal aproximado en grados a partir de los landmarks (5 o 68 puntos) de face_recognition."""
+    left_eye = np.mean(landmarks['left_eye'], axis=0)
+    right_eye = np.mean(landmarks['right_eye'], axis=0)
+    interocular = np.linalg.norm(right_eye - left_eye)
+    if interocular == 0:
+        return 90.0
+    nose = np.mean(landmarks['nose_tip'], axis=0)
+    offset = (nose[0] - (left_eye[0] + right_eye[0]) / 2) / interocular
+    return math.degrees(math.atan(abs(offset) / NOSE_DEPTH))
+
+
+def filter_faces(frame, boxes, scale, options, encoder):
+    """
+    Aplica los mínimos de calidad configurados (0 = criterio desactivado).
+    `scale` lleva el tamaño de las cajas del fotograma decodificado al original.
+    El giro usa encoder.landmarks con el modelo de landmarks de codificación en vivo.
+    Devuelve (posiciones de `boxes` que pasan, {motivo: rostros descartados}, landmarks de
+    las que pasan para encoder.encode, o None si no se calcularon).
+    """
+    min_size = options.get('quality_min_face_size', 0)
+    min_sharpness = options.get('quality_min_sharpness', 0)
+    max_yaw = options.get('quality_max_yaw', 0)
+    skipped = dict.fromkeys(SKIP_REASONS, 0)
+    kept = []
+    for position, (top, right, bottom, left) in enumerate(boxes):
+        if min_size and min(bottom - top, right - left) * scale < min_size:
+            skipped['small'] += 1
+        elif min_sharpness and sharpness(frame, (top, right, bottom, left)) < min_sharpness:
+            skipped['blurry'] += 1
+        else:
+            kept.append(position)
+
+    if not (max_yaw and kept):
+        return kept, skipped, None
+    landmarks = encoder.landmarks(frame, [boxes[position] for position in kept], options.get('live_landmark_model', 'small'))
+    frontal, frontal_landmarks = [], []
+    for position, face_landmarks in zip(kept, landmarks):
+        if estimate_yaw(face_landmarks[0]) > max_yaw:
+            skipped['turned'] += 1
+        else:
+            frontal.append(position)
+            frontal_landmarks.append(face_landmarks)
+    return frontal, skipped, frontal_landmarks
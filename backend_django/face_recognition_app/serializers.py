@@ -1,6 +1,11 @@
 # face_recognition_app/serializers.py
+import base64
+import binascii
+
+import numpy as np
 from rest_framework import serializers
-from .models import FaceEncoding
+from .models import CURRENT_ENCODER_VERSION, ENCODING_DIMENSIONS, ENCODING_DTYPE, ENCODING_NBYTES, FaceEncoding
+
 
 class FaceEncodingSerializer(serializers.ModelSerializer):
     """
@@ -10,3 +15,66 @@ class FaceEncodingSerializer(serializers.ModelSerializer):
         model = FaceEncoding
         fields = ['user', 'profile_image', 'updated_at']
         read_only_fields = ['user', 'updated_at']
+
+
+class EncodingPayloadField(serializers.Field):
+    """n x 128 float32 little-endian, como archivo binario o como cadena base64."""
+
+    def to_internal_value(self, data):
+        if hasattr(data, 'read'):
+            payload = data.read()
+        elif isinstance(data, str):
+            try:
+                payload = base64.b64decode(data, validate=True)
+            except (binascii.Error, ValueError):
+                raise serializers.ValidationError("La cadena base64 no es válida.")
+        else:
+            raise serializers.ValidationError("Se espera un archivo binario o una cadena base64.")
+        if not payload or len(payload) % ENCODING_NBYTES:
+            raise serializers.ValidationError(f"Se esperan n x {ENCODING_NBYTES} bytes (float32 little-endian).")
+        encodings = np.frombuffer(payload, dtype=ENCODING_DTYPE).reshape(-1, ENCODING_DIMENSIONS)
+        if not np.isfinite(encodings).all():
+            raise serializers.ValidationError("Las codificaciones contienen valores no finitos.")
+        return encodings
+
+    def to_representation(self, value):
+        return base64.b64encode(np.asarray(value, dtype=ENCODING_DTYPE).tobytes()).decode('ascii')
+
+
+class EmbeddingRecognitionSerializer(serializers.Serializer):
+    """
+    Codificaciones calculadas por el cliente (p. ej. un kiosco) con las cajas
+    [top, right, bottom, left] de cada rostro. Se rechazan si el modelo del cliente
+    no coincide con el del servidor.
+    """
+    MAX_FACES = 64
+
+    session_id = serializers.IntegerField()
+    encoder_version = serializers.CharField(max_length=32)
+    encodings = EncodingPayloadField()
+    boxes = serializers.JSONField(required=False, default=list)
+    camera_id = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+
+    def validate_encoder_version(self, value):
+        if value != CURRENT_ENCODER_VERSION:
+            raise serializers.ValidationError(
+                f"Las codificaciones fueron generadas con '{value}' y el servidor usa '{CURRENT_ENCODER_VERSION}'."
+            )
+        return value
+
+    def validate_encodings(self, value):
+        if len(value) > self.MAX_FACES:
+            raise serializers.ValidationError(f"Se admiten como máximo {self.MAX_FACES} rostros por petición.")
+        return value
+
+    def validate(self, attrs):
+        boxes = attrs['boxes']
+        if boxes and (
+            not isinstance(boxes, list) or len(boxes) != len(attrs['encodings']) or any(
+                not isinstance(box, list) or len(box) != 4 or not all(isinstance(v, int) for v in box)
+                for box in boxes
+            )
+        ):
+            raise serializers.ValidationError({'boxes': "Se espera una caja [top, right, bottom, left] de enteros por codificación."})
+        attrs['boxes'] = [tuple(box) for box in boxes]
+        return attrs
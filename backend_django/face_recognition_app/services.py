@@ -6,121 +6,436 @@ from PIL import Image
 from django.utils import timezone
 from datetime import datetime
 import logging
+import time
 from django.conf import settings
 from django.utils.timezone import make_aware
+from django.db import connection
 
-from attendance.models import Attendance, Ficha
+from attendance.models import Attendance, AttendanceSession, Ficha
 from .models import FaceEncoding, FaceVerificationLog, FaceRecognitionSettings
+from .cache import encoding_cache
+from .context import get_session_context
+from .detection import detection_options
+from .matching import match_faces
+from .motion import get_motion_gate, image_fingerprint
+from .tracking import get_session_tracker
+from .verification_log import verification_log
+from .workers import detect_and_encode, detect_and_encode_batch, encode_single, get_worker_pool
 
 logger = logging.getLogger(__name__)
 
+
+def _read_upload(image_file):
+    """Bytes del archivo subido (o el fotograma ya decodificado), para enviarlo a los procesos del pool."""
+    if isinstance(image_file, (np.ndarray, bytes, bytearray)):
+        return image_file
+    if hasattr(image_file, 'seek'):
+        image_file.seek(0)
+    return image_file.read()
+
+
+def extract_faces(image_file, settings, skip_boxes=(), lane='live'):
+    """
+    Decodifica, detecta y codifica los rostros de un fotograma (salvo los que coinciden con skip_boxes).
+    Usa el pool de procesos de reconocimiento si está configurado; si no, se ejecuta en línea.
+    Con encoding_workers > 1, un fotograma con al menos parallel_encoding_min_faces rostros por
+    codificar reparte la codificación (landmarks y descriptor) entre varios procesos del pool.
+    """
+    options = detection_options(settings)
+    pool = get_worker_pool()
+    if pool is None:
+        return detect_and_encode(image_file, options, skip_boxes)
+    defer_from = max(settings.parallel_encoding_min_faces, 2) if settings.encoding_workers > 1 else 0
+    locations, encoded_indices, encodings, tracked, timings, skipped = pool.run(
+        'detect_and_encode', _read_upload(image_file), options, skip_boxes, defer_from, lane=lane
+    )
+    if isinstance(encodings, list):
+        # El proceso que detectó devolvió los recortes de los rostros: se codifican en paralelo.
+        encode_started = time.perf_counter()
+        parts = min(settings.encoding_workers, len(encodings), getattr(pool, 'size', settings.encoding_workers))
+        bounds = np.linspace(0, len(encodings), parts + 1).astype(int)
+        tier = settings.encoding_tier('live')
+        chunks = [
+            (encodings[start:end], tier['model'], tier['num_jitters'], options['face_encoder'])
+            for start, end in zip(bounds, bounds[1:])
+        ]
+        encodings = np.concatenate(pool.map('encode_crops', chunks, lane=lane))
+        timings['encode'] += (time.perf_counter() - encode_started) * 1000
+    return locations, encoded_indices, encodings, tracked, timings, skipped
+
+
+def extract_faces_batch(image_files, settings, skip_boxes=(), lane='live'):
+    """extract_faces para una ráfaga: todos los fotogramas se procesan en una sola llamada al pool."""
+    pool = get_worker_pool()
+    if pool is None:
+        return detect_and_encode_batch(image_files, detection_options(settings), skip_boxes)
+    images = [_read_upload(image_file) for image_file in image_files]
+    return pool.run('detect_and_encode_batch', images, detection_options(settings), skip_boxes, lane=lane)
+
+
 def get_face_encoding_from_image(image_file):
     """
     Carga una imagen y devuelve la primera codificación facial encontrada.
     Devuelve None si no se encuentra ninguna cara o si hay más de una.
+    Usa el nivel de calidad de enrolamiento (varios jitters por defecto) y, con pool, el
+    carril 'enrollment' para no competir con el reconocimiento en vivo.
     """
     try:
-        image = face_recognition.load_image_file(image_file)
-        encodings = face_recognition.face_encodings(image)
-        if len(encodings) == 1:
-            return encodings[0]
-        logger.warning(f"Se encontraron {len(encodings)} caras en la imagen de perfil. Se esperaba 1.")
+        recognition_settings = FaceRecognitionSettings.get_settings()
+        tier = recognition_settings.encoding_tier('enrollment')
+        options = detection_options(recognition_settings)
+        pool = get_worker_pool()
+        if pool is None:
+            encoding, face_count = encode_single(image_file, tier['model'], tier['num_jitters'], detection_options=options)
+        else:
+            encoding, face_count = pool.run('encode_single', _read_upload(image_file), tier['model'], tier['num_jitters'], options, lane='enrollment')
+        if encoding is not None:
+            return encoding
+        logger.warning(f"Se encontraron {face_count} caras en la imagen de perfil. Se esperaba 1.")
         return None
     except Exception as e:
         logger.error(f"Error al procesar la imagen para codificación: {e}")
         return None
 
-def recognize_faces_in_stream(image_file, session_id):
+
+def check_in_students(session_id, student_ids, grace_deadline, now=None):
+    """
+    Registra la llegada de los estudiantes que siguen 'absent' con un único UPDATE condicional.
+    El estado present/late se decide una sola vez contra el límite de permisividad, y la
+    condición status='absent' evita que dos fotogramas o cámaras registren al mismo
+    estudiante dos veces. Devuelve (estado, {student_id: attendance_id} de las filas cambiadas).
+    """
+    now = now or timezone.now()
+    new_status = 'present' if now <= grace_deadline else 'late'
+    if not student_ids:
+        return new_status, {}
+
+    table = connection.ops.quote_name(Attendance._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(student_ids))
+    with connection.cursor() as cursor:
+        # UPDATE ... RETURNING (PostgreSQL y SQLite >= 3.35): una sola ida y vuelta a la BD.
+        cursor.execute(
+            f"UPDATE {table} SET status = %s, check_in_time = %s, verified_by_face = %s "
+            f"WHERE session_id = %s AND status = 'absent' AND student_id IN ({placeholders}) "
+            f"RETURNING student_id, id",
+            [new_status, connection.ops.adapt_datetimefield_value(now), True, session_id, *student_ids],
+        )
+        return new_status, dict(cursor.fetchall())
+
+
+def _record_attempt(context, attempt, started):
+    """Encola el intento en el registro de verificación si la configuración lo habilita."""
+    if context is None or not context.settings.enable_logging:
+        return
+    timings = attempt.pop('timings', {})
+    verification_log.add(
+        session_id=context.session_id,
+        total_ms=(time.perf_counter() - started) * 1000,
+        decode_ms=timings.get('decode'),
+        detect_ms=timings.get('detect'),
+        encode_ms=timings.get('encode'),
+        match_ms=timings.get('match'),
+        db_ms=timings.get('db'),
+        **attempt,
+    )
+
+
+def _check_in_recognized(context, matched_student_ids, timings):
+    """Registra la asistencia de los estudiantes reconocidos y arma la respuesta con sus nombres."""
+    for student_id in matched_student_ids:
+        if student_id not in context.attendance_ids:
+            logger.error(f"Error: El estudiante reconocido con ID {student_id} no tiene un registro de asistencia para esta sesión.")
+    db_started = time.perf_counter()
+    new_status, checked_in = check_in_students(context.session_id, matched_student_ids, context.grace_deadline)
+    logger.info(f"Asistencia actualizada a '{new_status}' para {len(checked_in)} de {len(matched_student_ids)} estudiantes reconocidos.")
+
+    names = context.full_names(list(checked_in))
+    timings['db'] = timings.get('db', 0.0) + (time.perf_counter() - db_started) * 1000
+    return [
+        {'id': student_id, 'full_name': names.get(student_id, ''), 'status': new_status}
+        for student_id in matched_student_ids if student_id in checked_in
+    ]
+
+
+def _union_roster(contexts):
+    """
+    Plantillas de las fichas de varias sesiones en una sola matriz. Un estudiante inscrito
+    en más de una ficha aparece una sola vez (sus filas siguen siendo contiguas).
+    """
+    if len(contexts) == 1:
+        return encoding_cache.get(contexts[0].ficha_id)
+    matrices, id_arrays, seen = [], [], set()
+    for ficha_id in dict.fromkeys(context.ficha_id for context in contexts):
+        known_encodings, known_student_ids = encoding_cache.get(ficha_id)
+        if seen:
+            new_rows = ~np.isin(known_student_ids, list(seen))
+            known_encodings, known_student_ids = known_encodings[new_rows], known_student_ids[new_rows]
+        matrices.append(known_encodings)
+        id_arrays.append(known_student_ids)
+        seen.update(known_student_ids.tolist())
+    return np.concatenate(matrices), np.concatenate(id_arrays)
+
+
+def recognize_faces_in_stream(image_file, session_id, source='', ip_address=None, user_agent=None):
     """
     Servicio principal para el reconocimiento facial en tiempo real.
+    `session_id` puede ser una lista de sesiones simultáneas vistas por la misma cámara
+    (aulas compartidas): el fotograma se detecta y codifica una vez, se empareja con la
+    unión de las listas y cada asistencia se registra en la sesión donde está inscrito
+    el estudiante (cada reconocido lleva entonces su session_id y el resultado se
+    desglosa por sesión en "sessions").
+    Si la escena no cambió respecto al último fotograma procesado de la misma cámara
+    (motion_threshold), se responde con ese resultado sin detectar ni codificar.
+    Cada intento queda en FaceVerificationLog (por lotes, uno por sesión) con su resultado y la duración de cada etapa.
     """
+    session_ids = list(session_id) if isinstance(session_id, (list, tuple)) else [session_id]
     logger.info(f"Iniciando reconocimiento facial para la sesión: {session_id}")
+    started = time.perf_counter()
+    contexts = []
+    attempt = {'status': 'error', 'source': source or '', 'ip_address': ip_address, 'user_agent': user_agent}
     try:
-        settings = FaceRecognitionSettings.get_settings()
+        contexts = [get_session_context(id_) for id_ in session_ids]
+        context = contexts[0]
+        settings = context.settings
         logger.info(f"Usando umbral de confianza: {settings.confidence_threshold}")
+        # Clave del seguimiento y del filtro de movimiento: la sesión o el grupo de sesiones.
+        group = context.session_id if len(contexts) == 1 else tuple(sorted({ctx.session_id for ctx in contexts}))
 
-        ficha = Ficha.objects.get(sessions__id=session_id)
-        students = ficha.students.all()
-        logger.info(f"Ficha {ficha.numero_ficha} tiene {students.count()} estudiantes.")
-
-        known_encodings = []
-        known_student_ids = []
-        for student in students:
-            if hasattr(student, 'face_encoding_data') and student.face_encoding_data.is_active:
-                encoding_array = student.face_encoding_data.get_encoding_array()
-                if encoding_array is not None and len(encoding_array) == 128:
-                    known_encodings.append(encoding_array)
-                    known_student_ids.append(student.id)
-                elif encoding_array is not None:
-                    logger.warning(f"La codificación para el estudiante {student.id} tiene una longitud incorrecta: {len(encoding_array)}. Se omitirá.")
-        
-        if not known_encodings:
-            logger.warning(f"No se encontraron codificaciones faciales activas para la ficha {ficha.numero_ficha}.")
+        known_encodings, known_student_ids = _union_roster(contexts)
+
+        if len(known_student_ids) == 0:
+            logger.warning(f"No se encontraron codificaciones faciales activas para la ficha {context.numero_ficha}.")
+            attempt['status'] = 'no_registered_face'
             return {"error": "No hay rostros registrados o activos para esta ficha."}
-        logger.info(f"Se cargaron {len(known_encodings)} codificaciones faciales conocidas.")
+        logger.info(f"Se cargaron {len(known_student_ids)} plantillas faciales conocidas.")
 
-        stream_image = face_recognition.load_image_file(image_file)
-        stream_locations = face_recognition.face_locations(stream_image, model=settings.face_detection_model)
-        stream_encodings = face_recognition.face_encodings(stream_image, stream_locations)
-        logger.info(f"Se detectaron {len(stream_encodings)} caras en la imagen recibida.")
+        gate = fingerprint = None
+        if settings.motion_threshold > 0:
+            gate = get_motion_gate(group, source)
+            fingerprint = image_fingerprint(image_file)
+            cached = gate.check(fingerprint, settings.motion_threshold, settings.motion_max_unchanged_seconds)
+            if cached is not None:
+                logger.info(f"Escena sin cambios en {source or 'la cámara'}: se omite la detección.")
+                attempt['status'] = 'unchanged'
+                result = dict(cached, unchanged=True, skip_ratio=gate.skip_ratio)
+                if 'recognized_students' in result:
+                    # Los reconocidos en el fotograma guardado ya tienen su asistencia.
+                    result['recognized_students'] = []
+                if 'sessions' in result:
+                    result['sessions'] = [dict(entry, recognized_students=[]) for entry in result['sessions']]
+                return result
 
-        if not stream_encodings:
-            return {"error": "No se detectó ningún rostro en la imagen."}
+        tracker = get_session_tracker(group, settings.tracking_ttl_seconds) if settings.enable_tracking else None
+        confirmed_tracks = tracker.confirmed_tracks() if tracker else []
+        stream_locations, encoded_indices, stream_encodings, tracked, timings, skipped = extract_faces(
+            image_file, settings, [track.box for track in confirmed_tracks]
+        )
+        attempt['timings'] = timings
+        attempt['faces_detected'] = len(stream_locations)
+        attempt['faces_skipped'] = sum(skipped.values())
+        logger.info(
+            f"Se detectaron {len(stream_locations)} caras en la imagen recibida ({len(tracked)} ya seguidas, "
+            f"{len(stream_encodings)} codificadas, descartadas por calidad: {skipped})."
+        )
+
+        if len(stream_locations) == 0:
+            attempt['status'] = 'no_face_detected'
+            result = {"error": "No se detectó ningún rostro en la imagen."}
+            if gate:
+                gate.record(fingerprint, result)
+            return result
+
+        match_started = time.perf_counter()
+        matches, distances = match_faces(stream_encodings, known_encodings, known_student_ids, settings.confidence_threshold)
+        timings['match'] = (time.perf_counter() - match_started) * 1000
+        if distances.size:
+            attempt['best_distance'] = float(distances.min())
+        if tracker:
+            tracker.update(
+                stream_locations,
+                {det_index: confirmed_tracks[track_index] for det_index, track_index in tracked.items()},
+                {encoded_indices[face_index]: student_id for face_index, student_id, _ in matches},
+            )
+        matched_faces = {face_index for face_index, _, _ in matches}
+        for i in range(len(stream_encodings)):
+            if i not in matched_faces:
+                logger.warning(f"No hubo coincidencia para la cara {i+1}. Distancia mínima: {distances[i].min()}")
 
-        recognized_students = []
-        for i, stream_encoding in enumerate(stream_encodings):
-            logger.info(f"Procesando cara {i+1} de {len(stream_encodings)}...")
-            distances = face_recognition.face_distance(known_encodings, stream_encoding)
-            logger.info(f"Distancias para la cara {i+1}: {distances}")
-
-            best_match_index = np.argmin(distances)
-            min_distance = distances[best_match_index]
-            
-            matched_student_id = None
-            if min_distance <= settings.confidence_threshold:
-                matched_student_id = known_student_ids[best_match_index]
-                logger.info(f"¡Coincidencia encontrada! Estudiante ID: {matched_student_id} con distancia: {min_distance}")
-            else:
-                logger.warning(f"No hubo coincidencia para la cara {i+1}. Distancia mínima: {min_distance}")
-
-            if matched_student_id:
-                try:
-                    attendance_record = Attendance.objects.get(session_id=session_id, student_id=matched_student_id)
-                    logger.info(f"Registro de asistencia encontrado para el estudiante {matched_student_id}. Estado actual: {attendance_record.status}")
-                    
-                    if attendance_record.status == 'absent':
-                        session = attendance_record.session
-                        now = timezone.now()
-                        
-                        # Ensure session_start_datetime is timezone-aware
-                        session_start_datetime = make_aware(datetime.combine(session.date, session.start_time))
-                        grace_period_end = session_start_datetime + timezone.timedelta(minutes=session.permisividad)
-                        
-                        new_status = 'present' if now <= grace_period_end else 'late'
-                        
-                        attendance_record.status = new_status
-                        attendance_record.check_in_time = now
-                        attendance_record.verified_by_face = True
-                        attendance_record.save()
-                        logger.info(f"Asistencia actualizada para el estudiante {matched_student_id} a: {new_status}")
-                        
-                        recognized_students.append({
-                            'id': attendance_record.student.id,
-                            'full_name': attendance_record.student.get_full_name(),
-                            'status': new_status
-                        })
-                    else:
-                        logger.info(f"La asistencia para el estudiante {matched_student_id} ya fue registrada como '{attendance_record.status}'. No se actualiza.")
-
-                except Attendance.DoesNotExist:
-                    logger.error(f"Error: El estudiante reconocido con ID {matched_student_id} no tiene un registro de asistencia para esta sesión.")
-                    continue
-
-        return {"recognized_students": recognized_students}
-
-    except Ficha.DoesNotExist:
+        matched_student_ids = []
+        for face_index, student_id, min_distance in matches:
+            matched_student_ids.append(student_id)
+            logger.info(f"¡Coincidencia encontrada! Cara {face_index+1} -> Estudiante ID: {student_id} con distancia: {min_distance}")
+        attempt['faces_matched'] = len(matched_student_ids)
+        attempt['status'] = 'success' if matched_student_ids or tracked else 'failed'
+
+        if len(contexts) == 1:
+            recognized_students = _check_in_recognized(context, matched_student_ids, timings)
+        else:
+            recognized_students, sessions = [], []
+            for ctx in contexts:
+                students = _check_in_recognized(ctx, [id_ for id_ in matched_student_ids if id_ in ctx.attendance_ids], timings)
+                for student in students:
+                    student['session_id'] = ctx.session_id
+                recognized_students.extend(students)
+                sessions.append({'session_id': ctx.session_id, 'recognized_students': students})
+            unrouted = [id_ for id_ in matched_student_ids if not any(id_ in ctx.attendance_ids for ctx in contexts)]
+            if unrouted:
+                logger.error(f"Los estudiantes reconocidos {unrouted} no tienen registro de asistencia en ninguna de las sesiones {group}.")
+        result = {"recognized_students": recognized_students, "tracked_faces": len(tracked), "skipped_faces": skipped}
+        if len(contexts) > 1:
+            result['sessions'] = sessions
+        if gate:
+            gate.record(fingerprint, result)
+        return result
+
+    except (AttendanceSession.DoesNotExist, Ficha.DoesNotExist):
         logger.error(f"Error crítico: La sesión de asistencia {session_id} no está asociada a ninguna ficha.")
         return {"error": "La sesión de asistencia no existe o no tiene una ficha asociada."}
     except Exception as e:
         logger.exception(f"Ocurrió una excepción no controlada durante el reconocimiento facial para la sesión {session_id}")
-        return {"error": f"Ocurrió un error inesperado durante el reconocimiento: {e}"}
\ No newline at end of file
+        attempt['error_message'] = str(e)
+        return {"error": f"Ocurrió un error inesperado durante el reconocimiento: {e}"}
+    finally:
+        for ctx in contexts:
+            _record_attempt(ctx, dict(attempt), started)
+
+
+def recognize_faces_in_burst(image_files, session_id, source='', ip_address=None, user_agent=None):
+    """
+    Reconocimiento sobre una ráfaga corta de fotogramas de la misma cámara.
+    Todos los fotogramas se detectan y codifican en una sola llamada al pool y se emparejan
+    con la misma lista de la ficha; un estudiante se registra solo si coincide en al menos
+    burst_min_votes fotogramas, lo que permite un umbral de distancia más permisivo.
+    """
+    logger.info(f"Iniciando reconocimiento por ráfaga de {len(image_files)} fotogramas para la sesión: {session_id}")
+    started = time.perf_counter()
+    context = None
+    attempt = {'status': 'error', 'source': source or '', 'ip_address': ip_address, 'user_agent': user_agent}
+    try:
+        context = get_session_context(session_id)
+        settings = context.settings
+
+        known_encodings, known_student_ids = encoding_cache.get(context.ficha_id)
+        if len(known_student_ids) == 0:
+            logger.warning(f"No se encontraron codificaciones faciales activas para la ficha {context.numero_ficha}.")
+            attempt['status'] = 'no_registered_face'
+            return {"error": "No hay rostros registrados o activos para esta ficha."}
+
+        tracker = get_session_tracker(context.session_id, settings.tracking_ttl_seconds) if settings.enable_tracking else None
+        confirmed_tracks = tracker.confirmed_tracks() if tracker else []
+        frames = extract_faces_batch(image_files, settings, [track.box for track in confirmed_tracks])
+
+        timings = {'match': 0.0}
+        for stage in ('decode', 'detect', 'encode'):
+            timings[stage] = sum(frame[4][stage] for frame in frames)
+        attempt['timings'] = timings
+        attempt['faces_detected'] = max(len(frame[0]) for frame in frames)
+        skipped = {}
+        for frame in frames:
+            for reason, count in frame[5].items():
+                skipped[reason] = skipped.get(reason, 0) + count
+        attempt['faces_skipped'] = sum(skipped.values())
+        if attempt['faces_detected'] == 0:
+            attempt['status'] = 'no_face_detected'
+            return {"error": "No se detectó ningún rostro en la imagen."}
+
+        # Votación: la asignación uno a uno garantiza como máximo un voto por estudiante y fotograma.
+        votes = {}
+        frame_matches = []
+        for locations, encoded_indices, encodings, tracked, _, _ in frames:
+            match_started = time.perf_counter()
+            matches, distances = match_faces(encodings, known_encodings, known_student_ids, settings.burst_confidence_threshold)
+            timings['match'] += (time.perf_counter() - match_started) * 1000
+            if distances.size:
+                best = float(distances.min())
+                attempt['best_distance'] = min(attempt.get('best_distance', best), best)
+            for _, student_id, _ in matches:
+                votes[student_id] = votes.get(student_id, 0) + 1
+            frame_matches.append(matches)
+
+        required_votes = min(settings.burst_min_votes, len(frames))
+        accepted = sorted(student_id for student_id, count in votes.items() if count >= required_votes)
+        logger.info(f"Votación de la ráfaga: {votes}. Se aceptan {len(accepted)} estudiantes con al menos {required_votes} votos.")
+
+        if tracker:
+            accepted_ids = set(accepted)
+            for (locations, encoded_indices, _, tracked, _, _), matches in zip(frames, frame_matches):
+                tracker.update(
+                    locations,
+                    {det_index: confirmed_tracks[track_index] for det_index, track_index in tracked.items()},
+                    {encoded_indices[face_index]: student_id for face_index, student_id, _ in matches if student_id in accepted_ids},
+                )
+
+        tracked_faces = max(len(frame[3]) for frame in frames)
+        attempt['faces_matched'] = len(accepted)
+        attempt['status'] = 'success' if accepted or tracked_faces else 'failed'
+        recognized_students = _check_in_recognized(context, accepted, timings)
+        for student in recognized_students:
+            student['votes'] = votes[student['id']]
+
+        return {
+            "recognized_students": recognized_students,
+            "tracked_faces": tracked_faces,
+            "frames": len(frames),
+            "rejected_candidates": len(votes) - len(accepted),
+            "skipped_faces": skipped,
+        }
+
+    except (AttendanceSession.DoesNotExist, Ficha.DoesNotExist):
+        logger.error(f"Error crítico: La sesión de asistencia {session_id} no está asociada a ninguna ficha.")
+        return {"error": "La sesión de asistencia no existe o no tiene una ficha asociada."}
+    except Exception as e:
+        logger.exception(f"Ocurrió una excepción no controlada durante el reconocimiento por ráfaga para la sesión {session_id}")
+        attempt['error_message'] = str(e)
+        return {"error": f"Ocurrió un error inesperado durante el reconocimiento: {e}"}
+    finally:
+        _record_attempt(context, attempt, started)
+
+
+def recognize_embeddings(encodings, boxes, session_id, source='', ip_address=None, user_agent=None):
+    """
+    Reconocimiento a partir de codificaciones ya calculadas por el cliente: solo se
+    ejecutan el emparejamiento y la actualización de asistencia (sin decodificar,
+    detectar ni codificar en el servidor).
+    """
+    started = time.perf_counter()
+    context = None
+    attempt = {'status': 'error', 'source': source or '', 'ip_address': ip_address, 'user_agent': user_agent}
+    try:
+        context = get_session_context(session_id)
+        settings = context.settings
+        attempt['faces_detected'] = len(encodings)
+
+        known_encodings, known_student_ids = encoding_cache.get(context.ficha_id)
+        if len(known_student_ids) == 0:
+            logger.warning(f"No se encontraron codificaciones faciales activas para la ficha {context.numero_ficha}.")
+            attempt['status'] = 'no_registered_face'
+            return {"error": "No hay rostros registrados o activos para esta ficha."}
+
+        timings = {}
+        attempt['timings'] = timings
+        match_started = time.perf_counter()
+        matches, distances = match_faces(encodings, known_encodings, known_student_ids, settings.confidence_threshold)
+        timings['match'] = (time.perf_counter() - match_started) * 1000
+        if distances.size:
+            attempt['best_distance'] = float(distances.min())
+
+        matched_student_ids = [student_id for _, student_id, _ in matches]
+        attempt['faces_matched'] = len(matched_student_ids)
+        attempt['status'] = 'success' if matched_student_ids else 'failed'
+        recognized_students = _check_in_recognized(context, matched_student_ids, timings)
+        if boxes:
+            face_of_student = {student_id: face_index for face_index, student_id, _ in matches}
+            for student in recognized_students:
+                student['box'] = list(boxes[face_of_student[student['id']]])
+        return {"recognized_students": recognized_students, "unmatched_faces": len(encodings) - len(matches)}
+
+    except (AttendanceSession.DoesNotExist, Ficha.DoesNotExist):
+        logger.error(f"Error crítico: La sesión de asistencia {session_id} no está asociada a ninguna ficha.")
+        return {"error": "La sesión de asistencia no existe o no tiene una ficha asociada."}
+    except Exception as e:
+        logger.exception(f"Ocurrió una excepción no controlada durante el reconocimiento por codificaciones para la sesión {session_id}")
+        attempt['error_message'] = str(e)
+        return {"error": f"Ocurrió un error inesperado durante el reconocimiento: {e}"}
+    finally:
+        _record_attempt(context, attempt, started)
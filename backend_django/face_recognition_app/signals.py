@@ -0,0 +1,50 @@
+# face_recognition_app/signals.py
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from attendance.models import Ficha
+from .cache import encoding_cache
+from .context import drop_session_context
+from .index import face_index
+from .models import FaceEncoding, FaceRecognitionSettings
+
+
+def _fichas_of_user(user_id):
+    return list(Ficha.objects.filter(students__id=user_id).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=FaceEncoding)
+@receiver(post_delete, sender=FaceEncoding)
+def invalidate_encoding_cache_on_face_change(sender, instance, **kwargs):
+    """Invalida las fichas del estudiante cuya codificación cambió."""
+    encoding_cache.invalidate(_fichas_of_user(instance.user_id))
+
+
+@receiver(post_save, sender=FaceEncoding)
+def update_face_index_on_save(sender, instance, **kwargs):
+    face_index.apply(instance)
+
+
+@receiver(post_delete, sender=FaceEncoding)
+def update_face_index_on_delete(sender, instance, **kwargs):
+    face_index.remove(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Ficha.students.through)
+def invalidate_encoding_cache_on_roster_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Invalida las fichas cuyo listado de estudiantes cambió."""
+    if reverse and action == 'pre_clear':
+        # user.fichas_enrolled.clear(): las fichas afectadas solo se conocen antes del clear.
+        encoding_cache.invalidate(_fichas_of_user(instance.pk))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            encoding_cache.invalidate([instance.pk])
+        elif pk_set:
+            # user.fichas_enrolled.add(...) / remove(...): pk_set contiene IDs de fichas.
+            encoding_cache.invalidate(pk_set)
+
+
+@receiver(post_save, sender=FaceRecognitionSettings)
+def drop_session_contexts_on_settings_change(sender, instance, **kwargs):
+    """Los contextos de sesión guardan una copia de la configuración: se reconstruyen."""
+    drop_session_context()
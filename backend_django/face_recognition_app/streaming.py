@@ -0,0 +1,217 @@
+# face_recognition_app/streaming.py
+"""
+Canal WebSocket de reconocimiento por sesión de asistencia. Es una aplicación ASGI
+sin Channels; requiere un servidor ASGI como uvicorn (ver facelog/asgi.py).
+
+    ws://<host>/ws/face/sessions/<session_id>/[?camera_id=<cámara>]
+
+El JWT de acceso no va en la URL (quedaría en los registros de proxies y servidores).
+Se envía como subprotocolo, `new WebSocket(url, ['bearer', token])`, o, si el cliente
+no puede, como primer mensaje de texto `{"token": "<JWT>"}` antes de
+FACE_STREAM_AUTH_TIMEOUT segundos.
+
+El cliente envía fotogramas JPEG como mensajes binarios. Si el servidor va retrasado
+solo se procesa el fotograma más reciente (los intermedios se descartan). Por el mismo
+socket se envían los resultados del reconocimiento y los cambios de asistencia de la
+sesión, lo que reemplaza la consulta periódica de attendance-log. Al desactivarse la
+sesión se envía session_inactive y se cierra el canal.
+"""
+import asyncio
+import json
+import logging
+import re
+from io import BytesIO
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from attendance.models import Attendance, AttendanceSession
+from .context import get_session_context
+from .services import recognize_faces_in_stream
+
+logger = logging.getLogger(__name__)
+
+SESSION_PATH = re.compile(r'^/ws/face/sessions/(?P<session_id>\d+)/?$')
+TOKEN_SUBPROTOCOL = 'bearer'
+
+# Códigos de cierre de la aplicación (rango 4000-4999).
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_FORBIDDEN = 4403
+CLOSE_NOT_FOUND = 4404
+
+
+def _db_sync_to_async(func):
+    """Ejecuta código con ORM fuera del hilo compartido, cerrando conexiones caducadas."""
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(wrapper, thread_sensitive=False)
+
+
+def _authorize(raw_token, session_id):
+    """Devuelve (sesión, None) o (None, código de cierre)."""
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+
+    authentication = JWTAuthentication()
+    try:
+        user = authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None, CLOSE_UNAUTHORIZED
+
+    try:
+        session = AttendanceSession.objects.select_related('ficha').get(id=session_id)
+    except AttendanceSession.DoesNotExist:
+        return None, CLOSE_NOT_FOUND
+    if not session.ficha.instructors.filter(id=user.id).exists() or not session.is_active:
+        return None, CLOSE_FORBIDDEN
+    return session, None
+
+
+def _attendance_snapshot(session_id):
+    """Estado actual de la asistencia de la sesión y si sigue activa, en dos consultas."""
+    is_active = AttendanceSession.objects.filter(id=session_id, is_active=True).exists()
+    records = {
+        row['id']: {
+            'id': row['id'],
+            'student_id': row['student_id'],
+            'status': row['status'],
+            'check_in_time': row['check_in_time'].isoformat() if row['check_in_time'] else None,
+            'verified_by_face': row['verified_by_face'],
+        }
+        for row in Attendance.objects.filter(session_id=session_id).values(
+            'id', 'student_id', 'status', 'check_in_time', 'verified_by_face'
+        )
+    }
+    return is_active, records
+
+
+class SessionStream:
+    """Estado de una conexión: último fotograma pendiente y último estado de asistencia enviado."""
+
+    def __init__(self, session_id, send, client=None):
+        self.session_id = session_id
+        self.client = client or {}
+        self._send = send
+        self._latest_frame = None
+        self._frame_ready = asyncio.Event()
+        self._attendance_changed = asyncio.Event()
+        self.dropped_frames = 0
+        self.attendance = {}
+
+    async def send_json(self, payload):
+        await self._send({'type': 'websocket.send', 'text': json.dumps(payload)})
+
+    def offer_frame(self, frame):
+        if self._latest_frame is not None:
+            self.dropped_frames += 1
+        self._latest_frame = frame
+        self._frame_ready.set()
+
+    async def close_inactive(self):
+        await self.send_json({'type': 'session_inactive'})
+        await self._send({'type': 'websocket.close', 'code': 1000})
+
+    async def process_frames(self):
+        recognize = _db_sync_to_async(recognize_faces_in_stream)
+        context = _db_sync_to_async(get_session_context)
+        while True:
+            await self._frame_ready.wait()
+            self._frame_ready.clear()
+            frame, self._latest_frame = self._latest_frame, None
+            # El contexto en memoria se renueva con la desactivación o cada FACE_RECOGNITION_CONTEXT_TTL.
+            if not (await context(self.session_id)).is_active:
+                await self.close_inactive()
+                return
+            result = await recognize(BytesIO(frame), self.session_id, **self.client)
+            await self.send_json({'type': 'recognition', 'dropped_frames': self.dropped_frames, **result})
+            if result.get('recognized_students'):
+                self._attendance_changed.set()
+
+    async def push_attendance(self, interval):
+        snapshot = _db_sync_to_async(_attendance_snapshot)
+        while True:
+            is_active, records = await snapshot(self.session_id)
+            if not is_active:
+                await self.close_inactive()
+                return
+            changes = [record for record_id, record in records.items() if self.attendance.get(record_id) != record]
+            self.attendance = records
+            if changes:
+                await self.send_json({'type': 'attendance', 'records': changes})
+            try:
+                await asyncio.wait_for(self._attendance_changed.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._attendance_changed.clear()
+
+
+async def _first_message_authorize(receive, session_id):
+    """Lee {"token": ...} del primer mensaje y lo valida como _authorize."""
+    timeout = getattr(settings, 'FACE_STREAM_AUTH_TIMEOUT', 10)
+    try:
+        message = await asyncio.wait_for(receive(), timeout=timeout)
+        token = json.loads(message.get('text') or '{}').get('token', '')
+    except (asyncio.TimeoutError, ValueError, AttributeError):
+        return None, CLOSE_UNAUTHORIZED
+    if message['type'] == 'websocket.disconnect' or not isinstance(token, str):
+        return None, CLOSE_UNAUTHORIZED
+    return await _db_sync_to_async(_authorize)(token, session_id)
+
+
+async def websocket_application(scope, receive, send):
+    """Aplicación ASGI para las conexiones WebSocket (ver facelog/asgi.py)."""
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    match = SESSION_PATH.match(scope['path'])
+    if not match:
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+
+    subprotocols = scope.get('subprotocols') or []
+    if len(subprotocols) == 2 and subprotocols[0] == TOKEN_SUBPROTOCOL:
+        session, close_code = await _db_sync_to_async(_authorize)(subprotocols[1], int(match['session_id']))
+        if session is not None:
+            await send({'type': 'websocket.accept', 'subprotocol': TOKEN_SUBPROTOCOL})
+    else:
+        # Sin subprotocolo el token llega en el primer mensaje, que solo puede leerse tras aceptar.
+        await send({'type': 'websocket.accept'})
+        session, close_code = await _first_message_authorize(receive, int(match['session_id']))
+    if session is None:
+        await send({'type': 'websocket.close', 'code': close_code})
+        return
+
+    query = parse_qs(scope.get('query_string', b'').decode())
+    headers = dict(scope.get('headers', []))
+    client = {
+        'source': query.get('camera_id', ['websocket'])[0],
+        'ip_address': (scope.get('client') or [None])[0],
+        'user_agent': headers.get(b'user-agent', b'').decode('latin-1') or None,
+    }
+    stream = SessionStream(session.id, send, client)
+    interval = getattr(settings, 'FACE_STREAM_ATTENDANCE_INTERVAL', 5)
+    tasks = [
+        asyncio.create_task(stream.process_frames()),
+        asyncio.create_task(stream.push_attendance(interval)),
+    ]
+    try:
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            if message.get('bytes'):
+                stream.offer_frame(message['bytes'])
+            if any(task.done() for task in tasks):
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    logger.info(f"Canal de reconocimiento cerrado para la sesión {session.id}. Fotogramas descartados: {stream.dropped_frames}")
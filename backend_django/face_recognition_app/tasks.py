@@ -0,0 +1,38 @@
+# face_recognition_app/tasks.py
+import base64
+import uuid
+from io import BytesIO
+
+from celery import shared_task
+from django.core import signing
+
+from .services import recognize_faces_in_stream
+
+JOB_SALT = 'face_recognition_app.recognize_frame_task'
+
+
+def new_job_id(session_ids):
+    """
+    Id de tarea firmado que lleva las sesiones del trabajo, para comprobar los permisos
+    al consultarlo sin depender del resultado (que no existe mientras está pendiente).
+    """
+    return signing.dumps({'job': uuid.uuid4().hex, 'sessions': list(session_ids)}, salt=JOB_SALT, compress=True)
+
+
+def job_session_ids(job_id):
+    """Sesiones de un id creado con new_job_id; lanza signing.BadSignature si no es válido."""
+    return signing.loads(job_id, salt=JOB_SALT)['sessions']
+
+
+@shared_task
+def recognize_frame_task(image_b64, session_id, source='', ip_address=None, user_agent=None):
+    """
+    Reconocimiento asíncrono de un fotograma. La imagen viaja en base64 porque el
+    serializador JSON de Celery no admite bytes.
+    """
+    result = recognize_faces_in_stream(
+        BytesIO(base64.b64decode(image_b64)), session_id,
+        source=source, ip_address=ip_address, user_agent=user_agent,
+    )
+    result['session_id'] = session_id
+    return result
@@ -1,3 +1,1059 @@
-from django.test import TestCase
+# face_recognition_app/tests.py
+import asyncio
+import base64
+import datetime
+import json
+import os
+import queue
+import tempfile
+import threading
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
 
-# Create your tests here.
+import cv2
+import numpy as np
+from PIL import Image
+from django.contrib import admin
+from django.contrib.admin.sites import AdminSite
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from attendance.models import Attendance, AttendanceSession, Ficha
+from .admin import FaceEncodingAdmin, FaceRecognitionSettingsForm
+from .backends import DETECTORS, ENCODERS, DlibEncoder, OpenCVDNNDetector, OpenCVHaarDetector, StubDetector, register_detector
+from .benchmark import build_frame, compare, summarize
+from .cache import FichaEncodingCache, encoding_cache
+from .camera import CameraIngestor
+from .motion import MotionGate
+from .matching import assign_matches, distance_matrix, match_faces
+from .quality import filter_faces
+from .models import CURRENT_ENCODER_VERSION, CheckInEvent, FaceEncoding, FaceRecognitionSettings, FaceVerificationLog
+from .index import FaceIndex
+from .detection import detect_faces, detection_options
+from .context import build_session_context, drop_session_context, get_session_context
+from .streaming import CLOSE_FORBIDDEN, CLOSE_NOT_FOUND, CLOSE_UNAUTHORIZED, websocket_application
+from .services import check_in_students, extract_faces, get_face_encoding_from_image
+from .tracking import SessionTracker, associate
+from .tasks import new_job_id
+from .verification_log import verification_log
+from .workers import TASKS, RecognitionWorkerPool, _worker_main, decode_frame, detect_and_encode, get_worker_pool, worker_settings
+
+User = get_user_model()
+
+
+def _encoding(seed):
+    return np.random.default_rng(seed).random(128)
+
+
+def _face_encoding(user, seed):
+    face_encoding = FaceEncoding(user=user)
+    face_encoding.set_encoding_array(_encoding(seed))
+    face_encoding.save()
+    return face_encoding
+
+
+class FaceEncodingStorageTests(TestCase):
+    def test_binary_round_trip(self):
+        """La codificación se guarda como 512 bytes float32 y se lee sin copia"""
+        user = User.objects.create_user('student1', 'student1@example.com', 'testpass123', role='student')
+        _face_encoding(user, 1)
+        face_encoding = FaceEncoding.objects.get(user=user)
+        self.assertEqual(len(face_encoding.encoding_bytes), 512)
+        self.assertEqual(face_encoding.encoder_version, CURRENT_ENCODER_VERSION)
+        encoding = face_encoding.get_encoding_array()
+        self.assertEqual(encoding.dtype, np.float32)
+        np.testing.assert_allclose(encoding, _encoding(1), rtol=1e-6)
+
+    def test_rejects_invalid_encoding(self):
+        """Una codificación con longitud distinta de 128 se rechaza"""
+        user = User.objects.create_user('student1', 'student1@example.com', 'testpass123', role='student')
+        with self.assertRaises(ValueError):
+            FaceEncoding(user=user).set_encoding_array([0.0] * 64)
+
+    def test_admin_image_change_keeps_other_templates(self):
+        """Cambiar la imagen de perfil en el admin solo reemplaza su plantilla, no las demás del enrolamiento"""
+        user = User.objects.create_user('student1', 'student1@example.com', 'testpass123', role='student')
+        face_encoding = FaceEncoding(user=user)
+        face_encoding.set_templates([_encoding(1), _encoding(2), _encoding(3)])
+        form = SimpleNamespace(changed_data=['profile_image'], cleaned_data={'profile_image': _blank_frame()})
+        model_admin = FaceEncodingAdmin(FaceEncoding, AdminSite())
+        with patch('face_recognition_app.admin.get_face_encoding_from_image', return_value=_encoding(4)), \
+                patch('face_recognition_app.admin.messages'), patch.object(admin.ModelAdmin, 'save_model'):
+            model_admin.save_model(None, face_encoding, form, change=True)
+        np.testing.assert_allclose(face_encoding.get_templates_array(), np.stack([_encoding(4), _encoding(2), _encoding(3)]), rtol=1e-6)
+
+
+class FichaEncodingCacheTests(TestCase):
+    def setUp(self):
+        encoding_cache.invalidate()
+        self.ficha = Ficha.objects.create(programa_formacion='ADSO', numero_ficha='100')
+        self.student = User.objects.create_user('student1', 'student1@example.com', 'testpass123', role='student')
+        self.ficha.students.add(self.student)
+        _face_encoding(self.student, 1)
+
+    def test_loads_matrix_and_counts_hits(self):
+        """La primera consulta carga la ficha y las siguientes salen de la caché"""
+        cache = FichaEncodingCache()
+        with self.assertNumQueries(1):
+            matrix, student_ids = cache.get(self.ficha.id)
+        self.assertEqual(matrix.shape, (1, 128))
+        self.assertEqual(matrix.dtype, np.float32)
+        self.assertEqual(list(student_ids), [self.student.id])
+        with self.assertNumQueries(0):
+            cache.get(self.ficha.id)
+        self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (1, 1))
+
+    def test_lru_eviction(self):
+        """Se descarta la ficha usada hace más tiempo al superar el límite"""
+        other = Ficha.objects.create(programa_formacion='ADSO', numero_ficha='200')
+        cache = FichaEncodingCache(max_entries=1)
+        cache.get(self.ficha.id)
+        cache.get(other.id)
+        self.assertEqual(cache.stats()['evictions'], 1)
+        cache.get(self.ficha.id)
+        self.assertEqual(cache.stats()['misses'], 3)
+
+    def test_invalidated_by_signals(self):
+        """Los cambios de codificación y de inscripción invalidan la ficha"""
+        encoding_cache.get(self.ficha.id)
+        new_student = User.objects.create_user('student2', 'student2@example.com', 'testpass123', role='student')
+        _face_encoding(new_student, 2)
+        self.ficha.students.add(new_student)
+        _, student_ids = encoding_cache.get(self.ficha.id)
+        self.assertEqual(len(student_ids), 2)
+
+        face_encoding = self.student.face_encoding_data
+        face_encoding.is_active = False
+        face_encoding.save()
+        _, student_ids = encoding_cache.get(self.ficha.id)
+        self.assertEqual(list(student_ids), [new_student.id])
+
+    def test_loads_all_templates(self):
+        """Todas las plantillas de enrolamiento se cargan, alineadas con su estudiante"""
+        face_encoding = self.student.face_encoding_data
+        face_encoding.set_templates([_encoding(1), _encoding(2), _encoding(3)])
+        face_encoding.save()
+        matrix, student_ids = encoding_cache.get(self.ficha.id)
+        self.assertEqual(matrix.shape, (3, 128))
+        self.assertEqual(list(student_ids), [self.student.id] * 3)
+        np.testing.assert_allclose(face_encoding.get_encoding_array(), np.mean([_encoding(i) for i in (1, 2, 3)], axis=0), atol=1e-6)
+
+
+class FaceIndexTests(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(f'student{i}', f'student{i}@example.com', 'testpass123', role='student')
+            for i in range(3)
+        ]
+        for i, user in enumerate(self.users):
+            _face_encoding(user, i)
+
+    def test_finds_duplicates_incrementally(self):
+        """El índice detecta rostros registrados, incluidos los agregados después de construirlo"""
+        index = FaceIndex(min_ivf_size=2, sync_interval=0)
+        self.assertEqual(index.find_duplicate(_encoding(1) + 0.01), self.users[1].id)
+        self.assertIsNone(index.find_duplicate(_encoding(1), exclude_user_id=self.users[1].id))
+        self.assertIsNone(index.find_duplicate(_encoding(99)))
+
+        new_user = User.objects.create_user('student9', 'student9@example.com', 'testpass123', role='student')
+        _face_encoding(new_user, 99)
+        self.assertEqual(index.find_duplicate(_encoding(99)), new_user.id)
+
+        self.users[1].face_encoding_data.delete()
+        self.assertIsNone(index.find_duplicate(_encoding(1)))
+
+    def test_every_template_is_indexed(self):
+        """Un rostro cercano a cualquier plantilla es duplicado aunque esté lejos del centroide"""
+        face_encoding = self.users[2].face_encoding_data
+        face_encoding.set_templates([_encoding(2), _encoding(7)])
+        face_encoding.save()
+        index = FaceIndex(min_ivf_size=2, sync_interval=0)
+        self.assertEqual(index.find_duplicate(_encoding(7) + 0.01), self.users[2].id)
+        self.assertEqual([user_id for user_id, _ in index.search(_encoding(2), k=5)].count(self.users[2].id), 1)
+
+        face_encoding.set_templates([_encoding(2), _encoding(8)])
+        face_encoding.save()
+        self.assertIsNone(index.find_duplicate(_encoding(7)))
+        self.assertEqual(index.find_duplicate(_encoding(8)), self.users[2].id)
+
+    def test_sync_is_rate_limited(self):
+        """Dentro de sync_interval las búsquedas no consultan la BD; los cambios del proceso llegan por upsert"""
+        index = FaceIndex(min_ivf_size=2, sync_interval=60)
+        index.find_duplicate(_encoding(0))
+        with self.assertNumQueries(0):
+            self.assertEqual(index.find_duplicate(_encoding(1)), self.users[1].id)
+            index.upsert(self.users[0].id, [_encoding(50)])
+            self.assertEqual(index.find_duplicate(_encoding(50)), self.users[0].id)
+
+    def test_empty_encoding_does_not_force_rebuilds(self):
+        """Un registro activo sin codificación no descuadra el conteo ni reentrena el índice en cada consulta"""
+        face_encoding = self.users[2].face_encoding_data
+        face_encoding.encoding_bytes = b''
+        face_encoding.save()
+        index = FaceIndex(min_ivf_size=2, sync_interval=0)
+        with patch.object(index, 'rebuild', wraps=index.rebuild) as rebuild:
+            for _ in range(3):
+                self.assertEqual(index.find_duplicate(_encoding(0)), self.users[0].id)
+        self.assertEqual(rebuild.call_count, 1)
+
+
+class MotionGateTests(SimpleTestCase):
+    def test_static_camera_at_client_cadence(self):
+        """Con la cadencia del panel (un fotograma cada 5 s) casi todos los fotogramas estáticos se omiten"""
+        max_unchanged = FaceRecognitionSettings().motion_max_unchanged_seconds
+        gate = MotionGate()
+        fingerprint = np.zeros((24, 32), dtype=np.int16)
+        for second in range(0, 300, 5):
+            if gate.check(fingerprint, 0.01, max_unchanged, now=second) is None:
+                gate.record(fingerprint, {'recognized_students': []}, now=second)
+        self.assertGreaterEqual(gate.skip_ratio, 0.8)
+
+
+class MatchingTests(SimpleTestCase):
+    def test_distance_matrix_matches_euclidean(self):
+        """La expansión de normas coincide con la distancia euclidiana directa"""
+        faces = np.stack([_encoding(i) for i in range(3)])
+        known = np.stack([_encoding(i) for i in range(10, 15)])
+        expected = np.linalg.norm(faces[:, None, :] - known[None, :, :], axis=2)
+        np.testing.assert_allclose(distance_matrix(faces, known), expected, atol=1e-4)
+
+    def test_one_to_one_assignment(self):
+        """Dos caras cercanas al mismo estudiante no se acreditan dos veces"""
+        distances = np.array([
+            [0.30, 0.45],
+            [0.35, 0.90],
+        ])
+        # La asignación independiente daría el estudiante 0 a ambas caras.
+        self.assertEqual(assign_matches(distances, 0.6), [(0, 1, 0.45), (1, 0, 0.35)])
+
+    def test_threshold_is_respected(self):
+        """Los pares por encima del umbral nunca se asignan"""
+        distances = np.array([[0.7, 0.2], [0.8, 0.3], [0.1, 0.9]])
+        self.assertEqual(assign_matches(distances, 0.25), [(0, 1, 0.2), (2, 0, 0.1)])
+
+    def test_matches_against_any_template(self):
+        """Cada estudiante se puntúa con su plantilla más cercana"""
+        templates = np.stack([_encoding(1), _encoding(2), _encoding(3), _encoding(4)])
+        student_ids = np.array([10, 10, 20, 20])
+        faces = np.stack([_encoding(4) + 0.01, _encoding(2)])
+        matches, distances = match_faces(faces, templates, student_ids, 0.6)
+        self.assertEqual([(face, student) for face, student, _ in matches], [(0, 20), (1, 10)])
+        self.assertEqual(distances.shape, (2, 2))
+
+
+class BenchmarkTests(SimpleTestCase):
+    def test_compare_reports_p50_change(self):
+        """La comparación entre ejecuciones usa p50 por etapa"""
+        def report(p50):
+            return {'results': [{'roster': 10, 'faces': 1, 'stages': {'match': summarize([p50 / 1000.0])}}]}
+        self.assertEqual(compare(report(2.0), report(1.5)), [{'roster': 10, 'faces': 1, 'p50_change_pct': {'match': -25.0}}])
+
+
+class FrameDecodeTests(SimpleTestCase):
+    def test_large_jpeg_is_decoded_reduced(self):
+        """Un JPEG de 1280 px se decodifica a 640 px y el factor permite volver a la escala original"""
+        buffer = BytesIO()
+        Image.new('RGB', (1280, 720), color=(90, 120, 150)).save(buffer, format='JPEG')
+        frame, scale = decode_frame(buffer.getvalue(), min_width=640)
+        self.assertEqual((frame.shape, scale), ((360, 640, 3), 2.0))
+        frame, scale = decode_frame(buffer.getvalue(), min_width=0)
+        self.assertEqual((frame.shape, scale), ((720, 1280, 3), 1.0))
+
+
+class _InlinePool:
+    """Pool que ejecuta las tareas en el mismo proceso, para probar el reparto sin lanzar procesos."""
+    size = 4
+
+    def __init__(self):
+        self.calls = []
+
+    def run(self, task, *args, lane='live'):
+        self.calls.append((task, 1))
+        return TASKS[task](*args)
+
+    def map(self, task, args_list, lane='live'):
+        self.calls.append((task, len(args_list)))
+        return [TASKS[task](*args) for args in args_list]
+
+
+class ParallelEncodingTests(SimpleTestCase):
+    def test_parallel_encoding_matches_sequential(self):
+        """Repartir la codificación en recortes da las mismas codificaciones que el modo secuencial"""
+        frame = build_frame(3)
+        settings = FaceRecognitionSettings(encoding_workers=2, parallel_encoding_min_faces=2)
+        pool = _InlinePool()
+        with patch('face_recognition_app.services.get_worker_pool', return_value=pool):
+            locations, encoded_indices, encodings, _, _, _ = extract_faces(frame, settings)
+        expected = detect_and_encode(frame, detection_options(settings))
+
+        self.assertEqual(pool.calls, [('detect_and_encode', 1), ('encode_crops', 2)])
+        self.assertEqual((locations, encoded_indices), (expected[0], expected[1]))
+        self.assertEqual(encodings.shape, (3, 128))
+        np.testing.assert_allclose(encodings, expected[2], atol=1e-6)
+
+
+class _RecordingDetector:
+    """Detector falso: devuelve una caja fija (en coordenadas de la imagen recibida) por cada tamaño de entrada."""
+
+    def __init__(self, boxes_by_shape):
+        self.boxes_by_shape = boxes_by_shape
+        self.calls = []
+
+    def detect(self, image, upsample=1):
+        self.calls.append((image.shape[:2], upsample))
+        return list(self.boxes_by_shape.get(image.shape[:2], []))
+
+
+class AdaptiveDetectionTests(SimpleTestCase):
+    def _detect(self, detector, **fields):
+        settings = FaceRecognitionSettings(detection_mode='adaptive', detection_upsample=1, **fields)
+        with patch('face_recognition_app.detection._detector', return_value=detector):
+            return detect_faces(np.zeros((480, 640, 3), dtype=np.uint8), settings)
+
+    def test_reduced_pass_boxes_are_in_full_resolution(self):
+        """Las cajas de la pasada reducida se devuelven en coordenadas de la imagen completa"""
+        detector = _RecordingDetector({(240, 320): [(10, 60, 50, 20)]})
+        self.assertEqual(self._detect(detector, detection_scale=0.5), [(20, 120, 100, 40)])
+        self.assertEqual(detector.calls, [((240, 320), 0)])
+
+    def test_small_face_region_and_full_resolution_retry(self):
+        """La franja superior se sobremuestrea sin duplicar rostros y, sin hallazgos, se reintenta a resolución completa"""
+        detector = _RecordingDetector({
+            (120, 160): [(10, 60, 50, 20)],
+            (240, 640): [(40, 240, 200, 80), (5, 600, 25, 580)],
+        })
+        boxes = self._detect(detector, detection_scale=0.25, small_face_region=0.5)
+        self.assertEqual(boxes, [(40, 240, 200, 80), (5, 600, 25, 580)])
+        self.assertEqual(detector.calls, [((120, 160), 0), ((240, 640), 1)])
+
+        detector = _RecordingDetector({(480, 640): [(100, 300, 200, 200)]})
+        self.assertEqual(self._detect(detector, detection_scale=0.5), [(100, 300, 200, 200)])
+        self.assertEqual(detector.calls, [((240, 320), 0), ((480, 640), 1)])
+
+    def test_detection_scale_is_validated(self):
+        """Una escala fuera de (0, 1] no se puede guardar y, si llega, se detecta a resolución completa"""
+        with self.assertRaises(ValidationError) as error:
+            FaceRecognitionSettings(detection_scale=0).full_clean(validate_unique=False)
+        self.assertEqual(list(error.exception.message_dict), ['detection_scale'])
+        detector = _RecordingDetector({(480, 640): [(100, 300, 200, 200)]})
+        self.assertEqual(self._detect(detector, detection_scale=-1), [(100, 300, 200, 200)])
+        self.assertEqual(detector.calls, [((480, 640), 1)])
+
+
+class WorkerPoolTests(SimpleTestCase):
+    def _drain(self, live, enrollment, serves_enrollment):
+        """Ejecuta el bucle de un proceso del pool en un hilo, con colas locales, hasta vaciar las tareas."""
+        results = queue.Queue()
+        worker = threading.Thread(target=_worker_main, args=(live, enrollment, results, serves_enrollment))
+        worker.start()
+        done = []
+        while not (live.empty() and (enrollment.empty() or not serves_enrollment)):
+            done.append(results.get(timeout=5)[0])
+        live.put(None)
+        worker.join(timeout=5)
+        while not results.empty():
+            done.append(results.get()[0])
+        return done
+
+    def test_live_lane_goes_first_and_reserved_workers_skip_enrollment(self):
+        """Los fotogramas en vivo se atienden antes que los enrolamientos; los procesos reservados nunca los toman"""
+        with patch.dict(TASKS, {'echo': lambda value: value}):
+            live, enrollment = queue.Queue(), queue.Queue()
+            enrollment.put(('e1', 'echo', (1,)))
+            live.put(('l1', 'echo', (1,)))
+            live.put(('l2', 'echo', (2,)))
+            self.assertEqual(self._drain(live, enrollment, serves_enrollment=True), ['l1', 'l2', 'e1'])
+
+            enrollment.put(('e2', 'echo', (1,)))
+            live.put(('l3', 'echo', (1,)))
+            self.assertEqual(self._drain(live, enrollment, serves_enrollment=False), ['l3'])
+            self.assertEqual(enrollment.get_nowait()[0], 'e2')
+
+    def test_timed_out_futures_are_dropped(self):
+        """Una tarea que supera el timeout no queda registrada en el pool"""
+        pool = RecognitionWorkerPool(0)
+        try:
+            with self.assertRaises(TimeoutError):
+                pool.run('detect_and_encode', b'', {}, timeout=0.05)
+            with self.assertRaises(TimeoutError):
+                pool.map('encode_crops', [((), 'small', 1, 'stub')] * 2, timeout=0.05)
+            self.assertEqual(pool._futures, {})
+        finally:
+            pool.shutdown()
+
+    @override_settings(FACE_RECOGNITION_ENCODER='stub')
+    def test_dead_worker_is_replaced(self):
+        """Si un proceso del pool muere, el siguiente envío arranca otro en su lugar"""
+        options = detection_options(FaceRecognitionSettings(
+            face_detection_model='stub', decode_min_width=0,
+        ))
+        pool = RecognitionWorkerPool(1, timeout=120)
+        try:
+            dead = pool._processes[0]
+            dead.kill()
+            dead.join()
+            locations = pool.run('detect_and_encode', build_frame(1), options)[0]
+            self.assertEqual(len(locations), 1)
+            self.assertIsNot(pool._processes[0], dead)
+        finally:
+            pool.shutdown()
+
+    @override_settings(FACE_RECOGNITION_WORKERS=2, FACE_RECOGNITION_WORKER_ADDRESS=None)
+    def test_falls_back_to_inline_processing(self):
+        """Sin pool (0 procesos, o dentro de un proceso demonio) el fotograma se procesa en el hilo de la petición"""
+        with patch('face_recognition_app.workers.multiprocessing.current_process', return_value=SimpleNamespace(daemon=True)):
+            self.assertIsNone(get_worker_pool())
+        found = ([], [], np.empty((0, 128)), [], {}, {})
+        with override_settings(FACE_RECOGNITION_WORKERS=0), \
+                patch('face_recognition_app.services.detect_and_encode', return_value=found) as inline:
+            self.assertIsNone(get_worker_pool())
+            self.assertEqual(extract_faces(b'frame', FaceRecognitionSettings()), found)
+        inline.assert_called_once()
+
+    @override_settings(FACE_RECOGNITION_WORKER_ADDRESS='127.0.0.1:50055', FACE_RECOGNITION_WORKER_AUTHKEY=None)
+    def test_remote_pool_requires_authkey(self):
+        """Un pool remoto sin clave propia es un error de configuración, no un SECRET_KEY por defecto"""
+        with self.assertRaises(ImproperlyConfigured):
+            worker_settings()
+        with override_settings(FACE_RECOGNITION_WORKER_AUTHKEY='clave-del-despliegue'):
+            self.assertEqual(worker_settings()['authkey'], b'clave-del-despliegue')
+
+
+@override_settings(FACE_RECOGNITION_ENCODER='stub')
+class StubBackendTests(SimpleTestCase):
+    def test_stub_backends_are_deterministic(self):
+        """Los backends stub detectan y codifican sin dlib y siempre dan el mismo resultado"""
+        options = detection_options(FaceRecognitionSettings(
+            face_detection_model='stub', decode_min_width=0,
+        ))
+        frame = build_frame(1)
+        locations, _, encodings, _, _, _ = detect_and_encode(frame, options)
+        self.assertEqual(len(locations), 1)
+        np.testing.assert_array_equal(encodings, detect_and_encode(frame, options)[2])
+        np.testing.assert_array_equal(encodings, detect_and_encode(frame, dict(options, quality_max_yaw=45.0))[2])
+        self.assertEqual(detect_and_encode(_blank_frame().read(), options)[0], [])
+
+    def test_opencv_dnn_detector_per_thread(self):
+        """Cada hilo usa su propia instancia de YuNet, porque el tamaño de entrada es estado compartido"""
+        detector = OpenCVDNNDetector()
+        detector.configure('yunet.onnx')
+        with patch('cv2.FaceDetectorYN') as yunet:
+            yunet.create.side_effect = lambda *args: MagicMock(detect=MagicMock(return_value=(1, None)))
+            detector.detect(np.zeros((480, 640, 3), dtype=np.uint8))
+            detector.detect(np.zeros((480, 640, 3), dtype=np.uint8))
+            other = threading.Thread(target=detector.detect, args=(np.zeros((240, 320, 3), dtype=np.uint8),))
+            other.start()
+            other.join()
+        self.assertEqual(yunet.create.call_count, 2)
+
+    def test_opencv_haar_detector_per_thread(self):
+        """La cascada Haar tampoco se comparte entre hilos"""
+        detector = OpenCVHaarDetector()
+        with patch('cv2.CascadeClassifier', create=True) as cascade:
+            cascade.return_value.empty.return_value = False
+            cascade.return_value.detectMultiScale.return_value = []
+            detector.detect(np.zeros((120, 160, 3), dtype=np.uint8))
+            detector.detect(np.zeros((120, 160, 3), dtype=np.uint8))
+            other = threading.Thread(target=detector.detect, args=(np.zeros((120, 160, 3), dtype=np.uint8),))
+            other.start()
+            other.join()
+        self.assertEqual(cascade.call_count, 2)
+
+
+class BackendRegistryTests(TestCase):
+    def tearDown(self):
+        DETECTORS.pop('custom', None)
+
+    def test_detectors_registered_later_are_selectable(self):
+        """El admin ofrece los detectores registrados después del arranque y el modelo rechaza los desconocidos"""
+        register_detector('custom', StubDetector())
+        self.assertIn('custom', dict(FaceRecognitionSettingsForm().fields['face_detection_model'].choices))
+        FaceRecognitionSettings(face_detection_model='custom').clean()
+        with self.assertRaises(ValidationError):
+            FaceRecognitionSettings(face_detection_model='desconocido').clean()
+
+    def test_reencode_faces_updates_stale_versions(self):
+        """reencode_faces recalcula todas las plantillas desde las imágenes de enrolamiento guardadas"""
+        student = User.objects.create_user('student1', 'student1@example.com', 'testpass123', role='student')
+        face_encoding = FaceEncoding(user=student)
+        face_encoding.set_templates([_encoding(1), _encoding(5)], 'old_v0')
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            face_encoding.profile_image.save('perfil.jpg', _blank_frame())
+            face_encoding.template_images = [face_encoding.profile_image.storage.save('face_templates/otra.jpg', _blank_frame())]
+            face_encoding.save()
+            with patch('face_recognition_app.management.commands.reencode_faces.get_face_encoding_from_image', side_effect=[_encoding(2), _encoding(6)]):
+                call_command('reencode_faces', stdout=StringIO())
+                self.assertEqual(FaceEncoding.objects.get().encoder_version, 'old_v0')
+                out = StringIO()
+                call_command('reencode_faces', '--apply', stdout=out)
+        face_encoding.refresh_from_db()
+        self.assertEqual(face_encoding.encoder_version, CURRENT_ENCODER_VERSION)
+        np.testing.assert_allclose(face_encoding.get_templates_array(), np.stack([_encoding(2), _encoding(6)]), rtol=1e-6)
+        self.assertNotIn('volver a enrolar', out.getvalue())
+
+
+@override_settings(FACE_RECOGNITION_WORKERS=0)
+class EncodingTierTests(TestCase):
+    def test_enrollment_uses_its_own_tier(self):
+        """El enrolamiento codifica con los landmarks y jitters configurados para ese nivel"""
+        settings = FaceRecognitionSettings.get_settings()
+        settings.enrollment_landmark_model, settings.enrollment_num_jitters = 'large', 3
+        settings.save()
+        with patch('face_recognition_app.services.encode_single', return_value=(_encoding(0), 1)) as encode:
+            get_face_encoding_from_image(_blank_frame())
+        self.assertEqual(encode.call_args.args[1:], ('large', 3))
+        self.assertEqual(settings.encoding_tier('live'), {'model': 'small', 'num_jitters': 1})
+
+
+class QualityFilterTests(SimpleTestCase):
+    def test_small_blurry_and_turned_faces_are_skipped(self):
+        """Solo se codifican los rostros que alcanzan los mínimos de tamaño, nitidez y giro"""
+        import face_recognition
+
+        frame, _ = decode_frame(build_frame(1))
+        boxes = face_recognition.face_locations(frame)
+        encoder = DlibEncoder()
+        options = {'quality_min_face_size': 40, 'quality_min_sharpness': 20.0, 'quality_max_yaw': 45.0}
+        kept, skipped, landmarks = filter_faces(frame, boxes, 1.0, options, encoder)
+        self.assertEqual((kept, skipped), ([0], {'small': 0, 'blurry': 0, 'turned': 0}))
+        self.assertEqual(filter_faces(frame, boxes, 0.25, options, encoder)[1]['small'], 1)
+        blurred = cv2.GaussianBlur(frame, (15, 15), 0)
+        self.assertEqual(filter_faces(blurred, boxes, 1.0, options, encoder)[1]['blurry'], 1)
+        self.assertEqual(filter_faces(frame, boxes, 1.0, dict(options, quality_max_yaw=0.1), encoder)[1]['turned'], 1)
+        large = dict(options, live_landmark_model='large')
+        self.assertEqual(filter_faces(frame, boxes, 1.0, large, encoder)[0], [0])
+
+        # Los landmarks del filtro se reutilizan al codificar y dan el mismo vector que face_recognition.
+        with patch('face_recognition.api._raw_face_landmarks') as raw_landmarks:
+            encoding = encoder.encode(frame, boxes, landmarks=landmarks)[0]
+        raw_landmarks.assert_not_called()
+        np.testing.assert_allclose(encoding, face_recognition.face_encodings(frame, boxes, model='small')[0], atol=1e-6)
+
+
+class TrackingTests(SimpleTestCase):
+    def test_associate_by_iou_and_centroid(self):
+        """Las cajas desplazadas levemente se asocian con su track previo"""
+        previous = [(100, 200, 200, 100), (100, 500, 200, 400)]
+        detections = [(105, 505, 205, 405), (110, 215, 210, 115), (400, 900, 500, 800)]
+        self.assertEqual(associate(detections, previous), {0: 1, 1: 0})
+
+    def test_tracks_expire_after_ttl(self):
+        """Un rostro que deja de verse vuelve a codificarse al vencer el TTL"""
+        tracker = SessionTracker(ttl_seconds=10)
+        tracker.update([(100, 200, 200, 100)], {}, {0: 7}, now=0)
+        self.assertEqual([track.student_id for track in tracker.confirmed_tracks(now=5)], [7])
+        self.assertEqual(tracker.confirmed_tracks(now=20), [])
+
+
+class CheckInTests(TestCase):
+    def setUp(self):
+        self.ficha = Ficha.objects.create(programa_formacion='ADSO', numero_ficha='100')
+        self.session = AttendanceSession.objects.create(
+            ficha=self.ficha, date=datetime.date.today(), start_time=datetime.time(0, 0), end_time=datetime.time(23, 59),
+        )
+        self.grace_deadline = timezone.now() + datetime.timedelta(minutes=5)
+        self.students = [
+            User.objects.create_user(f'student{i}', f'student{i}@example.com', 'testpass123', role='student')
+            for i in range(3)
+        ]
+        for student in self.students:
+            Attendance.objects.create(session=self.session, student=student)
+        Attendance.objects.filter(student=self.students[2]).update(status='excused')
+
+    def test_single_conditional_update(self):
+        """Solo se actualizan los ausentes y un segundo registro no cambia nada"""
+        student_ids = [student.id for student in self.students]
+        with self.assertNumQueries(1):
+            new_status, changed = check_in_students(self.session.id, student_ids, self.grace_deadline)
+        self.assertEqual(new_status, 'present')
+        self.assertEqual(set(changed), {self.students[0].id, self.students[1].id})
+        self.assertEqual(check_in_students(self.session.id, student_ids, self.grace_deadline)[1], {})
+
+        attendance = Attendance.objects.get(session=self.session, student=self.students[0])
+        self.assertEqual(attendance.status, 'present')
+        self.assertTrue(attendance.verified_by_face)
+        self.assertIsNotNone(attendance.check_in_time)
+        self.assertEqual(Attendance.objects.get(session=self.session, student=self.students[2]).status, 'excused')
+
+
+@override_settings(FACE_RECOGNITION_WORKERS=0)
+class SessionContextTests(TestCase):
+    def setUp(self):
+        self.ficha = Ficha.objects.create(programa_formacion='ADSO', numero_ficha='100')
+        self.session = AttendanceSession.objects.create(
+            ficha=self.ficha, date=datetime.date.today(), start_time=datetime.time(0, 0), end_time=datetime.time(23, 59),
+        )
+
+    def tearDown(self):
+        drop_session_context()
+
+    def test_warm_context_needs_no_queries(self):
+        """Tras activar la sesión, obtener su contexto no consulta la BD"""
+        build_session_context(self.session)
+        with self.assertNumQueries(0):
+            context = get_session_context(self.session.id)
+        self.assertEqual(context.ficha_id, self.ficha.id)
+
+    def test_settings_change_drops_context(self):
+        """Modificar la configuración descarta los contextos fijados"""
+        context = build_session_context(self.session)
+        context.settings.confidence_threshold = 0.5
+        context.settings.save()
+        self.assertIsNot(get_session_context(self.session.id), context)
+
+    def test_stale_context_rereads_other_process_changes(self):
+        """Pasado el TTL se releen los cambios hechos sin señales (p. ej. desde otro proceso)"""
+        context = build_session_context(self.session)
+        FaceRecognitionSettings.objects.update(confidence_threshold=0.45)
+        self.assertIs(get_session_context(self.session.id), context)
+        context.built_at -= 3600
+        self.assertEqual(get_session_context(self.session.id).settings.confidence_threshold, 0.45)
+
+    def test_finished_session_is_not_pinned(self):
+        """Una sesión que ya terminó se lee de la BD sin volver a fijarse en memoria"""
+        yesterday = datetime.date.today() - datetime.timedelta(days=1)
+        AttendanceSession.objects.filter(id=self.session.id).update(date=yesterday)
+        first = get_session_context(self.session.id)
+        self.assertTrue(first.is_expired())
+        self.assertIsNot(get_session_context(self.session.id), first)
+
+
+def _blank_frame(color=(128, 128, 128)):
+    buffer = BytesIO()
+    Image.new('RGB', (320, 240), color=color).save(buffer, format='JPEG')
+    return SimpleUploadedFile('frame.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(FACE_RECOGNITION_WORKERS=0)
+class AsyncRecognitionTests(APITestCase):
+    def setUp(self):
+        encoding_cache.invalidate()
+        self.instructor = User.objects.create_user('instructor1', 'instructor1@example.com', 'testpass123', role='instructor')
+        self.student = User.objects.create_user('student1', 'student1@example.com', 'testpass123', role='student')
+        self.ficha = Ficha.objects.create(programa_formacion='ADSO', numero_ficha='100')
+        self.ficha.instructors.add(self.instructor)
+        self.ficha.students.add(self.student)
+        _face_encoding(self.student, 1)
+        self.session = AttendanceSession.objects.create(
+            ficha=self.ficha, date=datetime.date.today(), start_time=datetime.time(7, 0), end_time=datetime.time(12, 0)
+        )
+        Attendance.objects.create(session=self.session, student=self.student)
+        self.client.force_authenticate(user=self.instructor)
+
+    def tearDown(self):
+        verification_log.flush()
+        drop_session_context()
+
+    def test_async_job_can_be_polled(self):
+        """Con Celery en modo eager, async=true responde el resultado en línea y el job_id sigue consultable"""
+        with self.assertLogs('face_recognition_app.views', level='WARNING'):
+            response = self.client.post(reverse('facial-recognition'), {
+                'session_id': self.session.id, 'image': _blank_frame(), 'async': 'true',
+            }, format='multipart')
+        self.assertEqual((response.status_code, response.data['status']), (status.HTTP_400_BAD_REQUEST, 'done'))
+
+        response = self.client.get(reverse('facial-recognition-job', args=[response.data['job_id']]))
+        self.assertEqual(response.data['status'], 'done')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], "No se detectó ningún rostro en la imagen.")
+
+    def test_attempt_is_logged_in_batches(self):
+        """Cada intento queda en el búfer y se inserta al vaciarlo, con la duración de sus etapas"""
+        verification_log.flush()
+        self.client.post(reverse('facial-recognition'), {
+            'session_id': self.session.id, 'image': _blank_frame(), 'camera_id': 'aula-1',
+        }, format='multipart')
+        self.assertEqual(FaceVerificationLog.objects.count(), 0)
+        self.assertEqual(verification_log.flush(), 1)
+        log = FaceVerificationLog.objects.get()
+        self.assertEqual((log.status, log.source, log.faces_detected), ('no_face_detected', 'aula-1', 0))
+        self.assertIsNotNone(log.detect_ms)
+
+        settings = FaceRecognitionSettings.get_settings()
+        settings.enable_logging = False
+        settings.save()
+        self.client.post(reverse('facial-recognition'), {'session_id': self.session.id, 'image': _blank_frame()}, format='multipart')
+        self.assertEqual(len(verification_log), 0)
+
+    def test_job_permissions_are_checked_before_its_state(self):
+        """Un trabajo pendiente de otra ficha no revela su estado y un job_id alterado no existe"""
+        other_ficha = Ficha.objects.create(programa_formacion='ADSO', numero_ficha='200')
+        other_session = AttendanceSession.objects.create(
+            ficha=other_ficha, date=datetime.date.today(), start_time=datetime.time(0, 0), end_time=datetime.time(23, 59)
+        )
+        response = self.client.get(reverse('facial-recognition-job', args=[new_job_id([other_session.id])]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertNotIn('status', response.data)
+
+        job_id = new_job_id([self.session.id])
+        response = self.client.get(reverse('facial-recognition-job', args=[job_id]))
+        self.assertEqual((response.status_code, response.data['status']), (status.HTTP_200_OK, 'pending'))
+        response = self.client.get(reverse('facial-recognition-job', args=[job_id[:-1] + ('A' if job_id[-1] != 'A' else 'B')]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(FACE_RECOGNITION_WORKERS=0)
+class RecognitionEndpointTests(APITestCase):
+    def setUp(self):
+        encoding_cache.invalidate()
+        self.instructor = User.objects.create_user('instructor1', 'instructor1@example.com', 'testpass123', role='instructor')
+        self.ficha = Ficha.objects.create(programa_formacion='ADSO', numero_ficha='100')
+        self.ficha.instructors.add(self.instructor)
+        self.session = AttendanceSession.objects.create(
+            ficha=self.ficha, date=datetime.date.today(), start_time=datetime.time(0, 0), end_time=datetime.time(23, 59)
+        )
+        self.students = []
+        for i in range(2):
+            student = User.objects.create_user(f'student{i}', f'student{i}@example.com', 'testpass123', role='student')
+            self.ficha.students.add(student)
+            _face_encoding(student, i)
+            Attendance.objects.create(session=self.session, student=student)
+            self.students.append(student)
+        self.client.force_authenticate(user=self.instructor)
+
+    def tearDown(self):
+        verification_log.flush()
+        drop_session_context()
+
+    def test_student_needs_votes_from_several_frames(self):
+        """Solo se registra el estudiante que coincide en burst_min_votes fotogramas"""
+        def frame(*seeds):
+            encodings = np.stack([_encoding(seed) + 0.01 for seed in seeds]).astype(np.float32)
+            boxes = [(10, 60 + 60 * i, 60, 10 + 60 * i) for i in range(len(seeds))]
+            return boxes, list(range(len(seeds))), encodings, {}, {'decode': 1.0, 'detect': 1.0, 'encode': 1.0}, {'small': 0, 'blurry': 1, 'turned': 0}
+
+        frames = [frame(0), frame(0, 1), frame(0)]
+        with patch('face_recognition_app.services.extract_faces_batch', return_value=frames):
+            response = self.client.post(reverse('facial-recognition-burst'), {
+                'session_id': self.session.id, 'images': [_blank_frame() for _ in frames],
+            }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(s['id'], s['votes']) for s in response.data['recognized_students']], [(self.students[0].id, 3)])
+        self.assertEqual(response.data['rejected_candidates'], 1)
+        self.assertEqual(response.data['skipped_faces']['blurry'], 3)
+        self.assertEqual(Attendance.objects.get(student=self.students[1]).status, 'absent')
+
+    def test_unchanged_scene_skips_detection(self):
+        """Con motion_threshold activado, un fotograma igual al último de la cámara reutiliza su resultado"""
+        settings = FaceRecognitionSettings.get_settings()
+        self.assertEqual(settings.motion_threshold, 0)
+        settings.motion_threshold = 0.01
+        settings.save()
+        found = (
+            [(10, 60, 60, 10)], [0], (_encoding(0) + 0.01).astype(np.float32).reshape(1, 128), {},
+            {'decode': 1.0, 'detect': 1.0, 'encode': 1.0}, {'small': 0, 'blurry': 0, 'turned': 0},
+        )
+        url = reverse('facial-recognition')
+        with patch('face_recognition_app.services.extract_faces', return_value=found) as extract:
+            first = self.client.post(url, {'session_id': self.session.id, 'image': _blank_frame(), 'camera_id': 'aula-1'}, format='multipart')
+            second = self.client.post(url, {'session_id': self.session.id, 'image': _blank_frame(), 'camera_id': 'aula-1'}, format='multipart')
+            self.client.post(url, {'session_id': self.session.id, 'image': _blank_frame((250, 250, 250)), 'camera_id': 'aula-1'}, format='multipart')
+            self.client.post(url, {'session_id': self.session.id, 'image': _blank_frame(), 'camera_id': 'aula-2'}, format='multipart')
+
+        self.assertEqual(extract.call_count, 3)
+        self.assertEqual(first.data['recognized_students'][0]['id'], self.students[0].id)
+        self.assertTrue(second.data['unchanged'])
+        self.assertEqual((second.data['recognized_students'], second.data['skip_ratio']), ([], 0.5))
+        verification_log.flush()
+        self.assertEqual(FaceVerificationLog.objects.filter(status='unchanged').count(), 1)
+
+    def test_tracked_face_is_not_reencoded(self):
+        """Un rostro ya reconocido y seguido no se vuelve a codificar hasta que vence REVERIFY_SECONDS"""
+        settings = FaceRecognitionSettings.get_settings()
+        settings.face_detection_model, settings.decode_min_width = 'stub', 0
+        settings.save()
+        encoder = MagicMock()
+        encoder.encode.side_effect = lambda image, boxes, **kwargs: [_encoding(0) + 0.01 for _ in boxes]
+        url, frame = reverse('facial-recognition'), build_frame(1)
+
+        def post():
+            return self.client.post(url, {'session_id': self.session.id, 'image': SimpleUploadedFile('frame.jpg', frame)}, format='multipart')
+
+        with patch.dict(ENCODERS, {'dlib': encoder}):
+            first = post()
+            second = post()
+            self.assertEqual(encoder.encode.call_count, 1)
+            with patch('face_recognition_app.tracking.REVERIFY_SECONDS', -1):
+                post()
+        self.assertEqual(first.data['recognized_students'][0]['id'], self.students[0].id)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(encoder.encode.call_count, 2)
+
+    def _other_session(self):
+        """Segunda sesión simultánea, de otra ficha del mismo instructor, con un estudiante propio."""
+        other_ficha = Ficha.objects.create(programa_formacion='ADSO', numero_ficha='200')
+        other_ficha.instructors.add(self.instructor)
+        other_session = AttendanceSession.objects.create(
+            ficha=other_ficha, date=datetime.date.today(), start_time=datetime.time(0, 0), end_time=datetime.time(23, 59)
+        )
+        guest = User.objects.create_user('student9', 'student9@example.com', 'testpass123', role='student')
+        other_ficha.students.add(guest)
+        _face_encoding(guest, 9)
+        Attendance.objects.create(session=other_session, student=guest)
+        found = (
+            [(10, 60, 60, 10), (10, 120, 60, 70)], [0, 1], np.stack([_encoding(0), _encoding(9)]).astype(np.float32) + 0.01, {},
+            {'decode': 1.0, 'detect': 1.0, 'encode': 1.0}, {'small': 0, 'blurry': 0, 'turned': 0},
+        )
+        return other_session, guest, found
+
+    def test_one_frame_checks_in_several_sessions(self):
+        """Un fotograma con session_ids registra a cada estudiante en la sesión de su ficha"""
+        other_session, guest, found = self._other_session()
+        with patch('face_recognition_app.services.extract_faces', return_value=found) as extract:
+            response = self.client.post(reverse('facial-recognition'), {
+                'session_ids': f'{self.session.id},{other_session.id}', 'image': _blank_frame(),
+            }, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(extract.call_count, 1)
+        self.assertEqual(
+            sorted((s['id'], s['session_id']) for s in response.data['recognized_students']),
+            sorted([(self.students[0].id, self.session.id), (guest.id, other_session.id)]),
+        )
+        self.assertNotEqual(Attendance.objects.get(session=other_session, student=guest).status, 'absent')
+        self.assertNotEqual(Attendance.objects.get(session=self.session, student=self.students[0]).status, 'absent')
+        self.assertEqual(Attendance.objects.get(session=self.session, student=self.students[1]).status, 'absent')
+        verification_log.flush()
+        self.assertEqual(FaceVerificationLog.objects.filter(session=other_session).count(), 1)
+
+    def test_async_job_with_several_sessions(self):
+        """Un trabajo asíncrono con session_ids se consulta con el desglose por sesión"""
+        other_session, guest, found = self._other_session()
+        with patch('face_recognition_app.services.extract_faces', return_value=found), self.assertLogs('face_recognition_app.views', level='WARNING'):
+            response = self.client.post(reverse('facial-recognition'), {
+                'session_ids': [self.session.id, other_session.id], 'image': _blank_frame(), 'async': 'true',
+            }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(reverse('facial-recognition-job', args=[response.data['job_id']]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'done')
+        self.assertEqual(
+            {entry['session_id']: [s['id'] for s in entry['recognized_students']] for entry in response.data['sessions']},
+            {self.session.id: [self.students[0].id], other_session.id: [guest.id]},
+        )
+
+        other_session.ficha.instructors.remove(self.instructor)
+        response = self.client.get(reverse('facial-recognition-job', args=[response.data['job_id']]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_embeddings_skip_image_processing(self):
+        """Las codificaciones del cliente se emparejan directamente y se valida la versión del codificador"""
+        payload = np.stack([_encoding(99), _encoding(1) + 0.01]).astype('<f4').tobytes()
+        response = self.client.post(reverse('facial-recognition-embeddings'), {
+            'session_id': self.session.id,
+            'encoder_version': CURRENT_ENCODER_VERSION,
+            'encodings': SimpleUploadedFile('encodings.bin', payload),
+            'boxes': '[[0, 50, 50, 0], [0, 150, 50, 100]]',
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['recognized_students'][0]['id'], self.students[1].id)
+        self.assertEqual(response.data['recognized_students'][0]['box'], [0, 150, 50, 100])
+        self.assertEqual(response.data['unmatched_faces'], 1)
+
+        response = self.client.post(reverse('facial-recognition-embeddings'), {
+            'session_id': self.session.id, 'encoder_version': 'other_model',
+            'encodings': base64.b64encode(payload).decode(),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('encoder_version', response.data)
+
+
+class BulkCheckInTests(APITestCase):
+    def setUp(self):
+        encoding_cache.invalidate()
+        self.instructor = User.objects.create_user('instructor1', 'instructor1@example.com', 'testpass123', role='instructor')
+        self.ficha = Ficha.objects.create(programa_formacion='ADSO', numero_ficha='100')
+        self.ficha.instructors.add(self.instructor)
+        self.session = AttendanceSession.objects.create(
+            ficha=self.ficha, date=datetime.date(2025, 3, 3), start_time=datetime.time(7, 0), end_time=datetime.time(12, 0), permisividad=10,
+        )
+        self.students = []
+        for i in range(3):
+            student = User.objects.create_user(f'student{i}', f'student{i}@example.com', 'testpass123', role='student')
+            self.ficha.students.add(student)
+            _face_encoding(student, i)
+            Attendance.objects.create(session=self.session, student=student)
+            self.students.append(student)
+        self.client.force_authenticate(user=self.instructor)
+
+    def test_capture_time_and_idempotency(self):
+        """El estado se decide con la hora de captura y reenviar los eventos no cambia nada"""
+        events = [
+            {'client_event_id': 'k1-1', 'session_id': self.session.id, 'captured_at': '2025-03-03T07:05:00', 'student_id': self.students[0].id},
+            {'client_event_id': 'k1-2', 'session_id': self.session.id, 'captured_at': '2025-03-03T07:30:00',
+             'encoding': base64.b64encode((_encoding(1) + 0.01).astype('<f4').tobytes()).decode(), 'encoder_version': CURRENT_ENCODER_VERSION},
+            {'client_event_id': 'k1-3', 'session_id': self.session.id, 'captured_at': '2025-03-03T07:40:00', 'student_id': self.students[0].id},
+            {'client_event_id': 'k1-4', 'session_id': self.session.id, 'captured_at': 'ayer', 'student_id': self.students[2].id},
+            {'client_event_id': 'k1-5', 'session_id': self.session.id, 'captured_at': '2025-03-04T07:05:00', 'student_id': self.students[2].id},
+            {'client_event_id': 'k1-6', 'session_id': self.session.id, 'captured_at': '2025-03-03T12:30:00', 'student_id': self.students[2].id},
+        ]
+        response = self.client.post(reverse('bulk-check-in'), {'events': events}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['applied'], response.data['already_checked_in'], response.data['rejected_count']), (2, 1, 3))
+        self.assertEqual([rejection['index'] for rejection in response.data['rejected']], [3, 4, 5])
+        statuses = dict(Attendance.objects.filter(session=self.session).values_list('student_id', 'status'))
+        self.assertEqual(
+            [statuses[student.id] for student in self.students], ['present', 'late', 'absent'],
+        )
+
+        response = self.client.post(reverse('bulk-check-in'), {'events': events[:3]}, format='json')
+        self.assertEqual((response.data['duplicates'], response.data['applied']), (3, 0))
+        self.assertEqual(CheckInEvent.objects.count(), 3)
+
+
+class CameraIngestorTests(TestCase):
+    def setUp(self):
+        self.ficha = Ficha.objects.create(programa_formacion='ADSO', numero_ficha='100')
+        self.session = AttendanceSession.objects.create(
+            ficha=self.ficha, date=datetime.date.today(), start_time=datetime.time(0, 0), end_time=datetime.time(23, 59),
+        )
+
+    def _write_video(self, path, frames, fps=10):
+        import cv2
+
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (160, 120))
+        for frame in frames:
+            writer.write(frame)
+        writer.release()
+
+    def test_still_frames_are_not_processed(self):
+        """Un video sin movimiento solo envía a reconocimiento el primer fotograma muestreado"""
+        still = np.full((120, 160, 3), 90, dtype=np.uint8)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'aula.avi')
+            self._write_video(path, [still] * 30)
+            ingestor = CameraIngestor(path, self.session.id, 'aula-1', min_interval=0.5, max_interval=0.5)
+            with patch('face_recognition_app.camera.recognize_faces_in_stream', return_value={'recognized_students': []}) as recognize:
+                stats = ingestor.run()
+
+        self.assertEqual(recognize.call_count, 1)
+        frame = recognize.call_args.args[0]
+        self.assertEqual(frame.shape, (120, 160, 3))
+        self.assertEqual(recognize.call_args.kwargs['source'], 'aula-1')
+        self.assertEqual(stats['read'], 30)
+        self.assertEqual((stats['sampled'], stats['still']), (6, 5))
+
+
+@override_settings(FACE_RECOGNITION_WORKERS=0)
+class StreamingTests(TransactionTestCase):
+    """Canal WebSocket probado directamente como aplicación ASGI (sin servidor)."""
+
+    def setUp(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        self.instructor = User.objects.create_user('instructor1', 'instructor1@example.com', 'testpass123', role='instructor')
+        outsider = User.objects.create_user('instructor2', 'instructor2@example.com', 'testpass123', role='instructor')
+        self.ficha = Ficha.objects.create(programa_formacion='ADSO', numero_ficha='100')
+        self.ficha.instructors.add(self.instructor)
+        self.session = AttendanceSession.objects.create(
+            ficha=self.ficha, date=datetime.date.today(), start_time=datetime.time(0, 0), end_time=datetime.time(23, 59)
+        )
+        self.token = str(AccessToken.for_user(self.instructor))
+        self.outsider_token = str(AccessToken.for_user(outsider))
+
+    def tearDown(self):
+        drop_session_context()
+
+    async def _connect(self, path, query='', subprotocols=()):
+        """Arranca la aplicación con un handshake; devuelve (cola de entrada, mensajes enviados, tarea)."""
+        inbox, sent = asyncio.Queue(), []
+
+        async def send(message):
+            sent.append(message)
+
+        await inbox.put({'type': 'websocket.connect'})
+        scope = {'type': 'websocket', 'path': path, 'query_string': query.encode(), 'headers': [], 'subprotocols': list(subprotocols)}
+        return inbox, sent, asyncio.create_task(websocket_application(scope, inbox.get, send))
+
+    async def _wait_for(self, condition, timeout=5):
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not condition():
+            self.assertLess(asyncio.get_running_loop().time(), deadline, "Tiempo de espera agotado")
+            await asyncio.sleep(0.01)
+
+    async def test_rejected_connections(self):
+        """Token inválido, sesión inexistente, instructor ajeno o ruta desconocida cierran sin aceptar"""
+        path = f'/ws/face/sessions/{self.session.id}/'
+        cases = [
+            (path, 'invalido', CLOSE_UNAUTHORIZED),
+            ('/ws/face/sessions/999999/', self.token, CLOSE_NOT_FOUND),
+            (path, self.outsider_token, CLOSE_FORBIDDEN),
+            ('/ws/otra/ruta/', self.token, CLOSE_NOT_FOUND),
+        ]
+        for case_path, token, code in cases:
+            _, sent, task = await self._connect(case_path, subprotocols=['bearer', token])
+            await asyncio.wait_for(task, 5)
+            self.assertEqual(sent, [{'type': 'websocket.close', 'code': code}])
+
+    async def test_token_in_first_message(self):
+        """Sin subprotocolo el JWT llega en el primer mensaje; el de la URL se ignora"""
+        path = f'/ws/face/sessions/{self.session.id}/'
+        inbox, sent, task = await self._connect(path)
+        await inbox.put({'type': 'websocket.receive', 'text': json.dumps({'token': self.outsider_token})})
+        await asyncio.wait_for(task, 5)
+        self.assertEqual(sent, [{'type': 'websocket.accept'}, {'type': 'websocket.close', 'code': CLOSE_FORBIDDEN}])
+
+        with self.settings(FACE_STREAM_AUTH_TIMEOUT=0.1):
+            _, sent, task = await self._connect(path, f'token={self.token}')
+            await asyncio.wait_for(task, 5)
+        self.assertEqual(sent, [{'type': 'websocket.accept'}, {'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED}])
+
+    async def test_deactivated_session_stops_recognition(self):
+        """Un fotograma recibido después de desactivar la sesión no se reconoce y se cierra el canal"""
+        with patch('face_recognition_app.streaming.recognize_faces_in_stream', return_value={'recognized_students': []}) as recognize:
+            inbox, sent, task = await self._connect(f'/ws/face/sessions/{self.session.id}/', subprotocols=['bearer', self.token])
+            await inbox.put({'type': 'websocket.receive', 'bytes': b'1'})
+            await self._wait_for(lambda: recognize.call_count == 1)
+
+            await AttendanceSession.objects.filter(id=self.session.id).aupdate(is_active=False)
+            drop_session_context(self.session.id)
+            await inbox.put({'type': 'websocket.receive', 'bytes': b'2'})
+            await self._wait_for(lambda: {'type': 'websocket.close', 'code': 1000} in sent)
+            await inbox.put({'type': 'websocket.receive', 'bytes': b'3'})
+            await asyncio.wait_for(task, 5)
+
+        self.assertEqual(recognize.call_count, 1)
+        self.assertEqual(sent[0], {'type': 'websocket.accept', 'subprotocol': 'bearer'})
+        self.assertIn({'type': 'session_inactive'}, [json.loads(message['text']) for message in sent if 'text' in message])
+
+    async def test_latest_frame_wins(self):
+        """Mientras se procesa un fotograma solo se conserva el más reciente; los intermedios se descartan"""
+        release, frames = threading.Event(), []
+
+        def recognitions():
+            messages = [json.loads(message['text']) for message in sent if 'text' in message]
+            return [message for message in messages if message['type'] == 'recognition']
+
+        def recognize(image, session_id, **client):
+            self.assertEqual((session_id, client['source']), (self.session.id, 'aula-1'))
+            frames.append(image.read())
+            if len(frames) == 1:
+                release.wait(5)
+            return {'recognized_students': []}
+
+        with patch('face_recognition_app.streaming.recognize_faces_in_stream', recognize):
+            inbox, sent, task = await self._connect(f'/ws/face/sessions/{self.session.id}/', 'camera_id=aula-1')
+            await inbox.put({'type': 'websocket.receive', 'text': json.dumps({'token': self.token})})
+            await inbox.put({'type': 'websocket.receive', 'bytes': b'1'})
+            await self._wait_for(lambda: frames)
+            for frame in (b'2', b'3', b'4'):
+                await inbox.put({'type': 'websocket.receive', 'bytes': frame})
+            await self._wait_for(inbox.empty)
+            await asyncio.sleep(0.05)
+            release.set()
+            await self._wait_for(lambda: len(recognitions()) == 2)
+            await inbox.put({'type': 'websocket.disconnect'})
+            await asyncio.wait_for(task, 5)
+
+        self.assertEqual(sent[0], {'type': 'websocket.accept'})
+        self.assertEqual(frames, [b'1', b'4'])
+        self.assertEqual(recognitions()[-1]['dropped_frames'], 2)
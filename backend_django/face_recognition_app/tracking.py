@@ -0,0 +1,122 @@
+# face_recognition_app/tracking.py
+"""
+Seguimiento de rostros entre fotogramas consecutivos de una misma sesión.
+
+Una detección que coincide (por IoU o por cercanía de centros) con un rostro ya
+identificado en un fotograma reciente no se vuelve a codificar. Este módulo no
+depende de Django porque la asociación se calcula en los procesos del pool.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+# Una detección pertenece a un track si el IoU supera este valor...
+IOU_THRESHOLD = 0.4
+# ...o si su centro está a menos de esta fracción del tamaño de la caja.
+CENTROID_FACTOR = 0.3
+# Los tracks confirmados se vuelven a verificar periódicamente por si cambió la persona.
+REVERIFY_SECONDS = 120
+MAX_TRACKED_SESSIONS = 256
+
+
+def box_iou(a, b):
+    """IoU entre dos cajas en formato (top, right, bottom, left)."""
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    intersection = max(0, right - left) * max(0, bottom - top)
+    if intersection == 0:
+        return 0.0
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return intersection / float(area_a + area_b - intersection)
+
+
+def _centroid_close(a, b):
+    size = max(a[1] - a[3], a[2] - a[0], b[1] - b[3], b[2] - b[0])
+    dy = (a[0] + a[2] - b[0] - b[2]) / 2.0
+    dx = (a[1] + a[3] - b[1] - b[3]) / 2.0
+    return (dx * dx + dy * dy) ** 0.5 <= CENTROID_FACTOR * size
+
+
+def associate(detections, boxes):
+    """
+    Asociación voraz uno a uno entre detecciones y cajas previas.
+    Devuelve {índice_detección: índice_caja}.
+    """
+    candidates = []
+    for det_index, detection in enumerate(detections):
+        for box_index, box in enumerate(boxes):
+            iou = box_iou(detection, box)
+            if iou >= IOU_THRESHOLD or _centroid_close(detection, box):
+                candidates.append((iou, det_index, box_index))
+    candidates.sort(reverse=True)
+
+    pairs = {}
+    used_boxes = set()
+    for _, det_index, box_index in candidates:
+        if det_index not in pairs and box_index not in used_boxes:
+            pairs[det_index] = box_index
+            used_boxes.add(box_index)
+    return pairs
+
+
+class Track:
+    __slots__ = ('box', 'student_id', 'last_seen', 'confirmed_at')
+
+    def __init__(self, box, student_id, now):
+        self.box = tuple(box)
+        self.student_id = student_id
+        self.last_seen = now
+        self.confirmed_at = now
+
+
+class SessionTracker:
+    """Rostros ya identificados en una sesión, con expiración si dejan de verse."""
+
+    def __init__(self, ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self._tracks = []
+        self._lock = threading.Lock()
+
+    def confirmed_tracks(self, now=None):
+        """Tracks vigentes cuyos rostros no hace falta volver a codificar."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._tracks = [track for track in self._tracks if now - track.last_seen <= self.ttl_seconds]
+            return [track for track in self._tracks if now - track.confirmed_at <= REVERIFY_SECONDS]
+
+    def update(self, locations, tracked, matched, now=None):
+        """
+        Actualiza los tracks con el fotograma procesado.
+        tracked: {índice_detección: Track} asociados sin codificar.
+        matched: {índice_detección: student_id} reconocidos en este fotograma.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            for det_index, track in tracked.items():
+                track.box = tuple(locations[det_index])
+                track.last_seen = now
+            for det_index, student_id in matched.items():
+                existing = next((track for track in self._tracks if track.student_id == student_id), None)
+                if existing is None:
+                    self._tracks.append(Track(locations[det_index], student_id, now))
+                else:
+                    existing.box = tuple(locations[det_index])
+                    existing.last_seen = existing.confirmed_at = now
+
+
+_trackers = OrderedDict()
+_trackers_lock = threading.Lock()
+
+
+def get_session_tracker(session_id, ttl_seconds):
+    with _trackers_lock:
+        tracker = _trackers.get(session_id)
+        if tracker is None:
+            tracker = _trackers[session_id] = SessionTracker(ttl_seconds)
+            while len(_trackers) > MAX_TRACKED_SESSIONS:
+                _trackers.popitem(last=False)
+        else:
+            tracker.ttl_seconds = ttl_seconds
+            _trackers.move_to_end(session_id)
+        return tracker
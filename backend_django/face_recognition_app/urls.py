@@ -1,6 +1,6 @@
 # face_recognition_app/urls.py
 from django.urls import path
-from .views import FacialRegistrationView, FacialRecognitionView
+from .views import FacialRegistrationView, FacialRecognitionView, FacialBurstRecognitionView, EmbeddingRecognitionView, BulkCheckInView, RecognitionStatsView, FacialRecognitionJobView
 
 urlpatterns = [
     # Endpoint para que un estudiante registre su rostro
@@ -8,4 +8,19 @@ urlpatterns = [
     
     # Endpoint para el proceso de reconocimiento en tiempo real
     path('recognize/', FacialRecognitionView.as_view(), name='facial-recognition'),
+
+    # Endpoint para reconocimiento sobre una ráfaga de fotogramas con votación
+    path('recognize/burst/', FacialBurstRecognitionView.as_view(), name='facial-recognition-burst'),
+
+    # Endpoint para clientes que envían codificaciones ya calculadas
+    path('recognize/embeddings/', EmbeddingRecognitionView.as_view(), name='facial-recognition-embeddings'),
+
+    # Endpoint para cargar los eventos de asistencia de kioscos sin conexión
+    path('checkins/bulk/', BulkCheckInView.as_view(), name='bulk-check-in'),
+
+    # Métricas del reconocimiento (fotogramas omitidos, caché)
+    path('recognize/stats/', RecognitionStatsView.as_view(), name='facial-recognition-stats'),
+
+    # Endpoint para consultar el resultado de un reconocimiento asíncrono
+    path('recognize/<str:job_id>/', FacialRecognitionJobView.as_view(), name='facial-recognition-job'),
 ]
\ No newline at end of file
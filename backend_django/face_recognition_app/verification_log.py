@@ -0,0 +1,78 @@
+# face_recognition_app/verification_log.py
+"""
+Escritura diferida de FaceVerificationLog.
+
+Los intentos de reconocimiento se acumulan en memoria y se insertan con bulk_create
+cuando el búfer alcanza `batch_size` registros o cuando pasan `flush_seconds` desde
+el primer registro pendiente, de modo que el registro no agrega consultas al
+procesamiento de cada fotograma. Lo pendiente se escribe también al terminar el proceso.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class VerificationLogBuffer:
+    def __init__(self, batch_size=200, flush_seconds=5.0):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._pending = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def add(self, **fields):
+        """Encola un registro; lo inserta junto con los demás al llenarse el lote o vencer el plazo."""
+        from .models import FaceVerificationLog
+
+        with self._lock:
+            self._pending.append(FaceVerificationLog(**fields))
+            full = len(self._pending) >= self.batch_size
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.flush_seconds, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Inserta los registros pendientes en una sola operación por lote."""
+        from .models import FaceVerificationLog
+
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return 0
+        try:
+            FaceVerificationLog.objects.bulk_create(pending, batch_size=self.batch_size)
+        except Exception:
+            # El registro nunca debe interrumpir el reconocimiento.
+            logger.exception(f"No se pudieron guardar {len(pending)} registros de verificación facial.")
+            return 0
+        return len(pending)
+
+    def _flush_from_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            # El temporizador corre en su propio hilo, que tiene su propia conexión.
+            connections.close_all()
+
+    def __len__(self):
+        return len(self._pending)
+
+
+verification_log = VerificationLogBuffer(
+    batch_size=getattr(settings, 'FACE_VERIFICATION_LOG_BATCH_SIZE', 200),
+    flush_seconds=getattr(settings, 'FACE_VERIFICATION_LOG_FLUSH_SECONDS', 5),
+)
+atexit.register(verification_log.flush)
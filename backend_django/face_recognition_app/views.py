@@ -1,12 +1,31 @@
 # face_recognition_app/views.py
+import base64
+import logging
+from django.conf import settings
+from django.core import signing
 from rest_framework import generics, views, permissions, status
 from rest_framework.response import Response
 from .models import FaceEncoding
-from .serializers import FaceEncodingSerializer
-from .services import get_face_encoding_from_image, recognize_faces_in_stream
+from .serializers import EmbeddingRecognitionSerializer, FaceEncodingSerializer
+from .services import get_face_encoding_from_image, recognize_embeddings, recognize_faces_in_burst, recognize_faces_in_stream
+from .ingest import ingest_check_in_events
+from .cache import encoding_cache
+from .motion import motion_stats
+from .tasks import job_session_ids, new_job_id, recognize_frame_task
 from attendance.models import AttendanceSession
 from attendance.permissions import IsInstructorOfFicha
 
+logger = logging.getLogger(__name__)
+
+
+def _job_response(job_id, result):
+    """Respuesta de un trabajo terminado; session_id ya viene en el job_id firmado."""
+    result = dict(result)
+    result.pop('session_id', None)
+    code = status.HTTP_400_BAD_REQUEST if 'error' in result else status.HTTP_200_OK
+    return Response({'job_id': job_id, 'status': 'done', **result}, status=code)
+
+
 class FacialRegistrationView(generics.CreateAPIView):
     """
     Vista para que un estudiante registre su rostro.
@@ -43,23 +62,97 @@ class FacialRegistrationView(generics.CreateAPIView):
         serializer = self.get_serializer(face_encoding_obj)
         return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
+
 class FacialRecognitionView(views.APIView):
     """
     Vista para el reconocimiento facial en tiempo real.
-    Recibe una imagen y el ID de la sesión activa.
+    Recibe una imagen y el ID de la sesión activa, o varias en session_ids (lista o separadas
+    por comas) cuando una misma cámara cubre sesiones simultáneas: el fotograma se procesa
+    una sola vez y cada asistencia se registra en la sesión que le corresponde.
+    Con async=true el fotograma se encola en Celery y se responde de inmediato con un job_id.
+    Si Celery se ejecuta en modo eager (sin REDIS_URL) no hay cola: la tarea corre dentro
+    de la petición y se responde directamente con su resultado.
     """
     permission_classes = [permissions.IsAuthenticated, IsInstructorOfFicha]
+    max_sessions = 4
+
+    def _session_ids(self, request):
+        if hasattr(request.data, 'getlist'):
+            values = request.data.getlist('session_ids')
+        else:
+            values = request.data.get('session_ids') or []
+            values = values if isinstance(values, list) else [values]
+        ids = [value.strip() for item in values for value in str(item).split(',') if value.strip()]
+        if not ids and request.data.get('session_id'):
+            ids = [request.data.get('session_id')]
+        return list(dict.fromkeys(ids))
 
     def post(self, request, *args, **kwargs):
-        session_id = request.data.get('session_id')
+        session_ids = self._session_ids(request)
         image_file = request.data.get('image')
 
-        if not session_id or not image_file:
-            return Response({'error': 'Se requiere session_id y una imagen.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not session_ids or not image_file:
+            return Response({'error': 'Se requiere session_id (o session_ids) y una imagen.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(session_ids) > self.max_sessions:
+            return Response({'error': f'Se admiten como máximo {self.max_sessions} sesiones por fotograma.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        sessions = []
+        for session_id in session_ids:
+            try:
+                session = AttendanceSession.objects.get(id=session_id)
+                # Verificar permisos del instructor sobre la ficha de la sesión
+                self.check_object_permissions(request, session.ficha)
+            except (AttendanceSession.DoesNotExist, ValueError):
+                return Response({'error': f'La sesión de asistencia {session_id} no existe.'}, status=status.HTTP_404_NOT_FOUND)
+
+            if not session.is_active:
+                return Response({'error': f'La sesión de asistencia {session_id} no está activa para el reconocimiento facial.'}, status=status.HTTP_403_FORBIDDEN)
+            sessions.append(session)
+        target = sessions[0].id if len(sessions) == 1 else [session.id for session in sessions]
+
+        # Origen del fotograma para el registro de verificación
+        client = {
+            'source': request.data.get('camera_id', ''),
+            'ip_address': request.META.get('REMOTE_ADDR'),
+            'user_agent': request.META.get('HTTP_USER_AGENT'),
+        }
+
+        if str(request.data.get('async', '')).lower() in ('1', 'true'):
+            image_b64 = base64.b64encode(image_file.read()).decode('ascii')
+            job = recognize_frame_task.apply_async((image_b64, target), client, task_id=new_job_id([session.id for session in sessions]))
+            if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+                logger.warning("async=true con CELERY_TASK_ALWAYS_EAGER (sin REDIS_URL): el reconocimiento se ejecutó dentro de la petición.")
+                return _job_response(job.id, job.result)
+            return Response({'job_id': job.id, 'status': 'pending'}, status=status.HTTP_202_ACCEPTED)
+
+        # Llamar al servicio de reconocimiento
+        result = recognize_faces_in_stream(image_file, target, **client)
+
+        if 'error' in result:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class FacialBurstRecognitionView(views.APIView):
+    """
+    Reconocimiento sobre una ráfaga corta de fotogramas (campo 'images' repetido) en una sola petición.
+    Un estudiante se registra solo si coincide en al menos burst_min_votes fotogramas.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsInstructorOfFicha]
+    max_frames = 8
+
+    def post(self, request, *args, **kwargs):
+        session_id = request.data.get('session_id')
+        image_files = request.FILES.getlist('images')
+
+        if not session_id or not image_files:
+            return Response({'error': 'Se requiere session_id y al menos una imagen en images.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(image_files) > self.max_frames:
+            return Response({'error': f'La ráfaga admite como máximo {self.max_frames} fotogramas.'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
             session = AttendanceSession.objects.get(id=session_id)
-            # Verificar permisos del instructor sobre la ficha de la sesión
             self.check_object_permissions(request, session.ficha)
         except AttendanceSession.DoesNotExist:
             return Response({'error': 'La sesión de asistencia no existe.'}, status=status.HTTP_404_NOT_FOUND)
@@ -67,10 +160,103 @@ class FacialRecognitionView(views.APIView):
         if not session.is_active:
             return Response({'error': 'Esta sesión de asistencia no está activa para el reconocimiento facial.'}, status=status.HTTP_403_FORBIDDEN)
 
-        # Llamar al servicio de reconocimiento
-        result = recognize_faces_in_stream(image_file, session_id)
+        result = recognize_faces_in_burst(
+            image_files, session.id,
+            source=request.data.get('camera_id', ''),
+            ip_address=request.META.get('REMOTE_ADDR'),
+            user_agent=request.META.get('HTTP_USER_AGENT'),
+        )
+        if 'error' in result:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class EmbeddingRecognitionView(views.APIView):
+    """
+    Reconocimiento con codificaciones calculadas en el cliente (kioscos con CPU propia).
+    Recibe n x 128 float32 little-endian (archivo 'encodings' o base64), las cajas de cada
+    rostro y la versión del codificador; solo se ejecutan el emparejamiento y la asistencia.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsInstructorOfFicha]
+
+    def post(self, request, *args, **kwargs):
+        serializer = EmbeddingRecognitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
 
+        try:
+            session = AttendanceSession.objects.get(id=data['session_id'])
+            self.check_object_permissions(request, session.ficha)
+        except AttendanceSession.DoesNotExist:
+            return Response({'error': 'La sesión de asistencia no existe.'}, status=status.HTTP_404_NOT_FOUND)
+
+        if not session.is_active:
+            return Response({'error': 'Esta sesión de asistencia no está activa para el reconocimiento facial.'}, status=status.HTTP_403_FORBIDDEN)
+
+        result = recognize_embeddings(
+            data['encodings'], data['boxes'], session.id,
+            source=data['camera_id'],
+            ip_address=request.META.get('REMOTE_ADDR'),
+            user_agent=request.META.get('HTTP_USER_AGENT'),
+        )
         if 'error' in result:
             return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class BulkCheckInView(views.APIView):
+    """
+    Carga en lote de eventos de asistencia de kioscos sin conexión.
+    Recibe {"events": [{client_event_id, session_id, captured_at, student_id | encoding + encoder_version}]}.
+    Volver a enviar eventos ya cargados no tiene efecto (idempotente por client_event_id).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        events = request.data.get('events')
+        max_events = getattr(settings, 'FACE_CHECKIN_BULK_MAX_EVENTS', 20000)
+        if not isinstance(events, list) or not events:
+            return Response({'error': 'Se requiere una lista de eventos en events.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(events) > max_events:
+            return Response({'error': f'Se admiten como máximo {max_events} eventos por carga.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(ingest_check_in_events(events, request.user), status=status.HTTP_200_OK)
+
+
+class RecognitionStatsView(views.APIView):
+    """
+    Métricas en memoria del proceso que atiende la petición: fotogramas omitidos por
+    escena sin cambios (skip_ratio) y uso de la caché de codificaciones.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response({'motion': motion_stats(), 'encoding_cache': encoding_cache.stats()})
+
+
+class FacialRecognitionJobView(views.APIView):
+    """
+    Consulta el estado de un reconocimiento asíncrono encolado con async=true.
+    Los permisos se comprueban sobre las sesiones firmadas en el job_id antes de informar
+    cualquier estado, incluso si el trabajo sigue pendiente o falló.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsInstructorOfFicha]
+
+    def get(self, request, job_id, *args, **kwargs):
+        try:
+            session_ids = job_session_ids(job_id)
+        except signing.BadSignature:
+            return Response({'error': 'El trabajo de reconocimiento no existe.'}, status=status.HTTP_404_NOT_FOUND)
+        # Un trabajo con session_ids abarca varias sesiones; hay permiso sobre todas o sobre ninguna.
+        sessions = AttendanceSession.objects.select_related('ficha').filter(id__in=session_ids)
+        if len(sessions) != len(set(session_ids)):
+            return Response({'error': 'La sesión de asistencia no existe.'}, status=status.HTTP_404_NOT_FOUND)
+        for session in sessions:
+            self.check_object_permissions(request, session.ficha)
 
-        return Response(result, status=status.HTTP_200_OK)
\ No newline at end of file
+        job = recognize_frame_task.AsyncResult(job_id)
+        if job.failed():
+            return Response({'job_id': job_id, 'status': 'failed', 'error': 'El reconocimiento falló en el servidor.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if not job.successful():
+            return Response({'job_id': job_id, 'status': 'pending'}, status=status.HTTP_200_OK)
+        return _job_response(job_id, job.result)
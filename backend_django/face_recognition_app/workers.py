@@ -0,0 +1,406 @@
+# face_recognition_app/workers.py
+"""
+Pool de procesos dedicados al trabajo de CPU del reconocimiento (decodificación,
+detección y codificación). Cada proceso carga los modelos de dlib una sola vez al
+arrancar. Este módulo no depende de Django para que los procesos hijos lo importen
+sin configurar el proyecto; el emparejamiento y las escrituras en BD siguen en Django.
+"""
+import itertools
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future
+from io import BytesIO
+from multiprocessing.managers import BaseManager
+from queue import Empty
+from types import SimpleNamespace
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Carriles de prioridad: 'live' (face/recognize/) siempre se atiende antes que 'enrollment'.
+LANES = ('live', 'enrollment')
+ENROLLMENT_POLL_SECONDS = 0.05
+# Margen de los recortes de rostros, en fracción del tamaño de la caja.
+CROP_MARGIN = 0.5
+
+
+def _load_image(image):
+    import face_recognition
+
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        image = BytesIO(image)
+    return face_recognition.load_image_file(image)
+
+
+def decode_frame(image, min_width=0):
+    """
+    Decodifica un fotograma directamente desde el búfer recibido. Los JPEG de al menos el
+    doble de `min_width` se decodifican reducidos en el dominio DCT (Image.draft: 1/2, 1/4
+    u 1/8) sin bajar de ese ancho, lo que ahorra tiempo y memoria frente a decodificar a
+    resolución completa y luego reducir.
+    Los fotogramas ya decodificados (arreglos RGB, p. ej. de una cámara) se usan tal cual.
+    Devuelve (arreglo RGB, factor para llevar coordenadas a la imagen original).
+    """
+    from PIL import Image
+
+    if isinstance(image, np.ndarray):
+        return image, 1.0
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        image = BytesIO(image)
+    with Image.open(image) as picture:
+        width = picture.width
+        if min_width and picture.format == 'JPEG' and width >= 2 * min_width:
+            picture.draft('RGB', (min_width, picture.height * min_width // width))
+        frame = np.asarray(picture if picture.mode == 'RGB' else picture.convert('RGB'))
+    return frame, width / frame.shape[1]
+
+
+def crop_faces(frame, locations):
+    """
+    Recorta cada rostro con un margen alrededor de su caja. Devuelve [(recorte, caja relativa
+    al recorte)]: codificar el recorte da el mismo resultado que codificar sobre el fotograma
+    completo, y los recortes pesan mucho menos que el fotograma al enviarlos a otro proceso.
+    """
+    height, width = frame.shape[:2]
+    crops = []
+    for top, right, bottom, left in locations:
+        margin_y, margin_x = int((bottom - top) * CROP_MARGIN), int((right - left) * CROP_MARGIN)
+        y0, x0 = max(0, top - margin_y), max(0, left - margin_x)
+        y1, x1 = min(height, bottom + margin_y), min(width, right + margin_x)
+        crops.append((np.ascontiguousarray(frame[y0:y1, x0:x1]), (top - y0, right - x0, bottom - y0, left - x0)))
+    return crops
+
+
+def encode_crops(crops, model='small', num_jitters=1, encoder='dlib'):
+    """Codifica rostros ya recortados (ver crop_faces). Devuelve una matriz n x 128."""
+    from .backends import get_encoder
+
+    encoder = get_encoder(encoder)
+    encodings = [encoder.encode(crop, [box], model, num_jitters)[0] for crop, box in crops]
+    return np.asarray(encodings, dtype=np.float32).reshape(-1, 128)
+
+
+def detect_and_encode(image, detection_options, skip_boxes=(), defer_encoding_from=0):
+    """
+    Detecta los rostros de un fotograma y codifica los que no coinciden con `skip_boxes`
+    (rostros ya identificados en fotogramas anteriores).
+    Las cajas (las devueltas y `skip_boxes`) están en coordenadas de la imagen original
+    aunque la decodificación haya sido reducida.
+    Los rostros que no alcanzan los mínimos de calidad (ver quality.py) no se codifican.
+    Devuelve (cajas, índices codificados, matriz n x 128, {índice_detección: índice_skip_box},
+    {'decode'|'detect'|'quality'|'encode': milisegundos}, {motivo: rostros descartados por calidad}).
+    Si hay al menos `defer_encoding_from` rostros por codificar (0 = nunca), en lugar de la
+    matriz se devuelve la lista de recortes de crop_faces para codificarlos en paralelo.
+    """
+    from .backends import get_encoder
+    from .detection import _scale_boxes, detect_faces
+    from .quality import filter_faces
+    from .tracking import associate
+
+    started = time.perf_counter()
+    frame, scale = decode_frame(image, detection_options.get('decode_min_width', 0))
+    decoded = time.perf_counter()
+    locations = detect_faces(frame, SimpleNamespace(**detection_options))
+    detected = time.perf_counter()
+    height, width = frame.shape[:2]
+    if scale != 1 and skip_boxes:
+        skip_boxes = _scale_boxes(skip_boxes, 1.0 / scale, 0, height, width)
+    tracked = associate(locations, skip_boxes) if skip_boxes else {}
+    candidates = [index for index in range(len(locations)) if index not in tracked]
+    encoder = get_encoder(detection_options.get('face_encoder', 'dlib'))
+    kept, skipped, landmarks = filter_faces(frame, [locations[index] for index in candidates], scale, detection_options, encoder)
+    encoded_indices = [candidates[position] for position in kept]
+    to_encode = [locations[index] for index in encoded_indices]
+    assessed = time.perf_counter()
+    if not to_encode:
+        # Todos los rostros están seguidos o descartados: no se llama al codificador.
+        encodings = np.empty((0, 128), dtype=np.float32)
+    elif defer_encoding_from and len(to_encode) >= defer_encoding_from:
+        encodings = crop_faces(frame, to_encode)
+    else:
+        encodings = encoder.encode(
+            frame, to_encode,
+            model=detection_options.get('live_landmark_model', 'small'),
+            num_jitters=max(1, detection_options.get('live_num_jitters', 1)),
+            landmarks=landmarks,
+        )
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, 128)
+    if scale != 1:
+        locations = _scale_boxes(locations, scale, 0, int(round(height * scale)), int(round(width * scale)))
+    timings = {
+        'decode': (decoded - started) * 1000,
+        'detect': (detected - decoded) * 1000,
+        'quality': (assessed - detected) * 1000,
+        'encode': (time.perf_counter() - assessed) * 1000,
+    }
+    return locations, encoded_indices, encodings, tracked, timings, skipped
+
+
+def detect_and_encode_batch(images, detection_options, skip_boxes=()):
+    """detect_and_encode sobre una ráfaga de fotogramas en una sola llamada al pool."""
+    return [detect_and_encode(image, detection_options, skip_boxes) for image in images]
+
+
+def encode_single(image, model='small', num_jitters=1, detection_options=None):
+    """
+    Codificación de una imagen de enrolamiento con el detector y el codificador de
+    `detection_options` (HOG y dlib si no se indican).
+    Devuelve (codificación o None, rostros encontrados).
+    """
+    from .backends import get_detector, get_encoder
+
+    options = detection_options or {}
+    image = _load_image(image)
+    # Se detecta primero: los jitters solo se pagan si hay exactamente un rostro.
+    locations = get_detector(options.get('face_detection_model', 'hog'), options.get('opencv_dnn_model')).detect(image)
+    if len(locations) != 1:
+        return None, len(locations)
+    return get_encoder(options.get('face_encoder', 'dlib')).encode(image, locations, model, num_jitters)[0], 1
+
+
+TASKS = {
+    'detect_and_encode': detect_and_encode,
+    'detect_and_encode_batch': detect_and_encode_batch,
+    'encode_single': encode_single,
+    'encode_crops': encode_crops,
+}
+
+
+def _worker_main(live_queue, enrollment_queue, result_queue, serves_enrollment):
+    # Importar face_recognition carga los modelos de dlib una única vez por proceso.
+    import face_recognition  # noqa: F401
+
+    while True:
+        try:
+            task = live_queue.get(timeout=ENROLLMENT_POLL_SECONDS if serves_enrollment else None)
+        except Empty:
+            try:
+                task = enrollment_queue.get_nowait()
+            except Empty:
+                continue
+        if task is None:
+            break
+        task_id, name, args = task
+        try:
+            result_queue.put((task_id, True, TASKS[name](*args)))
+        except Exception as e:
+            result_queue.put((task_id, False, f"{type(e).__name__}: {e}"))
+
+
+class RecognitionWorkerPool:
+    """
+    Pool de procesos de reconocimiento con carriles de prioridad.
+
+    Los primeros `live_reserved` procesos solo atienden el carril 'live', de modo que
+    un enrolamiento o una recodificación masiva nunca deja sin trabajador al
+    reconocimiento en vivo; el resto atiende 'live' primero y luego 'enrollment'.
+    Un proceso que muere se reemplaza en el siguiente envío; las tareas que tenía en
+    curso terminan por timeout.
+    """
+
+    def __init__(self, size, live_reserved=1, timeout=None):
+        self._context = multiprocessing.get_context('spawn')
+        self.size = size
+        self.timeout = timeout
+        self._queues = {lane: self._context.Queue() for lane in LANES}
+        self._results = self._context.Queue()
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._closed = False
+        # Al menos un proceso atiende el carril de enrolamiento.
+        self._live_reserved = min(live_reserved, size - 1)
+        self._processes = [self._start_worker(index) for index in range(size)]
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+        logger.info(f"Pool de reconocimiento iniciado con {size} procesos.")
+
+    def _start_worker(self, index):
+        process = self._context.Process(
+            target=_worker_main,
+            args=(self._queues['live'], self._queues['enrollment'], self._results, index >= self._live_reserved),
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def _replace_dead_workers(self):
+        with self._lock:
+            if self._closed:
+                return
+            for index, process in enumerate(self._processes):
+                if not process.is_alive():
+                    logger.warning(f"El proceso de reconocimiento {process.pid} terminó (código {process.exitcode}); se reemplaza.")
+                    process.join(timeout=0)
+                    self._processes[index] = self._start_worker(index)
+
+    def submit(self, task, *args, lane='live'):
+        if lane not in LANES:
+            raise ValueError(f"Carril desconocido: {lane}")
+        self._replace_dead_workers()
+        future = Future()
+        with self._lock:
+            task_id = next(self._ids)
+            self._futures[task_id] = future
+        future.task_id = task_id
+        self._queues[lane].put((task_id, task, args))
+        return future
+
+    def _forget(self, future):
+        """Descarta un futuro que ya no se espera (p. ej. por timeout) para no acumularlo."""
+        with self._lock:
+            self._futures.pop(future.task_id, None)
+
+    def _result(self, future, timeout):
+        try:
+            return future.result(timeout)
+        finally:
+            self._forget(future)
+
+    def run(self, task, *args, lane='live', timeout=None):
+        return self._result(self.submit(task, *args, lane=lane), timeout if timeout is not None else self.timeout)
+
+    def map(self, task, args_list, lane='live', timeout=None):
+        """Envía varias tareas a la vez (una por tupla de argumentos) y devuelve sus resultados en orden."""
+        futures = [self.submit(task, *args, lane=lane) for args in args_list]
+        timeout = timeout if timeout is not None else self.timeout
+        try:
+            return [future.result(timeout) for future in futures]
+        finally:
+            for future in futures:
+                self._forget(future)
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+        for _ in self._processes:
+            self._queues['live'].put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+        self._results.put(None)
+
+    def _collect(self):
+        while True:
+            message = self._results.get()
+            if message is None:
+                break
+            task_id, ok, value = message
+            with self._lock:
+                future = self._futures.pop(task_id, None)
+            if future is None:
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(RuntimeError(value))
+
+
+class _PoolFacade:
+    """Objeto expuesto por el servidor compartido; cada conexión cliente corre en su propio hilo."""
+
+    def __init__(self, pool):
+        self._pool = pool
+
+    def run(self, task, args, lane):
+        return self._pool.run(task, *args, lane=lane)
+
+    def map(self, task, args_list, lane):
+        return self._pool.map(task, args_list, lane=lane)
+
+
+class _PoolServerManager(BaseManager):
+    pass
+
+
+class _PoolClientManager(BaseManager):
+    pass
+
+
+_PoolClientManager.register('get_pool')
+
+
+def serve_worker_pool(address, authkey, size, live_reserved=1, timeout=None):
+    """Publica un pool compartido por todos los procesos WSGI (ver run_recognition_workers)."""
+    facade = _PoolFacade(RecognitionWorkerPool(size, live_reserved, timeout))
+    _PoolServerManager.register('get_pool', callable=lambda: facade, exposed=['run', 'map'])
+    manager = _PoolServerManager(address=address, authkey=authkey)
+    manager.get_server().serve_forever()
+
+
+class RemoteWorkerPool:
+    """Cliente del pool compartido; mantiene una conexión por hilo."""
+
+    def __init__(self, address, authkey):
+        self._address = address
+        self._authkey = authkey
+        self._local = threading.local()
+
+    def _proxy(self):
+        if not hasattr(self._local, 'pool'):
+            manager = _PoolClientManager(address=self._address, authkey=self._authkey)
+            manager.connect()
+            self._local.pool = manager.get_pool()
+        return self._local.pool
+
+    def run(self, task, *args, lane='live', timeout=None):
+        # El servidor aplica su propio timeout a cada tarea.
+        return self._proxy().run(task, args, lane)
+
+    def map(self, task, args_list, lane='live', timeout=None):
+        return self._proxy().map(task, list(args_list), lane)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def worker_settings():
+    """
+    Configuración del pool. FACE_RECOGNITION_WORKER_AUTHKEY es obligatoria con un pool
+    remoto: el servidor deserializa (pickle) lo que recibe, así que la clave no puede
+    ser un valor conocido como el SECRET_KEY por defecto del repositorio.
+    """
+    from django.conf import settings
+    from django.core.exceptions import ImproperlyConfigured
+
+    address = getattr(settings, 'FACE_RECOGNITION_WORKER_ADDRESS', None)
+    authkey = getattr(settings, 'FACE_RECOGNITION_WORKER_AUTHKEY', None)
+    if address:
+        if not authkey:
+            raise ImproperlyConfigured("FACE_RECOGNITION_WORKER_AUTHKEY es obligatoria cuando se configura FACE_RECOGNITION_WORKER_ADDRESS.")
+        host, port = address.rsplit(':', 1)
+        address = (host, int(port))
+    return {
+        'size': getattr(settings, 'FACE_RECOGNITION_WORKERS', 0),
+        'live_reserved': getattr(settings, 'FACE_RECOGNITION_LIVE_RESERVED_WORKERS', 1),
+        'address': address,
+        'authkey': authkey.encode() if authkey else None,
+        'timeout': getattr(settings, 'FACE_RECOGNITION_WORKER_TIMEOUT', 30),
+    }
+
+
+def get_worker_pool():
+    """
+    Devuelve el pool configurado: el servidor compartido si hay FACE_RECOGNITION_WORKER_ADDRESS,
+    un pool local al proceso si FACE_RECOGNITION_WORKERS > 0, o None para ejecutar en línea.
+    """
+    global _pool
+    if _pool is not None:
+        return _pool
+    if multiprocessing.current_process().daemon:
+        # Los procesos demonio (p. ej. workers prefork de Celery) no pueden crear hijos:
+        # ellos mismos actúan como pool y procesan en línea.
+        return None
+    config = worker_settings()
+    if not config['address'] and config['size'] <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            if config['address']:
+                _pool = RemoteWorkerPool(config['address'], config['authkey'])
+            else:
+                _pool = RecognitionWorkerPool(config['size'], config['live_reserved'], config['timeout'])
+    return _pool
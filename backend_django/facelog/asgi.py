@@ -5,6 +5,15 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+
+El canal WebSocket de reconocimiento (face_recognition_app/streaming.py) solo está
+disponible con un servidor ASGI; `manage.py runserver` y los servidores WSGI no lo
+atienden. Con uvicorn (requirements.txt):
+
+    uvicorn facelog.asgi:application --host 0.0.0.0 --port 8000
+
+En producción se pueden usar varios procesos (--workers N) detrás del mismo proxy
+que sirve la API, reenviando las cabeceras Upgrade/Connection de /ws/.
 """
 
 import os
@@ -13,4 +22,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'facelog.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Se importa después de inicializar Django porque usa los modelos.
+from face_recognition_app.streaming import websocket_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """Enruta las conexiones WebSocket al canal de reconocimiento y el resto a Django."""
+    if scope['type'] == 'websocket':
+        return await websocket_application(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,10 @@
+# facelog/celery.py
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'facelog.settings')
+
+app = Celery('facelog')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -150,7 +150,34 @@ FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
 # Celery
-CELERY_BROKER_URL = os.getenv("REDIS_URL")
-CELERY_RESULT_BACKEND = os.getenv("REDIS_URL")
+# Sin REDIS_URL las tareas se ejecutan en el mismo proceso (desarrollo y pruebas).
+CELERY_BROKER_URL = os.getenv("REDIS_URL", "memory://")
+CELERY_RESULT_BACKEND = os.getenv("REDIS_URL", "cache+memory://")
+CELERY_TASK_ALWAYS_EAGER = not os.getenv("REDIS_URL")
+CELERY_TASK_STORE_EAGER_RESULT = True
+CELERY_RESULT_EXPIRES = timedelta(hours=1)
+
+# Reconocimiento facial
+FACE_ENCODING_CACHE_SIZE = int(os.getenv("FACE_ENCODING_CACHE_SIZE", 64))  # Fichas en memoria por proceso
+FACE_ENCODING_CACHE_TTL = int(os.getenv("FACE_ENCODING_CACHE_TTL", 300))  # Segundos
+# 0 = procesar en el hilo de la petición. Un valor > 0 crea un pool (con sus propios modelos de dlib)
+# en cada proceso WSGI/Celery; para varios procesos conviene un único pool compartido con
+# run_recognition_workers y FACE_RECOGNITION_WORKER_ADDRESS.
+FACE_RECOGNITION_WORKERS = int(os.getenv("FACE_RECOGNITION_WORKERS", 0))
+FACE_RECOGNITION_LIVE_RESERVED_WORKERS = int(os.getenv("FACE_RECOGNITION_LIVE_RESERVED_WORKERS", 1))
+FACE_RECOGNITION_WORKER_ADDRESS = os.getenv("FACE_RECOGNITION_WORKER_ADDRESS")  # host:puerto de run_recognition_workers
+FACE_RECOGNITION_WORKER_AUTHKEY = os.getenv("FACE_RECOGNITION_WORKER_AUTHKEY")  # Obligatoria con FACE_RECOGNITION_WORKER_ADDRESS; secreto propio del despliegue
+FACE_RECOGNITION_WORKER_TIMEOUT = int(os.getenv("FACE_RECOGNITION_WORKER_TIMEOUT", 30))  # Segundos
+FACE_RECOGNITION_CONTEXT_TTL = int(os.getenv("FACE_RECOGNITION_CONTEXT_TTL", 30))  # Segundos antes de releer configuración y listado de la sesión
+FACE_RECOGNITION_ENCODER = os.getenv("FACE_RECOGNITION_ENCODER", "dlib")  # Ver face_recognition_app/backends.py
+FACE_RECOGNITION_OPENCV_DNN_MODEL = os.getenv("FACE_RECOGNITION_OPENCV_DNN_MODEL")  # Modelo ONNX de YuNet para el detector opencv_dnn
+FACE_INDEX_NPROBE = int(os.getenv("FACE_INDEX_NPROBE", 16))  # Listas revisadas por búsqueda en el índice de duplicados
+FACE_INDEX_MIN_IVF_SIZE = int(os.getenv("FACE_INDEX_MIN_IVF_SIZE", 2048))  # Por debajo, búsqueda exacta
+FACE_INDEX_SYNC_INTERVAL = int(os.getenv("FACE_INDEX_SYNC_INTERVAL", 30))  # Segundos mínimos entre sincronizaciones del índice con la BD
+FACE_STREAM_ATTENDANCE_INTERVAL = int(os.getenv("FACE_STREAM_ATTENDANCE_INTERVAL", 5))  # Segundos entre envíos de asistencia por WebSocket
+FACE_STREAM_AUTH_TIMEOUT = int(os.getenv("FACE_STREAM_AUTH_TIMEOUT", 10))  # Segundos para recibir el JWT en el primer mensaje del WebSocket
+FACE_VERIFICATION_LOG_BATCH_SIZE = int(os.getenv("FACE_VERIFICATION_LOG_BATCH_SIZE", 200))  # Registros por inserción en FaceVerificationLog
+FACE_VERIFICATION_LOG_FLUSH_SECONDS = float(os.getenv("FACE_VERIFICATION_LOG_FLUSH_SECONDS", 5))  # Espera máxima antes de escribir el lote
+FACE_CHECKIN_BULK_MAX_EVENTS = int(os.getenv("FACE_CHECKIN_BULK_MAX_EVENTS", 20000))  # Eventos por carga de kiosco
 
 #Cambios
\ No newline at end of file